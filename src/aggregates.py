@@ -0,0 +1,181 @@
+import math
+from collections import deque
+from datetime import datetime, timezone
+
+from .model import to_micros
+from .stats import _iso
+from .utils import get_path
+
+
+_US = 1_000_000
+
+
+def _epoch_us(ts: datetime) -> int:
+    """Event time in integer microseconds (naive = UTC), so window bounds are exact."""
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return to_micros(ts)
+
+
+class WindowState:
+    __slots__ = ('start', 'count', 'sum', 'min', 'max')
+
+    def __init__(self, start: int):
+        self.start = start
+        self.count = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        self.count += 1
+        if value is None:
+            return
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def to_dict(self, size_us: int, closed: bool) -> dict:
+        return {
+            'start': _iso(self.start / _US),
+            'end': _iso((self.start + size_us) / _US),
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min,
+            'max': self.max,
+            'closed': closed,
+        }
+
+
+class WindowAggregator:
+    """Tumbling (slide == size) or sliding windows over Event.timestamp for one topic.
+
+    The watermark trails the largest event time seen by ``allowed_lateness``
+    seconds. A window is closed once the watermark passes its end; events that
+    only fall into closed windows are counted in ``late_dropped``.
+    """
+
+    def __init__(self, name: str, topic: str, size: float, slide: float | None = None,
+                 field: str | None = None, allowed_lateness: float = 0, retain: int = 100):
+        slide = size if slide is None else slide
+        if size <= 0 or slide <= 0:
+            raise ValueError(f'aggregate {name!r}: size and slide must be positive')
+        if slide > size:
+            raise ValueError(f'aggregate {name!r}: slide must not exceed size')
+        if allowed_lateness < 0:
+            raise ValueError(f'aggregate {name!r}: allowed_lateness must be >= 0')
+        self.name = name
+        self.topic = topic
+        self.size = size
+        self.slide = slide
+        self.field = field
+        self.allowed_lateness = allowed_lateness
+        # window arithmetic runs on integer microseconds: with float seconds a
+        # fractional slide gives one window several drifting starts
+        self._size_us = round(size * _US)
+        self._slide_us = round(slide * _US)
+        self._lateness_us = round(allowed_lateness * _US)
+        if self._slide_us < 1:
+            raise ValueError(f'aggregate {name!r}: slide must be at least one microsecond')
+        self.max_event_time = None
+        self.watermark = -math.inf
+        self.late_dropped = 0
+        # keyed by window index k, the window starting at k * slide
+        self._open: dict[int, WindowState] = {}
+        self._closed: deque[WindowState] = deque(maxlen=retain)
+
+    @classmethod
+    def from_spec(cls, spec: dict) -> 'WindowAggregator':
+        try:
+            return cls(
+                name=spec.get('name') or f"{spec['topic']}:{spec['size']}",
+                topic=spec['topic'],
+                size=float(spec['size']),
+                slide=float(spec['slide']) if spec.get('slide') is not None else None,
+                field=spec.get('field'),
+                allowed_lateness=float(spec.get('allowed_lateness', 0)),
+                retain=int(spec.get('retain', 100)),
+            )
+        except KeyError as e:
+            raise ValueError(f'aggregate spec {spec!r} is missing {e.args[0]!r}')
+
+    def _value(self, event: dict):
+        if self.field is None:
+            return None
+        value = get_path(event, self.field)
+        # bool is an int subclass but summing flags is never what was meant
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return None
+        return value
+
+    def add(self, event: dict):
+        ts = _epoch_us(event['timestamp'])
+        value = self._value(event)
+        k = ts // self._slide_us
+        accepted = False
+        while k * self._slide_us + self._size_us > ts:
+            start = k * self._slide_us
+            if start + self._size_us > self.watermark:
+                window = self._open.get(k)
+                if window is None:
+                    window = self._open[k] = WindowState(start)
+                window.add(value)
+                accepted = True
+            k -= 1
+        if not accepted:
+            self.late_dropped += 1
+            return
+        if self.max_event_time is None or ts > self.max_event_time:
+            self.max_event_time = ts
+            self._advance(ts - self._lateness_us)
+
+    def _advance(self, watermark: float):
+        if watermark <= self.watermark:
+            return
+        self.watermark = watermark
+        for k in sorted(k for k, w in self._open.items() if w.start + self._size_us <= watermark):
+            self._closed.append(self._open.pop(k))
+
+    def snapshot(self) -> dict:
+        return {
+            'name': self.name,
+            'topic': self.topic,
+            'field': self.field,
+            'size': self.size,
+            'slide': self.slide,
+            'allowed_lateness': self.allowed_lateness,
+            'watermark': _iso(self.watermark / _US) if self.max_event_time is not None else None,
+            'late_dropped': self.late_dropped,
+            'open': [w.to_dict(self._size_us, False) for _, w in sorted(self._open.items())],
+            'closed': [w.to_dict(self._size_us, True) for w in self._closed],
+        }
+
+
+class AggregationEngine:
+    """Routes processed events to the window aggregators configured for their topic."""
+
+    def __init__(self, specs: list[dict] | None = None):
+        self._by_name: dict[str, WindowAggregator] = {}
+        self._by_topic: dict[str, list[WindowAggregator]] = {}
+        for spec in specs or []:
+            self.add(WindowAggregator.from_spec(spec))
+
+    def add(self, aggregator: WindowAggregator):
+        if aggregator.name in self._by_name:
+            raise ValueError(f'duplicate aggregate name {aggregator.name!r}')
+        self._by_name[aggregator.name] = aggregator
+        self._by_topic.setdefault(aggregator.topic, []).append(aggregator)
+
+    def record(self, event: dict):
+        for aggregator in self._by_topic.get(event['topic'], ()):
+            aggregator.add(event)
+
+    def get(self, name: str) -> dict | None:
+        aggregator = self._by_name.get(name)
+        return None if aggregator is None else aggregator.snapshot()
+
+    def snapshot(self, topic: str | None = None) -> list[dict]:
+        aggregators = self._by_topic.get(topic, []) if topic else self._by_name.values()
+        return [a.snapshot() for a in aggregators]
@@ -0,0 +1,82 @@
+from collections import deque
+
+
+class AdaptiveBatcher:
+    """Picks ConsumerWorker's next dequeue batch size and linger from recent batches.
+
+    The latency of a batch is the queue wait of its oldest event plus the
+    time to process it; the p99 over the last ``window`` batches is steered
+    towards ``target_p99``:
+
+    * with a backlog, the next batch takes all of it up to a ceiling: once
+      events are queued the fewest commits drain them soonest;
+    * over target because commits themselves are slow: shrink the batch and
+      the ceiling multiplicatively (with a cooldown so stale samples do not
+      keep shrinking it); the ceiling recovers while commits stay fast;
+    * light traffic with headroom: linger a little so a commit carries more
+      than one event, never more than a fraction of the remaining headroom.
+    """
+
+    COOLDOWN = 16
+
+    def __init__(self, target_p99: float = 0.05, initial_batch: int = 256, min_batch: int = 1,
+                 max_batch: int = 4096, max_linger: float = 0.005, window: int = 256):
+        if not 1 <= min_batch <= max_batch:
+            raise ValueError('batch bounds must satisfy 1 <= min_batch <= max_batch')
+        self.target_p99 = target_p99
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.max_linger = max_linger
+        self.batch_size = max(min_batch, min(max_batch, initial_batch))
+        self.linger = 0.0
+        self._latencies = deque(maxlen=window)
+        self._cooldown = 0
+        self._ceiling = max_batch
+        self.batches = 0
+        self.commit_avg = None
+
+    def p99(self) -> float:
+        if not self._latencies:
+            return 0.0
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+
+    def _clamp(self, size: float) -> int:
+        return max(self.min_batch, min(self.max_batch, int(size)))
+
+    def observe(self, size: int, wait: float, commit: float, backlog: int):
+        """Record one processed batch and adjust the parameters for the next one."""
+        self.batches += 1
+        self._latencies.append(wait + commit)
+        self.commit_avg = commit if self.commit_avg is None else self.commit_avg + 0.1 * (commit - self.commit_avg)
+        if self._cooldown:
+            self._cooldown -= 1
+        p99 = self.p99()
+
+        if p99 > self.target_p99 and commit > self.target_p99 / 2 and self.batch_size > self.min_batch:
+            self.linger = 0.0
+            if not self._cooldown:
+                self.batch_size = self._ceiling = self._clamp(self.batch_size * 0.7)
+                self._cooldown = self.COOLDOWN
+            return
+
+        if commit < self.target_p99 / 4 and p99 < self.target_p99:
+            self._ceiling = self._clamp(self._ceiling * 1.25)
+        if backlog:
+            self.linger = 0.0
+            self.batch_size = self._clamp(min(backlog + size, self._ceiling))
+        elif size < max(2, self.batch_size // 4) and p99 < self.target_p99:
+            self.linger = min(self.max_linger, (self.target_p99 - p99) * 0.1)
+        else:
+            self.linger = 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            'adaptive': True,
+            'batch_size': self.batch_size,
+            'linger_ms': self.linger * 1000,
+            'target_p99_ms': self.target_p99 * 1000,
+            'observed_p99_ms': self.p99() * 1000,
+            'commit_ms_avg': self.commit_avg * 1000 if self.commit_avg is not None else None,
+            'batches': self.batches,
+        }
@@ -0,0 +1,225 @@
+import asyncio
+import bisect
+import hashlib
+import hmac
+import logging
+
+import httpx
+
+from .codec import MSGPACK_MEDIA_TYPE, packb
+
+
+logger = logging.getLogger('cluster')
+# one INFO line per forwarded batch would drown the per-topic summaries
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+FORWARDED_HEADER = 'X-Cluster-Forwarded'
+TOKEN_HEADER = 'X-Cluster-Token'
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+
+class HashRing:
+    """Consistent hashing with virtual nodes: each node owns ``vnodes`` points on the ring."""
+
+    def __init__(self, nodes: list[str], vnodes: int = 128):
+        if not nodes:
+            raise ValueError('a hash ring needs at least one node')
+        points = sorted((_hash(f'{node}#{i}'), node) for node in nodes for i in range(vnodes))
+        self._keys = [p[0] for p in points]
+        self._nodes = [p[1] for p in points]
+
+    def owner(self, key: str) -> str:
+        i = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._nodes[i]
+
+
+class Forwarder:
+    """Coalesces events bound for one endpoint into batched POSTs.
+
+    submit() resolves once the batch carrying the events was accepted by the
+    receiver (or raises if it was not), so /publish only acknowledges what
+    actually reached its owner. It returns the receiver's per-event
+    rejections for those events, indexed within them. Used for cluster peers and for the writer
+    process behind ingest front-ends.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, url: str, batch_size: int, linger: float,
+                 headers: dict | None = None, encode=packb, max_inflight: int = 4):
+        self.client = client
+        self.url = url
+        self.headers = {'Content-Type': MSGPACK_MEDIA_TYPE, **(headers or {})}
+        self.encode = encode
+        self.batch_size = batch_size
+        self.linger = linger
+        self._pending: list[tuple[list[dict], asyncio.Future]] = []
+        self._count = 0
+        self._has_items = asyncio.Event()
+        self._full = asyncio.Event()
+        self._inflight = asyncio.Semaphore(max_inflight)
+        self._task = None
+        # the loop only keeps weak references to tasks; hold the batches in flight here
+        self._sends: set[asyncio.Task] = set()
+
+    async def submit(self, events: list[dict]) -> list[dict]:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((events, future))
+        self._count += len(events)
+        self._has_items.set()
+        if self._count >= self.batch_size:
+            self._full.set()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return await future
+
+    async def _run(self):
+        while True:
+            await self._has_items.wait()
+            if self._count < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.linger)
+                except asyncio.TimeoutError:
+                    pass
+            pending, self._pending, self._count = self._pending, [], 0
+            self._has_items.clear()
+            self._full.clear()
+            try:
+                await self._inflight.acquire()
+            except asyncio.CancelledError:
+                # closing; close() fails these with the rest
+                self._pending = pending + self._pending
+                raise
+            task = asyncio.create_task(self._send(pending))
+            self._sends.add(task)
+            task.add_done_callback(self._sends.discard)
+
+    async def _send(self, pending):
+        try:
+            body = self.encode([e for events, _ in pending for e in events])
+            response = await self.client.post(self.url, content=body, headers=self.headers)
+            response.raise_for_status()
+            rejected = response.json().get('rejected', [])
+            offset = 0
+            for events, future in pending:
+                if not future.done():
+                    future.set_result([
+                        {**r, 'index': r['index'] - offset}
+                        for r in rejected if offset <= r['index'] < offset + len(events)
+                    ])
+                offset += len(events)
+        except Exception as e:
+            logger.warning('Forwarding %d events to %s failed: %s', sum(len(ev) for ev, _ in pending), self.url, e)
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._inflight.release()
+
+    async def close(self):
+        """Stop batching, fail what was not sent yet and wait for the batches in flight."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        pending, self._pending, self._count = self._pending, [], 0
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError(f'forwarder to {self.url} closed'))
+        if self._sends:
+            await asyncio.gather(*self._sends, return_exceptions=True)
+
+
+class Cluster:
+    """Static-membership cluster: topics are owned by nodes via a consistent-hash ring.
+
+    With a ``secret`` (CLUSTER_SECRET) every forwarded batch carries it and
+    only batches presenting it are treated as peer traffic.
+    """
+
+    def __init__(self, self_url: str, nodes: list[str], vnodes: int = 128,
+                 batch_size: int = 500, linger: float = 0.005, timeout: float = 10.0,
+                 secret: str | None = None, client: httpx.AsyncClient | None = None):
+        nodes = [n.rstrip('/') for n in nodes]
+        self.self_url = self_url.rstrip('/')
+        if self.self_url not in nodes:
+            raise ValueError(f'CLUSTER_SELF {self_url!r} is not in CLUSTER_NODES')
+        self.nodes = nodes
+        self.secret = secret
+        self.ring = HashRing(nodes, vnodes)
+        self.client = client or httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=16 * len(nodes), max_keepalive_connections=16 * len(nodes)),
+        )
+        headers = {FORWARDED_HEADER: self.self_url}
+        if secret:
+            headers[TOKEN_HEADER] = secret
+        self._forwarders = {
+            node: Forwarder(self.client, f'{node}/publish', batch_size, linger, headers=headers)
+            for node in nodes if node != self.self_url
+        }
+
+    def is_peer(self, headers) -> bool:
+        """Whether a /publish request was forwarded by a member (and so already validated and routed)."""
+        sender = headers.get(FORWARDED_HEADER)
+        if sender is None or sender.rstrip('/') not in self.nodes:
+            return False
+        return not self.secret or hmac.compare_digest(headers.get(TOKEN_HEADER, ''), self.secret)
+
+    def split(self, events: list[dict]) -> tuple[list[dict], dict[str, list[dict]]]:
+        """Separate events this node owns from those to forward, grouped by owner."""
+        local, remote = [], {}
+        for event in events:
+            owner = self.ring.owner(event['topic'])
+            if owner == self.self_url:
+                local.append(event)
+            else:
+                remote.setdefault(owner, []).append(event)
+        return local, remote
+
+    async def forward(self, remote: dict[str, list[dict]]):
+        await asyncio.gather(*(self._forwarders[node].submit(events) for node, events in remote.items()))
+
+    async def gather_stats(self, local: dict) -> dict:
+        async def fetch(node):
+            if node == self.self_url:
+                return node, local
+            try:
+                response = await self.client.get(f'{node}/stats')
+                response.raise_for_status()
+                return node, response.json()
+            except Exception as e:
+                return node, {'error': str(e)}
+
+        per_node = dict(await asyncio.gather(*(fetch(node) for node in self.nodes)))
+        reachable = [s for s in per_node.values() if 'error' not in s]
+        topics = {}
+        for s in reachable:
+            topics.update(dict.fromkeys(s['topics']))
+        return {
+            'received': sum(s['received'] for s in reachable),
+            'unique_processed': sum(s['unique_processed'] for s in reachable),
+            # each node leaves its dead letters out; received - unique would count them as duplicates
+            'duplicate_dropped': sum(s['duplicate_dropped'] for s in reachable),
+            'topics': list(topics),
+            'nodes': per_node,
+            'unreachable': [node for node, s in per_node.items() if 'error' in s],
+        }
+
+    async def close(self):
+        await asyncio.gather(*(forwarder.close() for forwarder in self._forwarders.values()))
+        await self.client.aclose()
+
+
+def cluster_from_env(environ) -> Cluster | None:
+    nodes = [n.strip() for n in environ.get('CLUSTER_NODES', '').split(',') if n.strip()]
+    if not nodes:
+        return None
+    return Cluster(
+        self_url=environ['CLUSTER_SELF'],
+        nodes=nodes,
+        vnodes=int(environ.get('CLUSTER_VNODES', '128')),
+        batch_size=int(environ.get('CLUSTER_BATCH_SIZE', '500')),
+        linger=float(environ.get('CLUSTER_LINGER_MS', '5')) / 1000,
+        secret=environ.get('CLUSTER_SECRET') or None,
+    )
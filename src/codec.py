@@ -0,0 +1,142 @@
+from datetime import datetime
+from typing import Any
+
+import msgpack
+from fastapi import Request, Response
+from fastapi.exceptions import RequestValidationError
+from pydantic import TypeAdapter, ValidationError
+
+from .model import BIGINT_EXT, Event, ext_hook
+
+
+MSGPACK_MEDIA_TYPE = 'application/msgpack'
+MSGPACK_MEDIA_TYPES = ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack')
+# pre-validated event rows from an ingest front-end to the writer process
+INGEST_MEDIA_TYPE = 'application/x-aggregator-ingest'
+
+_events_adapter = TypeAdapter(Event | list[Event])
+
+
+def publish_openapi() -> dict:
+    """requestBody docs for /publish, which reads the raw body itself (see parse_events)."""
+    event = Event.model_json_schema()
+    schema = {'anyOf': [event, {'type': 'array', 'items': event}]}
+    content = {media_type: {'schema': schema} for media_type in ('application/json', MSGPACK_MEDIA_TYPE)}
+    return {'requestBody': {'required': True, 'content': content}}
+
+
+def _media_types(header: str | None) -> list[str]:
+    if not header:
+        return []
+    return [part.split(';', 1)[0].strip().lower() for part in header.split(',')]
+
+
+def is_msgpack(content_type: str | None) -> bool:
+    return any(t in MSGPACK_MEDIA_TYPES for t in _media_types(content_type))
+
+
+def wants_msgpack(request: Request) -> bool:
+    return is_msgpack(request.headers.get('accept'))
+
+
+def _default(obj: Any):
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, int):
+        # only reached for integers msgpack cannot encode natively
+        return msgpack.ExtType(BIGINT_EXT, str(obj).encode())
+    raise TypeError(f'cannot serialize {type(obj).__name__} to msgpack')
+
+
+def packb(obj: Any) -> bytes:
+    return msgpack.packb(obj, default=_default)
+
+
+def unpackb(data: bytes) -> Any:
+    # timestamp=3 decodes the msgpack Timestamp extension into datetime
+    return msgpack.unpackb(data, raw=False, timestamp=3, ext_hook=ext_hook)
+
+
+def pack_ingest(events: list[dict]) -> bytes:
+    """Encode validated events as compact [topic, event_id, timestamp, source, payload, schema_version] rows.
+
+    ``schema_version`` is the topic's schema version the front-end checked the
+    payload against (0: no schema); the writer re-checks rows whose version is
+    not its current one.
+    """
+    return packb([
+        [e['topic'], e['event_id'], e['timestamp'], e['source'], e['payload'], e.get('schema_version', 0)]
+        for e in events
+    ])
+
+
+def unpack_ingest(data: bytes) -> tuple[list[dict], list[int]]:
+    """Inverse of pack_ingest: the events and their schema versions.
+
+    Rows are trusted, only the timestamp is parsed back.
+    """
+    events, versions = [], []
+    for topic, event_id, ts, source, payload, version in unpackb(data):
+        events.append({'topic': topic, 'event_id': event_id, 'timestamp': datetime.fromisoformat(ts),
+                       'source': source, 'payload': payload})
+        versions.append(version)
+    return events, versions
+
+
+_JSON_SCALARS = (str, int, float, bool, type(None), datetime)
+
+
+def _non_json_value(data: Any) -> tuple[tuple, str] | None:
+    """Location and type of the first value JSON cannot carry (bin, unknown ext types, bytes keys)."""
+    # iterative: nesting depth is up to the sender
+    stack = [((), data)]
+    while stack:
+        loc, value = stack.pop()
+        if isinstance(value, dict):
+            for key, item in value.items():
+                if not isinstance(key, str):
+                    return (*loc, repr(key)), f'{type(key).__name__} map key'
+                stack.append(((*loc, key), item))
+        elif isinstance(value, list):
+            stack.extend(((*loc, i), item) for i, item in enumerate(value))
+        elif not isinstance(value, _JSON_SCALARS):
+            return loc, type(value).__name__
+    return None
+
+
+def _body_errors(errors: list[dict]) -> list[dict]:
+    return [{**err, 'loc': ('body', *err['loc'])} for err in errors]
+
+
+async def parse_events(request: Request) -> list[Event]:
+    """Decode a /publish body (JSON or msgpack) into validated events."""
+    body = await request.body()
+    try:
+        if is_msgpack(request.headers.get('content-type')):
+            try:
+                data = unpackb(body)
+            except (ValueError, msgpack.UnpackException) as e:
+                raise RequestValidationError(
+                    [{'type': 'msgpack_invalid', 'loc': ('body',), 'msg': f'Invalid msgpack: {e}', 'input': None}]
+                )
+            # stored events are served as JSON too; one undecodable payload would break /events for everyone
+            bad = _non_json_value(data)
+            if bad is not None:
+                loc, kind = bad
+                raise RequestValidationError(
+                    [{'type': 'msgpack_type', 'loc': ('body', *loc), 'msg': f'{kind} has no JSON equivalent',
+                      'input': None}]
+                )
+            parsed = _events_adapter.validate_python(data)
+        else:
+            parsed = _events_adapter.validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError(_body_errors(e.errors(include_url=False)))
+    return [parsed] if isinstance(parsed, Event) else parsed
+
+
+def render(request: Request, content: Any):
+    """Answer in msgpack when the client asks for it, otherwise let FastAPI emit JSON."""
+    if wants_msgpack(request):
+        return Response(content=packb(content), media_type=MSGPACK_MEDIA_TYPE)
+    return content
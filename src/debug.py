@@ -0,0 +1,151 @@
+import asyncio
+import cProfile
+import functools
+import os
+import pstats
+import time
+import tracemalloc
+from collections import deque
+
+from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException, Query
+
+
+class CoroutineTimer:
+    """Wall-clock timings for wrapped coroutine functions.
+
+    Only installed when debug endpoints are enabled, so the normal path
+    never pays for the extra call and perf_counter reads.
+    """
+
+    def __init__(self, keep: int = 1024):
+        self._keep = keep
+        self._stats: dict[str, dict] = {}
+
+    def wrap(self, name: str, fn):
+        stats = self._stats.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0, 'recent': deque(maxlen=self._keep)})
+
+        @functools.wraps(fn)
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                stats['count'] += 1
+                stats['total'] += elapsed
+                stats['recent'].append(elapsed)
+                if elapsed > stats['max']:
+                    stats['max'] = elapsed
+        return timed
+
+    def report(self) -> dict:
+        out = {}
+        for name, stats in self._stats.items():
+            recent = sorted(stats['recent'])
+
+            def pick(q):
+                return recent[min(len(recent) - 1, int(q * len(recent)))] * 1000 if recent else None
+
+            out[name] = {
+                'count': stats['count'],
+                'total_ms': stats['total'] * 1000,
+                'mean_ms': stats['total'] / stats['count'] * 1000 if stats['count'] else None,
+                'max_ms': stats['max'] * 1000,
+                'p50_ms': pick(0.5),
+                'p99_ms': pick(0.99),
+            }
+        return out
+
+
+def _profile_rows(profiler: cProfile.Profile, sort: str, limit: int) -> list[dict]:
+    stats = pstats.Stats(profiler)
+    stats.sort_stats(sort)
+    rows = []
+    for func in stats.fcn_list[:limit]:
+        primitive, ncalls, tottime, cumtime, _ = stats.stats[func]
+        filename, line, name = func
+        rows.append({
+            'function': name,
+            'file': filename,
+            'line': line,
+            'ncalls': ncalls,
+            'primitive_calls': primitive,
+            'tottime': tottime,
+            'cumtime': cumtime,
+        })
+    return rows
+
+
+def _traces(stats: list, limit: int) -> list[dict]:
+    return [
+        {
+            'location': str(stat.traceback),
+            'size_bytes': stat.size,
+            'count': stat.count,
+            **({'size_diff_bytes': stat.size_diff, 'count_diff': stat.count_diff} if hasattr(stat, 'size_diff') else {}),
+        }
+        for stat in stats[:limit]
+    ]
+
+
+def register_debug_routes(app: FastAPI):
+    """Add /debug/* endpoints; called only when DEBUG_ENDPOINTS=1 and DEBUG_TOKEN is set.
+
+    Every request must carry the token in X-Debug-Token.
+    """
+    token = os.environ['DEBUG_TOKEN']
+
+    async def check_token(x_debug_token: str | None = Header(None)):
+        if x_debug_token != token:
+            raise HTTPException(status_code=403, detail='Invalid debug token')
+
+    router = APIRouter(prefix='/debug', dependencies=[Depends(check_token)])
+    app.state.handle_timer = CoroutineTimer()
+    profile_lock = asyncio.Lock()
+    memory = {'last': None}
+
+    @router.get('/profile')
+    async def profile(seconds: float = Query(5, gt=0, le=60),
+                      sort: str = Query('cumulative', pattern='^(cumulative|tottime|ncalls)$'),
+                      limit: int = Query(50, ge=1, le=500)):
+        # cProfile hooks the event loop thread, so this covers the worker and
+        # every request handled while we sleep; store writes run in threads and are not included.
+        if profile_lock.locked():
+            raise HTTPException(status_code=409, detail='A profile is already running')
+        async with profile_lock:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profiler.disable()
+        return {'seconds': seconds, 'sort': sort, 'functions': _profile_rows(profiler, sort, limit)}
+
+    @router.get('/memory')
+    async def memory_report(limit: int = Query(20, ge=1, le=500), frames: int = Query(1, ge=1, le=50),
+                            stop: bool = Query(False)):
+        if stop:
+            tracemalloc.stop()
+            memory['last'] = None
+            return {'tracing': False}
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            memory['last'] = tracemalloc.take_snapshot()
+            return {'tracing': True, 'started': True, 'top': [], 'growth': []}
+        snapshot = tracemalloc.take_snapshot()
+        previous, memory['last'] = memory['last'], snapshot
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            'tracing': True,
+            'started': False,
+            'traced_bytes': current,
+            'peak_bytes': peak,
+            'top': _traces(snapshot.statistics('lineno'), limit),
+            'growth': _traces(snapshot.compare_to(previous, 'lineno'), limit) if previous else [],
+        }
+
+    @router.get('/timings')
+    async def timings():
+        return app.state.handle_timer.report()
+
+    app.include_router(router)
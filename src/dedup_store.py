@@ -1,12 +1,35 @@
+import heapq
+import itertools
+import os
 import sqlite3
 import threading
-from typing import Tuple
+import urllib.request
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Tuple
+
+
+class PartialCommitError(Exception):
+    """Some shards committed a batch before another one failed.
+
+    ``inserted`` maps positions of the committed items to their flags;
+    ``marks_committed`` tells whether the sequence marks made it.
+    """
+
+    def __init__(self, error: BaseException, inserted: dict[int, bool], marks_committed: bool):
+        super().__init__(str(error))
+        self.inserted = inserted
+        self.marks_committed = marks_committed
 
 
 class DedupStore:
     def __init__(self, path: str = 'dedup.db'):
         self.path = path
         self._lock = threading.Lock()
+        self._local = threading.local()
+        self._readers: list[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self._generation = 0
         self._init_db()
 
 
@@ -14,10 +37,30 @@ class DedupStore:
         return sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
 
 
+    def _read_conn(self) -> sqlite3.Connection:
+        """Per-thread read-only connection used by every read; never takes the writer lock.
+
+        Under WAL each autocommit SELECT reads the last committed snapshot, so
+        dashboard queries and the ingest writer no longer wait for each other.
+        """
+        cached = getattr(self._local, 'reader', None)
+        if cached is not None and cached[0] == self._generation:
+            return cached[1]
+        uri = 'file:' + urllib.request.pathname2url(os.path.abspath(self.path)) + '?mode=ro'
+        conn = sqlite3.connect(uri, uri=True, isolation_level=None, check_same_thread=False)
+        with self._readers_lock:
+            self._readers.append(conn)
+        self._local.reader = (self._generation, conn)
+        return conn
+
+
     def _init_db(self):
         with self._lock:
             conn = self._conn()
             cur = conn.cursor()
+            # only takes effect on a fresh file; lets maintenance hand free pages back in small steps
+            cur.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            cur.execute('PRAGMA journal_mode=WAL')
             cur.execute('''
                 CREATE TABLE IF NOT EXISTS dedup (
                     topic TEXT NOT NULL,
@@ -25,18 +68,70 @@ class DedupStore:
                     processed_at TEXT NOT NULL,
                     PRIMARY KEY(topic, event_id)
                 )
+           ''')
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                )
+           ''')
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS seq_marks (
+                    topic TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    hwm INTEGER NOT NULL,
+                    bits BLOB NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY(topic, source)
+                )
+           ''')
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS sketches (
+                    dim TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    p INTEGER NOT NULL,
+                    registers BLOB NOT NULL,
+                    PRIMARY KEY(dim, name, bucket)
+                )
+           ''')
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS idempotency (
+                    key TEXT PRIMARY KEY,
+                    fingerprint TEXT NOT NULL,
+                    status INTEGER NOT NULL,
+                    body BLOB NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+           ''')
+            # expires_at sits behind the body blob; without an index expiry would read every overflow page
+            cur.execute('CREATE INDEX IF NOT EXISTS idempotency_expires ON idempotency(expires_at)')
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS dead_letters (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    topic TEXT NOT NULL,
+                    event_id TEXT NOT NULL,
+                    event BLOB NOT NULL,
+                    error TEXT NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    failed_at REAL NOT NULL
+                )
+           ''')
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS payload_schemas (
+                    topic TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL,
+                    schema TEXT NOT NULL
+                )
            ''')
             conn.commit()
             conn.close()
 
 
     def is_processed(self, topic: str, event_id: str) -> bool:
-        with self._lock:
-            conn = self._conn()
-            cur = conn.cursor()
-            cur.execute('SELECT 1 FROM dedup WHERE topic=? AND event_id=? LIMIT 1', (topic, event_id))
-            row = cur.fetchone()
-            conn.close()
+        row = self._read_conn().execute(
+            'SELECT 1 FROM dedup WHERE topic=? AND event_id=? LIMIT 1', (topic, event_id)
+        ).fetchone()
         return row is not None
 
 
@@ -55,30 +150,550 @@ class DedupStore:
             return inserted
 
 
-    def list_topics(self) -> list[str]:
+    def mark_processed_many(self, items: Iterable[Tuple[str, str, str]], marks: Iterable[tuple] = ()) -> list[bool]:
+        """Insert (topic, event_id, processed_at) rows in one transaction.
+
+        Returns one flag per item, False for keys that were already processed
+        (including repeats within the same batch). ``marks`` are sequence
+        windows (see SequenceTracker.rows) saved in the same transaction.
+        """
         with self._lock:
             conn = self._conn()
             cur = conn.cursor()
-            cur.execute('SELECT DISTINCT topic FROM dedup')
-            rows = [r[0] for r in cur.fetchall()]
-            conn.close()
-        return rows
+            try:
+                cur.execute('BEGIN IMMEDIATE')
+                inserted = []
+                for item in items:
+                    cur.execute('INSERT OR IGNORE INTO dedup(topic,event_id,processed_at) VALUES (?,?,?)', item)
+                    inserted.append(cur.rowcount == 1)
+                cur.executemany('INSERT OR REPLACE INTO seq_marks(topic,source,hwm,bits,count) VALUES (?,?,?,?,?)', marks)
+                cur.execute('COMMIT')
+            except BaseException:
+                if conn.in_transaction:
+                    cur.execute('ROLLBACK')
+                raise
+            finally:
+                conn.close()
+        return inserted
 
 
-    def count_processed(self) -> int:
+    def get_meta(self, key: str) -> str | None:
         with self._lock:
             conn = self._conn()
             cur = conn.cursor()
-            cur.execute('SELECT COUNT(1) FROM dedup')
-            n = cur.fetchone()[0]
+            cur.execute('SELECT value FROM meta WHERE key=?', (key,))
+            row = cur.fetchone()
+            conn.close()
+        return row[0] if row else None
+
+
+    def set_meta(self, key: str, value: str):
+        with self._lock:
+            conn = self._conn()
+            conn.execute('INSERT OR REPLACE INTO meta(key,value) VALUES (?,?)', (key, value))
             conn.close()
-        return n
+
+
+    def load_sequence_marks(self) -> list[tuple]:
+        return self._read_conn().execute('SELECT topic, source, hwm, bits, count FROM seq_marks').fetchall()
+
+
+    def load_sketches(self) -> list[tuple]:
+        return self._read_conn().execute('SELECT dim, name, bucket, p, registers FROM sketches').fetchall()
+
+
+    def save_sketches(self, rows: list[tuple], oldest_bucket: int | None = None):
+        """Upsert (dim, name, bucket, p, registers) rows and drop buckets older than ``oldest_bucket``."""
+        with self._lock:
+            conn = self._conn()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.executemany('INSERT OR REPLACE INTO sketches(dim,name,bucket,p,registers) VALUES (?,?,?,?,?)', rows)
+                if oldest_bucket is not None:
+                    conn.execute('DELETE FROM sketches WHERE bucket >= 0 AND bucket < ?', (oldest_bucket,))
+                conn.execute('COMMIT')
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                raise
+            finally:
+                conn.close()
+
+
+    def load_idempotency(self) -> list[tuple]:
+        return self._read_conn().execute(
+            'SELECT key, fingerprint, status, body, expires_at FROM idempotency'
+        ).fetchall()
+
+
+    def save_idempotency(self, rows: list[tuple]):
+        """Upsert (key, fingerprint, status, body, expires_at) rows."""
+        with self._lock:
+            conn = self._conn()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.executemany(
+                    'INSERT OR REPLACE INTO idempotency(key,fingerprint,status,body,expires_at) VALUES (?,?,?,?,?)', rows
+                )
+                conn.execute('COMMIT')
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                raise
+            finally:
+                conn.close()
+
+
+    def expire_idempotency(self, now: float) -> int:
+        """Delete rows that expired by ``now``; returns how many."""
+        with self._lock:
+            conn = self._conn()
+            try:
+                return conn.execute('DELETE FROM idempotency WHERE expires_at <= ?', (now,)).rowcount
+            finally:
+                conn.close()
+
+
+    def save_dead_letters(self, rows: list[tuple]):
+        """Append (topic, event_id, event, error, attempts, failed_at) rows."""
+        with self._lock:
+            conn = self._conn()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.executemany(
+                    'INSERT INTO dead_letters(topic,event_id,event,error,attempts,failed_at) VALUES (?,?,?,?,?,?)', rows
+                )
+                conn.execute('COMMIT')
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                raise
+            finally:
+                conn.close()
+
+
+    def list_dead_letters(self, limit: int = 100, topic: str | None = None) -> list[tuple]:
+        """Oldest first: (id, topic, event_id, event, error, attempts, failed_at)."""
+        query = 'SELECT id, topic, event_id, event, error, attempts, failed_at FROM dead_letters'
+        args: tuple = ()
+        if topic is not None:
+            query += ' WHERE topic=?'
+            args = (topic,)
+        return self._read_conn().execute(query + ' ORDER BY id LIMIT ?', (*args, limit)).fetchall()
+
+
+    def count_dead_letters(self) -> int:
+        return self._read_conn().execute('SELECT COUNT(*) FROM dead_letters').fetchone()[0]
+
+
+    def delete_dead_letters(self, ids: list[int]):
+        with self._lock:
+            conn = self._conn()
+            conn.executemany('DELETE FROM dead_letters WHERE id=?', [(i,) for i in ids])
+            conn.close()
+
+
+    def load_schemas(self) -> list[tuple]:
+        return self._read_conn().execute('SELECT topic, version, schema FROM payload_schemas').fetchall()
+
+
+    def save_schema(self, topic: str, version: int, schema: str):
+        with self._lock:
+            conn = self._conn()
+            conn.execute('INSERT OR REPLACE INTO payload_schemas(topic,version,schema) VALUES (?,?,?)',
+                         (topic, version, schema))
+            conn.close()
+
+
+    def delete_schema(self, topic: str):
+        with self._lock:
+            conn = self._conn()
+            conn.execute('DELETE FROM payload_schemas WHERE topic=?', (topic,))
+            conn.close()
+
+
+    def list_topics(self) -> list[str]:
+        return [r[0] for r in self._read_conn().execute('SELECT topic FROM dedup UNION SELECT topic FROM seq_marks')]
+
+
+    def count_processed(self) -> int:
+        # events of sequenced topics have no dedup row, only a count on their source's mark
+        return self._read_conn().execute(
+            'SELECT (SELECT COUNT(1) FROM dedup) + (SELECT COALESCE(SUM(count), 0) FROM seq_marks)'
+        ).fetchone()[0]
 
     def list_events_for_topic(self, topic: str) -> list[Tuple[str, str]]:
+        return self._read_conn().execute(
+            'SELECT event_id, processed_at FROM dedup WHERE topic=? ORDER BY processed_at', (topic,)
+        ).fetchall()
+
+    def iter_rows(self, chunk_size: int = 10000):
+        """Yield all dedup rows in chunks from a single read transaction.
+
+        Under WAL the transaction pins a consistent snapshot, so ingestion can
+        keep committing (and does not wait for us) while the rows stream out.
+        """
+        conn = self._conn()
+        try:
+            conn.execute('BEGIN')
+            cur = conn.execute('SELECT topic, event_id, processed_at FROM dedup')
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+
+    def bulk_loader(self, batch_rows: int = 500_000) -> 'BulkLoader':
+        return BulkLoader(self, batch_rows)
+
+
+    def backup(self, dest_path: str, pages: int = 1024, pause: float = 0.005):
+        """Copy the database with SQLite's online backup API, a few pages at a time."""
+        src = self._conn()
+        dest = sqlite3.connect(dest_path)
+        try:
+            src.backup(dest, pages=pages, sleep=pause)
+        finally:
+            dest.close()
+            src.close()
+
+
+    def storage_info(self) -> dict:
+        conn = self._read_conn()
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        pages = conn.execute('PRAGMA page_count').fetchone()[0]
+        free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        auto_vacuum = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+        try:
+            wal_bytes = os.path.getsize(self.path + '-wal')
+        except OSError:
+            wal_bytes = 0
+        return {
+            'db_bytes': pages * page_size,
+            'page_size': page_size,
+            'free_pages': free,
+            'wal_bytes': wal_bytes,
+            'auto_vacuum': ('none', 'full', 'incremental')[auto_vacuum],
+        }
+
+
+    def checkpoint(self) -> tuple[int, int, int]:
+        """Checkpoint and truncate the WAL; returns (busy, wal_pages, checkpointed_pages).
+
+        Readers holding an old snapshot make it return busy immediately instead
+        of waiting, the next run simply tries again.
+        """
         with self._lock:
             conn = self._conn()
-            cur = conn.cursor()
-            cur.execute('SELECT event_id, processed_at FROM dedup WHERE topic=? ORDER BY processed_at', (topic,))
-            rows = cur.fetchall()
+            try:
+                conn.execute('PRAGMA busy_timeout=0')
+                return conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()
+            finally:
+                conn.close()
+
+
+    def incremental_vacuum(self, pages: int) -> int:
+        """Return up to ``pages`` free pages to the filesystem; returns how many were freed."""
+        with self._lock:
+            conn = self._conn()
+            try:
+                before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+                conn.execute(f'PRAGMA incremental_vacuum({int(pages)})').fetchall()
+                return before - conn.execute('PRAGMA freelist_count').fetchone()[0]
+            finally:
+                conn.close()
+
+
+    def optimize(self):
+        """Refresh planner statistics; analysis_limit keeps ANALYZE to a sample per index."""
+        with self._lock:
+            conn = self._conn()
+            try:
+                conn.execute('PRAGMA analysis_limit=1000')
+                conn.execute('ANALYZE')
+            finally:
+                conn.close()
+
+
+    def close(self):
+        """Close the cached read connections; write connections are opened per call."""
+        with self._readers_lock:
+            readers, self._readers = self._readers, []
+            self._generation += 1
+        for conn in readers:
             conn.close()
-        return rows
\ No newline at end of file
+
+
+class BulkLoader:
+    """Stage imported rows in an unindexed temp table and merge them into dedup in key order.
+
+    Appending to a heap table is cheap and the ordered INSERT ... SELECT
+    fills the primary-key b-tree sequentially instead of at random, which is
+    what makes seeding millions of keys fast. The writer lock is only held
+    while a staged batch is merged, so ingestion keeps running in between.
+    """
+
+    def __init__(self, store: DedupStore, batch_rows: int = 500_000):
+        self.store = store
+        self.batch_rows = batch_rows
+        self.received = 0
+        self.inserted = 0
+        self._staged = 0
+        self._conn = store._conn()
+        self._conn.execute('CREATE TEMP TABLE IF NOT EXISTS dedup_import (topic TEXT, event_id TEXT, processed_at TEXT)')
+        self._conn.execute('BEGIN')
+
+
+    def add(self, rows: list[Tuple[str, str, str]]):
+        self._conn.executemany('INSERT INTO temp.dedup_import VALUES (?,?,?)', rows)
+        self.received += len(rows)
+        self._staged += len(rows)
+        if self._staged >= self.batch_rows:
+            self._merge()
+
+
+    def _merge(self):
+        self._conn.execute('COMMIT')
+        with self.store._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                cur = self._conn.execute(
+                    'INSERT OR IGNORE INTO dedup(topic,event_id,processed_at) '
+                    'SELECT topic, event_id, processed_at FROM temp.dedup_import ORDER BY topic, event_id'
+                )
+                self.inserted += cur.rowcount
+                self._conn.execute('DELETE FROM temp.dedup_import')
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        self._staged = 0
+        self._conn.execute('BEGIN')
+
+
+    def finish(self) -> int:
+        try:
+            if self._staged:
+                self._merge()
+            self._conn.execute('COMMIT')
+        finally:
+            self._conn.close()
+        return self.inserted
+
+
+    def abort(self):
+        """Drop rows staged since the last merge; merged batches stay."""
+        self._conn.close()
+
+
+class ShardedDedupStore:
+    """Spread dedup keys over several SQLite files so writes can run in parallel.
+
+    A key lives in shard ``crc32(topic, event_id) % shards``. Every shard has its
+    own DedupStore (and therefore its own lock) plus a single writer thread, so
+    batches touching different shards commit concurrently. Reads that need a
+    global answer merge the per-shard results. The small side tables
+    (sequence marks, sketches, idempotency keys, dead letters, payload schemas)
+    live in the first shard.
+    """
+
+    def __init__(self, path: str = 'dedup.db', shards: int = 2):
+        if shards < 1:
+            raise ValueError('shards must be >= 1')
+        self.path = path
+        root, ext = os.path.splitext(path)
+        self.shards = [DedupStore(f'{root}.shard{i}{ext or ".db"}') for i in range(shards)]
+        layout = f'{shards}'
+        for i, shard in enumerate(self.shards):
+            stored = shard.get_meta('shard_count')
+            if stored is None:
+                shard.set_meta('shard_count', layout)
+            elif stored != layout:
+                raise ValueError(f'{shard.path} belongs to a {stored}-shard layout, not {layout}')
+        self._writers = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'dedup-shard-{i}')
+            for i in range(shards)
+        ]
+
+
+    def shard_index(self, topic: str, event_id: str) -> int:
+        # crc32 rather than hash(): str hashing is randomized per process
+        return zlib.crc32(f'{topic}\x00{event_id}'.encode()) % len(self.shards)
+
+
+    def is_processed(self, topic: str, event_id: str) -> bool:
+        return self.shards[self.shard_index(topic, event_id)].is_processed(topic, event_id)
+
+
+    def mark_processed(self, topic: str, event_id: str, processed_at: str) -> bool:
+        i = self.shard_index(topic, event_id)
+        return self._writers[i].submit(self.shards[i].mark_processed, topic, event_id, processed_at).result()
+
+
+    def mark_processed_many(self, items: Iterable[Tuple[str, str, str]], marks: Iterable[tuple] = ()) -> list[bool]:
+        items = list(items)
+        marks = list(marks)
+        positions: dict[int, list[int]] = {}
+        for pos, (topic, event_id, _) in enumerate(items):
+            positions.setdefault(self.shard_index(topic, event_id), []).append(pos)
+        if marks:
+            # sequence marks are O(sources) and all live in the first shard
+            positions.setdefault(0, [])
+        futures = {
+            i: self._writers[i].submit(self.shards[i].mark_processed_many, [items[p] for p in pos], marks if i == 0 else ())
+            for i, pos in positions.items()
+        }
+        inserted = [False] * len(items)
+        committed, error = {}, None
+        for i, future in futures.items():
+            try:
+                flags = future.result()
+            except Exception as e:
+                error = error or e
+                continue
+            committed[i] = True
+            for pos, flag in zip(positions[i], flags):
+                inserted[pos] = flag
+        if error is not None:
+            if not committed:
+                raise error
+            # the other shards are already durable; the caller must only retry what failed
+            raise PartialCommitError(
+                error,
+                {pos: inserted[pos] for i in committed for pos in positions[i]},
+                bool(marks) and 0 in committed,
+            ) from error
+        return inserted
+
+
+    def load_sequence_marks(self) -> list[tuple]:
+        return self.shards[0].load_sequence_marks()
+
+
+    def load_sketches(self) -> list[tuple]:
+        return self.shards[0].load_sketches()
+
+
+    def save_sketches(self, rows: list[tuple], oldest_bucket: int | None = None):
+        self.shards[0].save_sketches(rows, oldest_bucket)
+
+
+    def load_idempotency(self) -> list[tuple]:
+        return self.shards[0].load_idempotency()
+
+
+    def save_idempotency(self, rows: list[tuple]):
+        self.shards[0].save_idempotency(rows)
+
+
+    def expire_idempotency(self, now: float) -> int:
+        return self.shards[0].expire_idempotency(now)
+
+
+    def save_dead_letters(self, rows: list[tuple]):
+        self.shards[0].save_dead_letters(rows)
+
+
+    def list_dead_letters(self, limit: int = 100, topic: str | None = None) -> list[tuple]:
+        return self.shards[0].list_dead_letters(limit, topic)
+
+
+    def count_dead_letters(self) -> int:
+        return self.shards[0].count_dead_letters()
+
+
+    def delete_dead_letters(self, ids: list[int]):
+        self.shards[0].delete_dead_letters(ids)
+
+
+    def load_schemas(self) -> list[tuple]:
+        return self.shards[0].load_schemas()
+
+
+    def save_schema(self, topic: str, version: int, schema: str):
+        self.shards[0].save_schema(topic, version, schema)
+
+
+    def delete_schema(self, topic: str):
+        self.shards[0].delete_schema(topic)
+
+
+    def list_topics(self) -> list[str]:
+        topics = {}
+        for shard in self.shards:
+            topics.update(dict.fromkeys(shard.list_topics()))
+        return list(topics)
+
+
+    def count_processed(self) -> int:
+        return sum(shard.count_processed() for shard in self.shards)
+
+
+    def list_events_for_topic(self, topic: str) -> list[Tuple[str, str]]:
+        per_shard = [shard.list_events_for_topic(topic) for shard in self.shards]
+        return list(heapq.merge(*per_shard, key=lambda r: r[1]))
+
+
+    def iter_rows(self, chunk_size: int = 10000):
+        """Rows of every shard; each shard is a consistent snapshot of its own."""
+        return itertools.chain.from_iterable(shard.iter_rows(chunk_size) for shard in self.shards)
+
+
+    def bulk_loader(self, batch_rows: int = 500_000) -> 'ShardedBulkLoader':
+        return ShardedBulkLoader(self, batch_rows)
+
+
+    def backup(self, dest_path: str, pages: int = 1024, pause: float = 0.005):
+        root, ext = os.path.splitext(dest_path)
+        for i, shard in enumerate(self.shards):
+            shard.backup(f'{root}.shard{i}{ext or ".db"}', pages, pause)
+
+
+    def close(self):
+        for writer in self._writers:
+            writer.shutdown(wait=True)
+        for shard in self.shards:
+            shard.close()
+
+
+class ShardedBulkLoader:
+    def __init__(self, store: ShardedDedupStore, batch_rows: int = 500_000):
+        self.store = store
+        self._loaders = [shard.bulk_loader(max(1, batch_rows // len(store.shards))) for shard in store.shards]
+        self.received = 0
+
+
+    def add(self, rows: list[Tuple[str, str, str]]):
+        parts: dict[int, list] = {}
+        for row in rows:
+            parts.setdefault(self.store.shard_index(row[0], row[1]), []).append(row)
+        for i, part in parts.items():
+            self._loaders[i].add(part)
+        self.received += len(rows)
+
+
+    @property
+    def inserted(self) -> int:
+        return sum(loader.inserted for loader in self._loaders)
+
+
+    def finish(self) -> int:
+        for loader in self._loaders:
+            loader.finish()
+        return self.inserted
+
+
+    def abort(self):
+        for loader in self._loaders:
+            loader.abort()
+
+
+def open_store(path: str = 'dedup.db', shards: int = 1):
+    """Single-file DedupStore for one shard, ShardedDedupStore otherwise."""
+    if shards <= 1:
+        return DedupStore(path)
+    return ShardedDedupStore(path, shards)
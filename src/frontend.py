@@ -0,0 +1,162 @@
+"""Ingest front-end: parses and validates /publish in its own process.
+
+Several of these (e.g. ``uvicorn src.frontend:app --workers 4``) spread JSON
+parsing and pydantic validation over cores, then hand compact, pre-validated
+batches to the single writer process (``INTERNAL_INGEST=1``, listening on the
+Unix socket ``WRITER_SOCKET``), which owns DedupStore and stays the only
+place deduplication happens. Everything except /publish and /healthz is
+proxied to the writer unchanged (so /readyz reports the writer's state).
+See src/launcher.py.
+"""
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.middleware.cors import CORSMiddleware
+
+from .cluster import Forwarder
+from .codec import INGEST_MEDIA_TYPE, pack_ingest, parse_events, publish_openapi
+from .log import setup_logging
+from .payload_schema import SchemaRegistry
+
+
+logger = logging.getLogger('frontend')
+
+# response headers worth passing back from the writer
+_PROXIED_HEADERS = ('content-type', 'etag', 'cache-control', 'vary', 'idempotent-replayed')
+
+
+async def _refresh_schemas(client: httpx.AsyncClient, registry: SchemaRegistry):
+    """Mirror the writer's schema registry so rejected events never leave this process.
+
+    Versions are kept as the writer numbers them: rows are tagged with the
+    version they were checked against and the writer re-checks any that differ.
+    """
+    response = await client.get('/schemas')
+    response.raise_for_status()
+    current = response.json()
+    for topic in [t for t in registry.describe() if t not in current]:
+        registry.unregister(topic)
+    for topic, described in current.items():
+        try:
+            registry.register(topic, described['schema'], version=described['version'])
+        except ValueError as e:
+            # e.g. a pydantic model registered in-process on the writer: its rows
+            # go out tagged with version 0 and the writer validates them itself
+            registry.unregister(topic)
+            logger.warning('Cannot mirror schema for %s, the writer validates it: %s', topic, e)
+
+
+async def _first_refresh(client: httpx.AsyncClient, registry: SchemaRegistry, retry: float = 0.5):
+    while True:
+        try:
+            return await _refresh_schemas(client, registry)
+        except Exception as e:
+            logger.warning('Waiting for the writer to serve its schemas: %s', e)
+        await asyncio.sleep(retry)
+
+
+async def _schema_loop(client: httpx.AsyncClient, registry: SchemaRegistry, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await _refresh_schemas(client, registry)
+        except Exception as e:
+            logger.warning('Schema refresh from writer failed: %s', e)
+
+
+def create_frontend_app(writer_transport: httpx.AsyncBaseTransport | None = None) -> FastAPI:
+    """``writer_transport`` replaces the Unix socket transport (tests)."""
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        transport = writer_transport or httpx.AsyncHTTPTransport(uds=os.environ['WRITER_SOCKET'])
+        app.state.writer = httpx.AsyncClient(
+            transport=transport, base_url='http://writer',
+            timeout=float(os.environ.get('FRONTEND_TIMEOUT', '10')),
+        )
+        app.state.forwarder = Forwarder(
+            app.state.writer, 'http://writer/internal/ingest',
+            batch_size=int(os.environ.get('FRONTEND_BATCH_SIZE', '1000')),
+            linger=float(os.environ.get('FRONTEND_LINGER_MS', '2')) / 1000,
+            headers={'Content-Type': INGEST_MEDIA_TYPE}, encode=pack_ingest,
+        )
+        app.state.schemas = SchemaRegistry()
+        # serving before the first copy would let every event skip validation here
+        await _first_refresh(app.state.writer, app.state.schemas)
+        app.state._schema_task = asyncio.create_task(_schema_loop(
+            app.state.writer, app.state.schemas, float(os.environ.get('FRONTEND_SCHEMA_REFRESH', '5')),
+        ))
+        try:
+            yield
+        finally:
+            app.state._schema_task.cancel()
+            await app.state.forwarder.close()
+            await app.state.writer.aclose()
+
+    app = FastAPI(title='UTS PubSub Aggregator (ingest front-end)', lifespan=lifespan)
+    app.add_middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])
+
+    async def proxy(request: Request) -> Response:
+        try:
+            response = await app.state.writer.request(
+                request.method, request.url.path, params=request.query_params,
+                content=await request.body(),
+                headers={k: v for k, v in request.headers.items() if k.lower() not in ('host', 'content-length')},
+            )
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=502, detail=f'Writer unreachable: {e}')
+        headers = {k: v for k, v in response.headers.items() if k.lower() in _PROXIED_HEADERS}
+        return Response(content=response.content, status_code=response.status_code, headers=headers)
+
+    @app.post('/publish', openapi_extra=publish_openapi())
+    async def publish(request: Request):
+        # the idempotency store lives in the writer; such requests go through whole
+        if 'idempotency-key' in request.headers:
+            return await proxy(request)
+        payload = await parse_events(request)
+        schemas = app.state.schemas
+        events, rejected = schemas.check([p.model_dump() for p in payload])
+        if not events and rejected:
+            raise HTTPException(status_code=422, detail={'accepted': 0, 'rejected': rejected})
+        accepted = len(events)
+        if events:
+            for e in events:
+                e['schema_version'] = schemas.version(e['topic'])
+            try:
+                late = await app.state.forwarder.submit(events)
+            except Exception as e:
+                raise HTTPException(status_code=502, detail=f'Forwarding to writer failed: {e}')
+            if late:
+                # rejected by the writer under a newer schema than our copy
+                failed = {r['index'] for r in rejected}
+                positions = [i for i in range(len(payload)) if i not in failed]
+                rejected = sorted(rejected + [{**r, 'index': positions[r['index']]} for r in late],
+                                  key=lambda r: r['index'])
+                accepted -= len(late)
+                if not accepted:
+                    raise HTTPException(status_code=422, detail={'accepted': 0, 'rejected': rejected})
+        if rejected:
+            return {'accepted': accepted, 'rejected': rejected}
+        return {'accepted': accepted}
+
+    @app.get('/healthz')
+    async def healthz():
+        return Response(content=b'{"status":"ok"}', media_type='application/json')
+
+    @app.api_route('/{path:path}', methods=['GET', 'POST', 'PUT', 'DELETE'])
+    async def passthrough(request: Request, path: str):
+        if path.startswith('internal/'):
+            raise HTTPException(status_code=404, detail='Not Found')
+        return await proxy(request)
+
+    return app
+
+
+# only in real front-end processes; importing this module must not re-route the writer's logging
+if os.environ.get('WRITER_SOCKET'):
+    setup_logging(level=os.environ.get('LOG_LEVEL', 'INFO'), fmt=os.environ.get('LOG_FORMAT', 'text'))
+app = create_frontend_app()
@@ -0,0 +1,88 @@
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Callable
+
+import orjson
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from .codec import MSGPACK_MEDIA_TYPE, packb, wants_msgpack
+
+
+def dumps(content: Any) -> bytes:
+    try:
+        return orjson.dumps(content)
+    except TypeError:
+        # e.g. integers beyond 64 bits in a payload; rare enough for the slow path
+        return json.dumps(jsonable_encoder(content), separators=(',', ':')).encode()
+
+
+def _etag_matches(header: str | None, etag: str) -> bool:
+    if not header:
+        return False
+    bare = etag.removeprefix('W/')
+    return any(tag.strip() == '*' or tag.strip().removeprefix('W/') == bare for tag in header.split(','))
+
+
+class ResponseCache:
+    """Serialized GET responses keyed by path, query and media type, valid for one data version.
+
+    The version goes into the ETag, so a poller sending If-None-Match gets a
+    bodyless 304 until the worker commits something new, and other pollers
+    reuse the bytes serialized for the first request of that version.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        # distinguishes versions of this process from those of a previous run
+        self._epoch = os.urandom(4).hex()
+        self._entries: OrderedDict[tuple, tuple[Any, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def _lookup(self, key: tuple, version, build: Callable[[], Any]):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[1]
+        self.misses += 1
+        value = build()
+        self._entries[key] = (version, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    def memo(self, name: str, version, build: Callable[[], Any]) -> Any:
+        """Cache an intermediate value (not a response body) for one version."""
+        return self._lookup(('memo', name), version, build)
+
+    def respond(self, request: Request, version, build: Callable[[], Any],
+                weak: bool = False, store: bool = True, params: tuple | None = None) -> Response:
+        """304 if the client already has this version, else the (cached) serialized body.
+
+        ``weak`` marks responses that also carry cheap, always-fresh fields
+        (such as uptime) which do not take part in the validator; ``store``
+        disables body caching for those. ``params`` is what the endpoint reads
+        from the query string (default: all of it); cache-busting extras like
+        ``?_=123`` then share one entry instead of each keeping a copy.
+        """
+        msgpack = wants_msgpack(request)
+        tag = f'"{self._epoch}-{"-".join(map(str, version)) if isinstance(version, tuple) else version}{"-m" if msgpack else ""}"'
+        headers = {'ETag': f'W/{tag}' if weak else tag, 'Cache-Control': 'no-cache', 'Vary': 'Accept'}
+        if _etag_matches(request.headers.get('if-none-match'), headers['ETag']):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+
+        serialize = packb if msgpack else dumps
+        if store:
+            if params is None:
+                params = tuple(sorted(request.query_params.multi_items()))
+            key = (request.url.path, params, msgpack)
+            body = self._lookup(key, version, lambda: serialize(build()))
+        else:
+            body = serialize(build())
+        return Response(content=body, media_type=MSGPACK_MEDIA_TYPE if msgpack else 'application/json', headers=headers)
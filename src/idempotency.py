@@ -0,0 +1,102 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+
+logger = logging.getLogger('idempotency')
+
+MAX_KEY_LENGTH = 255
+
+
+class StoredResponse(NamedTuple):
+    fingerprint: str
+    status: int
+    body: bytes
+    expires_at: float
+
+
+class IdempotencyStore:
+    """First responses of /publish keyed by the Idempotency-Key header.
+
+    Lookups are a dict hit; entries expire after ``ttl`` seconds and the
+    oldest are evicted beyond ``max_entries``. New entries are written behind
+    to the dedup database by run()/flush(), so a retry arriving after a
+    restart still gets the original answer.
+    """
+
+    def __init__(self, max_entries: int = 100_000, ttl: float = 86400, rows=()):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, StoredResponse] = OrderedDict()
+        self._pending: dict[str, StoredResponse] = {}
+        self._in_flight: set[str] = set()
+        now = time.time()
+        for key, fingerprint, status, body, expires_at in sorted(rows, key=lambda r: r[4]):
+            if expires_at > now:
+                self._entries[key] = StoredResponse(fingerprint, status, body, expires_at)
+        self._evict()
+
+    @staticmethod
+    def fingerprint(body: bytes) -> str:
+        return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str) -> StoredResponse | None:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.time():
+            del self._entries[key]
+            return None
+        return entry
+
+    def begin(self, key: str) -> bool:
+        """Claim a key for a request in progress; False if another request holds it."""
+        if key in self._in_flight:
+            return False
+        self._in_flight.add(key)
+        return True
+
+    def end(self, key: str):
+        self._in_flight.discard(key)
+
+    def put(self, key: str, fingerprint: str, status: int, body: bytes):
+        entry = StoredResponse(fingerprint, status, body, time.time() + self.ttl)
+        self._entries[key] = entry
+        self._pending[key] = entry
+        self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            key, _ = self._entries.popitem(last=False)
+            self._pending.pop(key, None)
+
+    async def flush(self, store):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        rows = [(key, *entry) for key, entry in pending.items()]
+        try:
+            await asyncio.to_thread(store.save_idempotency, rows)
+        except BaseException:
+            self._pending = {**pending, **self._pending}
+            raise
+
+    async def expire(self, store) -> int:
+        return await asyncio.to_thread(store.expire_idempotency, time.time())
+
+    async def run(self, store, interval: float, expire_interval: float = 60.0):
+        """Write new entries every ``interval`` seconds until cancelled; expired rows go every ``expire_interval``."""
+        expired_at = time.monotonic()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush(store)
+                if time.monotonic() - expired_at >= expire_interval:
+                    expired_at = time.monotonic()
+                    await self.expire(store)
+            except Exception:
+                logger.exception('Persisting idempotency keys failed')
@@ -0,0 +1,96 @@
+"""Start one store writer plus N ingest front-end processes.
+
+    python -m src.launcher --workers 4 --host 0.0.0.0 --port 8080 [--socket /tmp/aggregator.sock]
+
+The writer is the regular app (src.main) with INTERNAL_INGEST=1, served on
+a Unix socket; it alone opens DedupStore. The front-ends (src.frontend) are
+uvicorn workers sharing the public port. On SIGTERM/SIGINT the front-ends
+stop first, then the writer stores everything still queued (up to
+SHUTDOWN_DRAIN_TIMEOUT seconds) and flushes. If either side exits on its
+own the other is stopped too.
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+
+def wait_for_writer(socket_path: str, process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    with httpx.Client(transport=httpx.HTTPTransport(uds=socket_path), base_url='http://writer') as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f'writer exited with code {process.returncode}')
+            try:
+                if client.get('/healthz').status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            time.sleep(0.1)
+    raise RuntimeError(f'writer did not come up on {socket_path} within {timeout}s')
+
+
+def stop(process: subprocess.Popen, timeout: float = 30.0):
+    if process.poll() is None:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m src.launcher',
+                                     description='Store writer plus multi-process ingest front-ends')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='ingest front-end processes')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--socket', help='Unix socket of the writer (default: a temporary path)')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    socket_path = args.socket or os.path.join(tempfile.mkdtemp(prefix='aggregator-'), 'writer.sock')
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+
+    writer = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'src.main:app', '--uds', socket_path, '--no-access-log'],
+        env={**os.environ, 'INTERNAL_INGEST': '1'},
+    )
+    frontends = None
+    stopping = False
+
+    def on_signal(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+    try:
+        wait_for_writer(socket_path, writer)
+        frontends = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'src.frontend:app', '--host', args.host, '--port', str(args.port),
+             '--workers', str(args.workers), '--no-access-log'],
+            env={**os.environ, 'WRITER_SOCKET': socket_path},
+        )
+        while not stopping and writer.poll() is None and frontends.poll() is None:
+            time.sleep(0.2)
+    finally:
+        # front-ends first, so nothing is accepted that the writer can no longer queue
+        if frontends is not None:
+            stop(frontends)
+        stop(writer)
+    # a child that exits on its own is a failure even if its code was 0
+    return 0 if stopping else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,320 @@
+"""Open-loop load generator for the aggregator.
+
+Events are sent on a fixed arrival schedule regardless of how fast the
+service answers, and every latency is measured from the *intended* send
+time, so a stalled server shows up as latency instead of silently lowering
+the offered rate (no coordinated omission).
+
+    python -m src.loadgen --url http://localhost:8080 --rate 2000 --duration 30 \\
+        --duplicate-ratio 0.2 --topics 50 --zipf 1.1 --payload-bytes 256 --output run.hgrm
+    python -m src.loadgen --in-process --replay events.jsonl --rate 500
+"""
+import argparse
+import asyncio
+import bisect
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+
+import httpx
+
+
+class LatencyHistogram:
+    """Log-linear histogram in the spirit of HdrHistogram.
+
+    Values (integer microseconds) below 2 * SUB_BUCKETS are exact; above
+    that each power of two is split into SUB_BUCKETS linear buckets, which
+    keeps ~3 significant digits at any magnitude in a sparse dict.
+    """
+
+    SUB_BITS = 11
+    SUB_BUCKETS = 1 << (SUB_BITS - 1)
+
+    def __init__(self):
+        self.counts: dict[int, int] = {}
+        self.total = 0
+        self.min = None
+        self.max = 0
+        self._sum = 0
+        self._sum_sq = 0
+
+    def _index(self, value: int) -> int:
+        if value < 2 * self.SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - self.SUB_BITS
+        return 2 * self.SUB_BUCKETS + (shift - 1) * self.SUB_BUCKETS + ((value >> shift) - self.SUB_BUCKETS)
+
+    def _highest_equivalent(self, index: int) -> int:
+        if index < 2 * self.SUB_BUCKETS:
+            return index
+        shift, top = divmod(index - 2 * self.SUB_BUCKETS, self.SUB_BUCKETS)
+        shift += 1
+        return ((top + self.SUB_BUCKETS + 1) << shift) - 1
+
+    def record(self, value_us: float):
+        value = max(0, int(value_us))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self._sum += value
+        self._sum_sq += value * value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = max(self.max, value)
+
+    def mean(self) -> float:
+        return self._sum / self.total if self.total else 0.0
+
+    def stddev(self) -> float:
+        if not self.total:
+            return 0.0
+        return math.sqrt(max(0.0, self._sum_sq / self.total - self.mean() ** 2))
+
+    def value_at(self, percentile: float) -> int:
+        if not self.total:
+            return 0
+        target = max(1, math.ceil(percentile / 100 * self.total))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._highest_equivalent(index), self.max)
+        return self.max
+
+    def percentile_report(self, unit_scale: float = 1000.0, ticks_per_half: int = 5) -> str:
+        """HdrHistogram-style percentile distribution (values in ms by default)."""
+        lines = [f"{'Value':>12} {'Percentile':>14} {'TotalCount':>10} {'1/(1-Percentile)':>14}", '']
+        if self.total:
+            indexes = sorted(self.counts)
+            cumulative = list(itertools.accumulate(self.counts[i] for i in indexes))
+            half = 0
+            while True:
+                base = 1 - 0.5 ** half
+                step = 0.5 ** (half + 1) / ticks_per_half
+                done = False
+                for tick in range(ticks_per_half):
+                    p = base + tick * step
+                    pos = bisect.bisect_left(cumulative, max(1, math.ceil(p * self.total)))
+                    value = min(self._highest_equivalent(indexes[pos]), self.max)
+                    inverse = f'{1 / (1 - p):.2f}' if p < 1 else ''
+                    lines.append(f'{value / unit_scale:12.3f} {p:14.12f} {cumulative[pos]:10d} {inverse:>14}')
+                    if cumulative[pos] >= self.total:
+                        done = True
+                        break
+                if done or half > 30:
+                    break
+                half += 1
+            lines.append(f'{self.max / unit_scale:12.3f} {1.0:14.12f} {self.total:10d}')
+        lines.append(f'#[Mean    = {self.mean() / unit_scale:12.3f}, StdDeviation   = {self.stddev() / unit_scale:12.3f}]')
+        lines.append(f'#[Max     = {self.max / unit_scale:12.3f}, Total count    = {self.total:12d}]')
+        lines.append(f'#[Buckets = {len(self.counts):12d}, SubBuckets     = {2 * self.SUB_BUCKETS:12d}]')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self, unit_scale: float = 1000.0) -> dict:
+        return {
+            'count': self.total,
+            'mean': self.mean() / unit_scale,
+            'p50': self.value_at(50) / unit_scale,
+            'p90': self.value_at(90) / unit_scale,
+            'p99': self.value_at(99) / unit_scale,
+            'p99_9': self.value_at(99.9) / unit_scale,
+            'max': self.max / unit_scale,
+        }
+
+
+def zipf_cum_weights(n: int, s: float) -> list[float]:
+    return list(itertools.accumulate(1 / (k ** s) for k in range(1, n + 1)))
+
+
+def synthetic_events(args, rng: random.Random):
+    """Endless stream of (event, is_duplicate) following the configured mix."""
+    run_id = uuid.uuid4().hex[:8]
+    topics = [f'{args.topic_prefix}.{i}' for i in range(args.topics)]
+    cum_weights = zipf_cum_weights(args.topics, args.zipf) if args.zipf > 0 else None
+    filler = 'x' * args.payload_bytes
+    recent = []
+    for seq in itertools.count():
+        if recent and rng.random() < args.duplicate_ratio:
+            yield rng.choice(recent), True
+            continue
+        topic = rng.choices(topics, cum_weights=cum_weights)[0] if cum_weights else rng.choice(topics)
+        event = {
+            'topic': topic,
+            'event_id': f'{run_id}-{seq}',
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'source': 'loadgen',
+            'payload': {'seq': seq, 'data': filler},
+        }
+        if len(recent) < 10000:
+            recent.append(event)
+        else:
+            recent[seq % 10000] = event
+        yield event, False
+
+
+def replay_events(path: str):
+    """Replay Event objects from a JSON-lines file, one event per line."""
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line), False
+
+
+def _epoch(iso: str) -> float:
+    ts = datetime.fromisoformat(iso)
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp()
+
+
+async def _publish(client, batch, intended_wall, results):
+    try:
+        response = await client.post('/publish', json=batch)
+        ok = response.status_code == 200
+    except httpx.HTTPError:
+        ok = False
+    results['publish'].record((time.time() - intended_wall) * 1e6)
+    results['ok' if ok else 'errors'] += len(batch)
+
+
+async def _wait_processed(client, topics, expected, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        per_topic = (await client.get('/stats/topics')).json()
+        if sum(per_topic.get(t, {}).get('unique_processed', 0) for t in topics) >= expected:
+            return True
+        await asyncio.sleep(0.1)
+    return False
+
+
+async def drive(client: httpx.AsyncClient, args) -> dict:
+    rng = random.Random(args.seed)
+    source = replay_events(args.replay) if args.replay else synthetic_events(args, rng)
+    total = args.count if args.count else int(args.rate * args.duration)
+    interval = args.batch / args.rate
+    results = {'publish': LatencyHistogram(), 'ok': 0, 'errors': 0}
+    sent_at: dict[tuple[str, str], float] = {}
+    topics = set()
+    tasks = []
+    max_behind = 0.0
+
+    start_wall = time.time()
+    start = time.monotonic()
+    sent = 0
+    for n in itertools.count():
+        batch = []
+        for event, duplicate in itertools.islice(source, min(args.batch, total - sent)):
+            batch.append(event)
+            topics.add(event['topic'])
+            if not duplicate:
+                sent_at.setdefault((event['topic'], event['event_id']), start_wall + n * interval)
+        if not batch:
+            break
+        sent += len(batch)
+        intended = start + n * interval
+        delay = intended - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            max_behind = max(max_behind, -delay)
+        tasks.append(asyncio.create_task(_publish(client, batch, start_wall + n * interval, results)))
+        if sent >= total:
+            break
+    await asyncio.gather(*tasks)
+    send_seconds = time.monotonic() - start
+
+    processed = LatencyHistogram()
+    complete = await _wait_processed(client, topics, len(sent_at), args.drain_timeout)
+    for topic in topics:
+        rows = (await client.get('/events', params={'topic': topic})).json()
+        for row in rows:
+            intended = sent_at.get((topic, row['event_id']))
+            if intended is not None:
+                processed.record((_epoch(row['processed_at']) - intended) * 1e6)
+
+    return {
+        'sent': sent,
+        'accepted': results['ok'],
+        'errors': results['errors'],
+        'target_rate': args.rate,
+        'achieved_rate': sent / send_seconds if send_seconds else 0.0,
+        'max_sender_lag_ms': max_behind * 1000,
+        'unique_expected': len(sent_at),
+        'drained': complete,
+        'publish_latency_ms': results['publish'].summary(),
+        'processed_latency_ms': processed.summary(),
+        '_histograms': {'publish': results['publish'], 'processed': processed},
+    }
+
+
+async def run(args) -> dict:
+    if not args.in_process:
+        limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+        async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+            return await drive(client, args)
+
+    from .main import create_app
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # a throwaway store unless the caller pointed DEDUP_DB_PATH somewhere
+        own_db = 'DEDUP_DB_PATH' not in os.environ
+        if own_db:
+            os.environ['DEDUP_DB_PATH'] = os.path.join(tmpdir, 'dedup.db')
+        try:
+            app = create_app()
+            async with app.router.lifespan_context(app):
+                transport = httpx.ASGITransport(app=app)
+                async with httpx.AsyncClient(transport=transport, base_url='http://loadgen', timeout=args.timeout) as client:
+                    return await drive(client, args)
+        finally:
+            if own_db:
+                del os.environ['DEDUP_DB_PATH']
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m src.loadgen', description='Open-loop load generator')
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--url', default='http://localhost:8080', help='base URL of a running aggregator')
+    target.add_argument('--in-process', action='store_true', help='drive a fresh app over ASGI in this process')
+    parser.add_argument('--replay', help='JSON-lines file of events to replay instead of synthetic events')
+    parser.add_argument('--rate', type=float, default=1000, help='arrival rate in events/sec')
+    parser.add_argument('--duration', type=float, default=10, help='seconds to run (ignored with --count)')
+    parser.add_argument('--count', type=int, help='total events to send')
+    parser.add_argument('--batch', type=int, default=1, help='events per /publish request')
+    parser.add_argument('--duplicate-ratio', type=float, default=0.0)
+    parser.add_argument('--topics', type=int, default=10)
+    parser.add_argument('--topic-prefix', default='loadgen')
+    parser.add_argument('--zipf', type=float, default=0.0, help='Zipf exponent for topic skew, 0 = uniform')
+    parser.add_argument('--payload-bytes', type=int, default=64)
+    parser.add_argument('--connections', type=int, default=100)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--drain-timeout', type=float, default=60, help='seconds to wait for processing to finish')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--output', help='write the HdrHistogram-style percentile report here')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    report = asyncio.run(run(args))
+    histograms = report.pop('_histograms')
+    text = ''.join(
+        f'# {name} latency (ms, from intended send time)\n{hist.percentile_report()}\n'
+        for name, hist in histograms.items()
+    )
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        sys.stderr.write(text)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
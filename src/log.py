@@ -0,0 +1,107 @@
+import asyncio
+import atexit
+import json
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# attributes every LogRecord has; anything else came in through extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks the caller: when the queue is full the line is dropped and counted."""
+
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                line[key] = value
+        if record.exc_info:
+            line['exc'] = self.formatException(record.exc_info)
+        return json.dumps(line, default=str)
+
+
+def setup_logging(level: str = 'INFO', fmt: str = 'text', queue_size: int = 10000) -> DroppingQueueHandler:
+    """Route all logging through a bounded queue drained by a background thread.
+
+    Callers only pay for building the record; formatting and the write to
+    stderr happen on the listener thread. Returns the queue handler so the
+    dropped-line count can be reported.
+    """
+    q = queue.Queue(maxsize=queue_size)
+    handler = DroppingQueueHandler(q)
+    stream = logging.StreamHandler()
+    stream.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+    listener = QueueListener(q, stream, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(getattr(logging, level.upper()))
+    listener.start()
+    atexit.register(listener.stop)
+    return handler
+
+
+class EventLogSummary:
+    """Counts processed/duplicate events per topic and logs them as one periodic line."""
+
+    TOP_TOPICS = 10
+
+    def __init__(self, logger: logging.Logger, interval: float = 10.0):
+        self.logger = logger
+        self.interval = interval
+        self._counts: dict[str, list[int]] = {}
+
+    def record(self, topic: str, duplicate: bool):
+        counts = self._counts.get(topic)
+        if counts is None:
+            counts = self._counts[topic] = [0, 0]
+        counts[duplicate] += 1
+
+    def flush(self):
+        counts, self._counts = self._counts, {}
+        if not counts or not self.logger.isEnabledFor(logging.INFO):
+            return
+        processed = sum(c[0] for c in counts.values())
+        duplicates = sum(c[1] for c in counts.values())
+        busiest = sorted(counts.items(), key=lambda kv: -(kv[1][0] + kv[1][1]))[:self.TOP_TOPICS]
+        detail = ', '.join(f'{topic}: {p}/{d}' for topic, (p, d) in busiest)
+        if len(counts) > self.TOP_TOPICS:
+            detail += f', ... {len(counts) - self.TOP_TOPICS} more'
+        self.logger.info(
+            '%d processed, %d duplicates in the last %gs (processed/duplicates per topic: %s)',
+            processed, duplicates, self.interval, detail,
+            extra={'processed': processed, 'duplicates': duplicates,
+                   'topics': {t: {'processed': p, 'duplicates': d} for t, (p, d) in counts.items()}},
+        )
+
+    async def run(self):
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                self.flush()
+        finally:
+            self.flush()
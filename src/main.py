@@ -1,81 +1,430 @@
 import asyncio
+import time
 from contextlib import asynccontextmanager
 import logging
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
-from .model import Event
-from .dedup_store import DedupStore
+from .codec import parse_events, publish_openapi, render, unpack_ingest
+from .dedup_store import open_store
+from .http_cache import ResponseCache, dumps
+from .idempotency import MAX_KEY_LENGTH, IdempotencyStore
 from .worker import ConsumerWorker
-from .utils import uptime_seconds
+from .aggregates import AggregationEngine
+from .batching import AdaptiveBatcher
+from .payload_index import PayloadIndex, parse_filters
+from .payload_schema import SchemaRegistry
+from .scheduler import FairQueue
+from .sequence_dedup import SequenceTracker
+from .sketches import SketchRegistry, range_bounds
+from .stats import TopicStatsRegistry
+from .admin import register_admin_routes
+from .cluster import cluster_from_env
+from .debug import register_debug_routes
+from .log import EventLogSummary, setup_logging
+from .maintenance import StoreMaintenance
+from .utils import load_json_env, uptime_seconds
 import os
 
 
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger('aggregator')
-log_level = os.environ.get('LOG_LEVEL', 'INFO')
-logging.basicConfig(
-    level=getattr(logging, log_level),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+log_handler = setup_logging(
+    level=os.environ.get('LOG_LEVEL', 'INFO'),
+    fmt=os.environ.get('LOG_FORMAT', 'text'),
+    queue_size=int(os.environ.get('LOG_QUEUE_SIZE', '10000')),
 )
+logger = logging.getLogger('aggregator')
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    print("Startup : memulai worker...")
+    logger.info("Startup : memulai worker...")
     db_path = os.environ.get('DEDUP_DB_PATH', 'dedup.db')
-    app.state.dedup = DedupStore(db_path)
-    app.state.queue = asyncio.Queue()
+    shards = int(os.environ.get('DEDUP_SHARDS', '1'))
+    batch_size = int(os.environ.get('WORKER_BATCH_SIZE', '256'))
+    app.state.dedup = open_store(db_path, shards)
+    app.state.queue = FairQueue(
+        weights=load_json_env('TOPIC_WEIGHTS', {}),
+        priorities=load_json_env('TOPIC_PRIORITIES', {}),
+        quantum=float(os.environ.get('SCHEDULER_QUANTUM', '1')),
+    )
     app.state.processed_events = []
-    app.state.counters = {'received': 0}
-    app.state.worker = ConsumerWorker(app.state.queue, app.state.dedup, app.state.processed_events)
-    app.state._consumer_task = asyncio.create_task(app.state.worker.start())
+    app.state.counters = {'received': 0, 'forwarded': 0}
+    app.state.ready_max_queue = int(os.environ.get('READY_MAX_QUEUE_DEPTH', '10000'))
+    app.state.draining = False
+    app.state.cluster = cluster_from_env(os.environ)
+    app.state.response_cache = ResponseCache(int(os.environ.get('RESPONSE_CACHE_ENTRIES', '256')))
+    sequenced_topics = load_json_env('SEQUENCED_TOPICS', {})
+    app.state.sequences = (
+        SequenceTracker(sequenced_topics, app.state.dedup.load_sequence_marks()) if sequenced_topics else None
+    )
+    app.state.sketches = None
+    if os.environ.get('SKETCHES', '1') == '1':
+        app.state.sketches = SketchRegistry(
+            p=int(os.environ.get('SKETCH_PRECISION', '12')),
+            bucket_seconds=int(os.environ.get('SKETCH_BUCKET_SECONDS', '3600')),
+            retention=int(os.environ.get('SKETCH_RETENTION_BUCKETS', '24')),
+            rows=app.state.dedup.load_sketches(),
+        )
+    app.state.idempotency = IdempotencyStore(
+        max_entries=int(os.environ.get('IDEMPOTENCY_MAX_KEYS', '100000')),
+        ttl=float(os.environ.get('IDEMPOTENCY_TTL', '86400')),
+        rows=app.state.dedup.load_idempotency(),
+    )
+    app.state.schemas = SchemaRegistry(app.state.dedup.load_schemas())
+    # configured schemas win over ones registered through the admin API in an earlier run
+    for topic, schema in load_json_env('PAYLOAD_SCHEMAS', {}).items():
+        try:
+            version = app.state.schemas.register(topic, schema)
+        except ValueError as e:
+            raise ValueError(f'PAYLOAD_SCHEMAS[{topic!r}]: {e}') from None
+        if version is not None:
+            app.state.dedup.save_schema(*app.state.schemas.row(topic))
+    app.state.topic_stats = TopicStatsRegistry()
+    app.state.aggregates = AggregationEngine(load_json_env('AGGREGATES', []))
+    app.state.payload_index = PayloadIndex(load_json_env('PAYLOAD_INDEXES', {}))
+    app.state.log_summary = EventLogSummary(
+        logging.getLogger('worker'), float(os.environ.get('LOG_SUMMARY_INTERVAL', '10')),
+    )
+    batcher = None
+    if os.environ.get('WORKER_ADAPTIVE', '1') == '1':
+        batcher = AdaptiveBatcher(
+            target_p99=float(os.environ.get('WORKER_TARGET_P99_MS', '50')) / 1000,
+            initial_batch=batch_size,
+            max_batch=int(os.environ.get('WORKER_MAX_BATCH_SIZE', '4096')),
+            max_linger=float(os.environ.get('WORKER_MAX_LINGER_MS', '5')) / 1000,
+        )
+    app.state.worker = ConsumerWorker(
+        app.state.queue, app.state.dedup, app.state.processed_events,
+        batch_size=batch_size, topic_stats=app.state.topic_stats,
+        aggregates=app.state.aggregates, payload_index=app.state.payload_index,
+        log_summary=app.state.log_summary, sequences=app.state.sequences,
+        sketches=app.state.sketches, batcher=batcher,
+        max_retries=int(os.environ.get('WORKER_MAX_RETRIES', '5')),
+        retry_base=float(os.environ.get('WORKER_RETRY_BASE_MS', '50')) / 1000,
+        retry_max=float(os.environ.get('WORKER_RETRY_MAX_MS', '2000')) / 1000,
+    )
+    idle_after = float(os.environ.get('MAINTENANCE_IDLE_SECONDS', '1'))
+    worker = app.state.worker
+    app.state.maintenance = StoreMaintenance(
+        app.state.dedup,
+        is_idle=lambda: app.state.queue.qsize() == 0 and (
+            worker.last_batch_at is None or time.monotonic() - worker.last_batch_at >= idle_after
+        ),
+        budget=float(os.environ.get('MAINTENANCE_BUDGET_MS', '20')) / 1000,
+        interval=float(os.environ.get('MAINTENANCE_INTERVAL', '60')),
+        optimize_interval=float(os.environ.get('MAINTENANCE_OPTIMIZE_INTERVAL', '3600')),
+    )
+    timer = getattr(app.state, 'handle_timer', None)
+    if timer is not None:
+        app.state.worker._handle = timer.wrap('ConsumerWorker._handle', app.state.worker._handle)
+    app.state._consumer_task = asyncio.create_task(app.state.worker.supervise(
+        float(os.environ.get('WORKER_RESTART_DELAY', '1')),
+    ))
+    app.state._log_summary_task = asyncio.create_task(app.state.log_summary.run())
+    app.state._maintenance_task = asyncio.create_task(app.state.maintenance.run())
+    app.state._idempotency_task = asyncio.create_task(app.state.idempotency.run(
+        app.state.dedup, float(os.environ.get('IDEMPOTENCY_FLUSH_INTERVAL', '1')),
+        float(os.environ.get('IDEMPOTENCY_EXPIRE_INTERVAL', '60')),
+    ))
+    if app.state.sketches is not None:
+        app.state._sketch_task = asyncio.create_task(app.state.sketches.run(
+            app.state.dedup, float(os.environ.get('SKETCH_PERSIST_INTERVAL', '30')),
+        ))
     try:
         yield
     finally:
-        print("Shutdown : menghentikan worker...")
+        logger.info("Shutdown : menghentikan worker...")
+        app.state.draining = True
+        task = getattr(app.state, '_consumer_task', None)
+        if task is not None and not task.done():
+            # every queued event was acknowledged to its publisher; store it before stopping
+            try:
+                await asyncio.wait_for(app.state.queue.join(), float(os.environ.get('SHUTDOWN_DRAIN_TIMEOUT', '20')))
+            except asyncio.TimeoutError:
+                logger.warning("Shutdown : %d event di queue tidak sempat disimpan", app.state.queue.qsize())
         app.state.worker.stop()
         if hasattr(app.state, '_consumer_task'):
             app.state._consumer_task.cancel()
+        await app.state.worker.flush_dead_letters()
+        app.state._log_summary_task.cancel()
+        app.state._maintenance_task.cancel()
+        if app.state.sketches is not None:
+            app.state._sketch_task.cancel()
+            await app.state.sketches.flush(app.state.dedup)
+        app.state._idempotency_task.cancel()
+        await app.state.idempotency.flush(app.state.dedup)
+        if app.state.cluster is not None:
+            await app.state.cluster.close()
+        app.state.dedup.close()
 
 def create_app() -> FastAPI:
     app = FastAPI(title='UTS PubSub Aggregator', lifespan=lifespan)
     app.add_middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])
+    if os.environ.get('DEBUG_ENDPOINTS') == '1':
+        # profiler and tracemalloc are never served unguarded, like /admin without ADMIN_TOKEN
+        if os.environ.get('DEBUG_TOKEN'):
+            register_debug_routes(app)
+        else:
+            logger.warning('DEBUG_ENDPOINTS=1 diabaikan: DEBUG_TOKEN tidak di-set')
+    if os.environ.get('ADMIN_TOKEN'):
+        register_admin_routes(app)
+
+    # Probes only read in-memory state: they never touch SQLite, so frequent
+    # polling cannot compete with the worker for the store lock.
+    @app.get('/healthz')
+    async def healthz():
+        task = getattr(app.state, '_consumer_task', None)
+        if task is None or task.done():
+            return Response(content=b'{"status":"down"}', status_code=503, media_type='application/json')
+        return Response(content=b'{"status":"ok"}', media_type='application/json')
 
-    @app.post('/publish')
-    async def publish(payload: Event | list[Event]):
-        try:
-            if isinstance(payload, Event):
-                events = [payload.model_dump()]
-            elif isinstance(payload, list):
-                events = [p.model_dump() for p in payload]
 
-            for e in events:
-                await app.state.queue.put(e)
-                app.state.counters['received'] += 1
+    @app.get('/readyz')
+    async def readyz():
+        health = app.state.worker.health()
+        task = getattr(app.state, '_consumer_task', None)
+        depth = app.state.queue.qsize()
+        checks = {
+            'worker': task is not None and not task.done() and health['status'] in ('ok', 'failing'),
+            'queue': depth < app.state.ready_max_queue,
+            # the last commit went through and no dead letters are waiting for the store
+            'store': not health['consecutive_failures'] and not health['dead_letters_unsaved'],
+            'accepting': not app.state.draining,
+        }
+        ready = all(checks.values())
+        return Response(
+            content=dumps({'ready': ready, 'checks': checks, 'queue_depth': depth}),
+            status_code=200 if ready else 503, media_type='application/json',
+        )
 
+
+    @app.post('/publish', openapi_extra=publish_openapi())
+    async def publish(request: Request):
+        key = request.headers.get('idempotency-key')
+        if key is None:
+            return await _publish(request)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f'Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters')
+
+        # A retry is answered from the stored response without validating,
+        # queueing or deduplicating anything again.
+        idempotency = app.state.idempotency
+        fingerprint = idempotency.fingerprint(await request.body())
+        stored = idempotency.get(key)
+        if stored is not None:
+            if stored.fingerprint != fingerprint:
+                raise HTTPException(status_code=422, detail='Idempotency-Key was already used with a different body')
+            return Response(content=stored.body, status_code=stored.status, media_type='application/json',
+                            headers={'Idempotent-Replayed': 'true'})
+        if not idempotency.begin(key):
+            raise HTTPException(status_code=409, detail='A request with this Idempotency-Key is in progress')
+        try:
+            result = await _publish(request)
+        finally:
+            idempotency.end(key)
+        idempotency.put(key, fingerprint, 200, dumps(result))
+        return result
+
+    async def _publish(request: Request):
+        payload = await parse_events(request)
+        try:
+            events = [p.model_dump() for p in payload]
+            rejected = []
+            cluster = app.state.cluster
+            # batches forwarded by a member were already validated by the node that received them;
+            # anyone else claiming to be a peer is treated like any other client
+            forwarded = cluster is not None and cluster.is_peer(request.headers)
+            if not forwarded:
+                events, rejected = app.state.schemas.check(events)
+                if not events and rejected:
+                    raise HTTPException(status_code=422, detail={'accepted': 0, 'rejected': rejected})
+            await _accept(events, route=not forwarded)
+            if rejected:
+                return {'accepted': len(events), 'rejected': rejected}
             return {'accepted': len(events)}
+        except HTTPException:
+            raise
         except Exception as e:
-            logger.error(f"Error publishing events: {e}")
+            logger.error("Error publishing events: %s", e)
             raise HTTPException(status_code=500, detail=str(e))
 
+    async def _accept(events: list[dict], route: bool):
+        local = events
+        cluster = app.state.cluster
+        # forwarded batches were already routed by the sender; never re-forward
+        if cluster is not None and route:
+            local, remote = cluster.split(events)
+            if remote:
+                try:
+                    await cluster.forward(remote)
+                except Exception as e:
+                    raise HTTPException(status_code=502, detail=f'Forwarding to topic owner failed: {e}')
+                app.state.counters['forwarded'] += len(events) - len(local)
+
+        for e in local:
+            await app.state.queue.put(e)
+            app.state.counters['received'] += 1
+
+    if os.environ.get('INTERNAL_INGEST') == '1':
+        @app.post('/internal/ingest')
+        async def internal_ingest(request: Request):
+            # rows were parsed and validated by an ingest front-end (src/frontend.py);
+            # only those checked against another schema version than ours are validated again
+            events, versions = unpack_ingest(await request.body())
+            schemas = app.state.schemas
+            stale = [i for i, (e, v) in enumerate(zip(events, versions)) if schemas.version(e['topic']) != v]
+            rejected = []
+            if stale:
+                _, late = schemas.check([events[i] for i in stale])
+                rejected = [{**r, 'index': stale[r['index']]} for r in late]
+                if rejected:
+                    bad = {r['index'] for r in rejected}
+                    events = [e for i, e in enumerate(events) if i not in bad]
+            await _accept(events, route=True)
+            if rejected:
+                return {'accepted': len(events), 'rejected': rejected}
+            return {'accepted': len(events)}
+
 
     @app.get('/events')
-    async def get_events(topic: str = Query(None)):
-        if topic:
-            rows = app.state.dedup.list_events_for_topic(topic)
-            return [{'event_id': r[0], 'processed_at': r[1]} for r in rows]
-        return app.state.processed_events
+    async def get_events(request: Request, topic: str = Query(None)):
+        filters = parse_filters(request.query_params.multi_items())
+        if filters and not topic:
+            raise HTTPException(status_code=400, detail='Payload filters require a topic')
+
+        def build():
+            if filters:
+                try:
+                    records = app.state.payload_index.query(topic, filters)
+                except KeyError as e:
+                    raise HTTPException(status_code=400, detail=e.args[0])
+                return [r.to_dict() for r in records]
+            if topic and app.state.sequences is not None and topic in app.state.sequences.topics:
+                # sequenced topics keep no per-event rows; list the stored events instead
+                return [{'event_id': r.event_id, 'processed_at': r.processed_at}
+                        for r in app.state.processed_events if r.topic == topic]
+            if topic:
+                rows = app.state.dedup.list_events_for_topic(topic)
+                return [{'event_id': r[0], 'processed_at': r[1]} for r in rows]
+            # records are kept compact; the dicts only exist for the response
+            return [r.to_dict() for r in app.state.processed_events]
+
+        return app.state.response_cache.respond(
+            request, app.state.worker.version, build, params=(topic, tuple(sorted(filters))),
+        )
+
+
+    @app.get('/schemas')
+    async def schemas(request: Request):
+        return render(request, app.state.schemas.describe())
+
+
+    @app.get('/schemas/{topic}')
+    async def schema_detail(request: Request, topic: str):
+        described = app.state.schemas.describe(topic)
+        if described is None:
+            raise HTTPException(status_code=404, detail=f'No schema for topic: {topic}')
+        return render(request, described)
+
+
+    @app.get('/indexes')
+    async def indexes(request: Request):
+        return render(request, app.state.payload_index.describe())
 
 
     @app.get('/stats')
-    async def stats():
-        unique = app.state.dedup.count_processed()
-        return {
-                'received': app.state.counters['received'],
+    async def stats(request: Request, scope: str = Query('node')):
+        if scope not in ('node', 'cluster'):
+            raise HTTPException(status_code=400, detail=f'Unknown scope: {scope}')
+        cache = app.state.response_cache
+        version = app.state.worker.version
+        # the store is only re-queried after a commit; counters are always fresh
+        unique, topics = cache.memo('stats', version, lambda: (
+            app.state.dedup.count_processed(), app.state.dedup.list_topics(),
+        ))
+        counters = app.state.counters
+        worker = app.state.worker
+        maintenance = app.state.maintenance
+
+        # only built when a body is sent: a 304 must not pay for the storage PRAGMAs
+        def build():
+            local = {
+                'received': counters['received'],
                 'unique_processed': unique,
-                'duplicate_dropped': app.state.counters['received'] - unique,
-                'topics': app.state.dedup.list_topics(),
+                'duplicate_dropped': counters['received'] - unique - worker.dead_lettered,
+                'topics': topics,
                 'uptime_seconds': uptime_seconds(),
-        }
+                'log_lines_dropped': log_handler.dropped,
+                'storage': maintenance.snapshot(
+                    cache.memo('storage', (version, maintenance.runs), maintenance.storage_info),
+                ),
+                'worker': worker.stats(),
+            }
+            if app.state.cluster is not None:
+                local['forwarded'] = counters['forwarded']
+            return local
+
+        if app.state.cluster is not None and scope == 'cluster':
+            return render(request, await app.state.cluster.gather_stats(build()))
+        # uptime is not part of the validator, hence a weak ETag
+        return cache.respond(
+            request, (version, counters['received'], counters['forwarded'], log_handler.dropped,
+                      maintenance.runs, worker.health_version),
+            build, weak=True, store=False,
+        )
+
+
+    @app.get('/stats/topics')
+    async def topic_stats(request: Request):
+        return render(request, app.state.topic_stats.snapshot())
+
+
+    @app.get('/stats/topics/{topic}')
+    async def topic_stats_detail(request: Request, topic: str):
+        snapshot = app.state.topic_stats.get(topic)
+        if snapshot is None:
+            raise HTTPException(status_code=404, detail=f'Unknown topic: {topic}')
+        return render(request, snapshot)
+
+
+    @app.get('/stats/distinct')
+    async def distinct_stats(request: Request):
+        if app.state.sketches is None:
+            raise HTTPException(status_code=404, detail='Sketches are disabled')
+        summary = app.state.response_cache.memo('distinct', app.state.worker.version, app.state.sketches.summary)
+        return render(request, summary)
+
+
+    @app.get('/stats/distinct/{dim}/{name}')
+    async def distinct_detail(request: Request, dim: str, name: str,
+                              since: str = Query(None), until: str = Query(None)):
+        if app.state.sketches is None:
+            raise HTTPException(status_code=404, detail='Sketches are disabled')
+        try:
+            result = app.state.sketches.query(dim, name, *range_bounds(since, until))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if result is None:
+            raise HTTPException(status_code=404, detail=f'Unknown {dim}: {name}')
+        return render(request, result)
+
+
+    @app.get('/stats/queue')
+    async def queue_stats(request: Request):
+        return render(request, {
+            'depth': app.state.queue.qsize(),
+            'topics': app.state.queue.topic_snapshot(),
+        })
+
+
+    @app.get('/aggregates')
+    async def aggregates(request: Request, topic: str = Query(None)):
+        return render(request, app.state.aggregates.snapshot(topic))
+
+
+    @app.get('/aggregates/{name}')
+    async def aggregate_detail(request: Request, name: str):
+        snapshot = app.state.aggregates.get(name)
+        if snapshot is None:
+            raise HTTPException(status_code=404, detail=f'Unknown aggregate: {name}')
+        return render(request, snapshot)
     return app
 app = create_app()
\ No newline at end of file
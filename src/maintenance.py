@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import time
+from typing import Callable
+
+from .stats import _iso
+
+
+logger = logging.getLogger('maintenance')
+
+
+class StoreMaintenance:
+    """Returns free pages, refreshes statistics and checkpoints the WAL while ingest is idle.
+
+    Every step holds the store's writer lock, so each one is kept under
+    ``budget`` seconds: incremental vacuum is sized from the measured cost
+    per page, and the loop yields (re-checking ``is_idle``) between steps.
+    Work is abandoned for this round as soon as load returns.
+    """
+
+    MIN_PAGES = 8
+    MAX_PAGES = 4096
+
+    def __init__(self, store, is_idle: Callable[[], bool], budget: float = 0.02,
+                 interval: float = 60.0, optimize_interval: float = 3600.0):
+        self.store = store
+        self.is_idle = is_idle
+        self.budget = budget
+        self.interval = interval
+        self.optimize_interval = optimize_interval
+        self._pages_per_step = 64
+        self._last_optimize = None
+        self.runs = 0
+        self.deferred = 0
+        self.last = {}
+
+    @property
+    def _shards(self):
+        return getattr(self.store, 'shards', [self.store])
+
+    def storage_info(self) -> dict:
+        infos = [shard.storage_info() for shard in self._shards]
+        return {
+            'db_bytes': sum(i['db_bytes'] for i in infos),
+            'free_pages': sum(i['free_pages'] for i in infos),
+            'wal_bytes': sum(i['wal_bytes'] for i in infos),
+            'auto_vacuum': infos[0]['auto_vacuum'],
+        }
+
+    async def _timed(self, fn, *args):
+        started = time.perf_counter()
+        result = await asyncio.to_thread(fn, *args)
+        elapsed = time.perf_counter() - started
+        self._max_step = max(self._max_step, elapsed)
+        return result, elapsed
+
+    async def run_once(self) -> bool:
+        """One maintenance round; False if it was deferred or cut short by load."""
+        if not self.is_idle():
+            self.deferred += 1
+            return False
+        self._max_step = 0.0
+        report = {'checkpoint_ms': 0.0, 'wal_busy': False, 'vacuum_ms': 0.0, 'vacuum_pages': 0, 'optimize_ms': None}
+        complete = True
+        for shard in self._shards:
+            if shard.storage_info()['auto_vacuum'] == 'incremental':
+                while shard.storage_info()['free_pages']:
+                    if not self.is_idle():
+                        complete = False
+                        break
+                    freed, elapsed = await self._timed(shard.incremental_vacuum, self._pages_per_step)
+                    report['vacuum_ms'] += elapsed * 1000
+                    report['vacuum_pages'] += freed
+                    if not freed:
+                        break
+                    per_page = elapsed / freed
+                    self._pages_per_step = max(self.MIN_PAGES, min(self.MAX_PAGES, int(self.budget * 0.8 / per_page)))
+                    await asyncio.sleep(0)
+
+        now = time.monotonic()
+        if complete and (self._last_optimize is None or now - self._last_optimize >= self.optimize_interval):
+            if self.is_idle():
+                report['optimize_ms'] = 0.0
+                for shard in self._shards:
+                    _, elapsed = await self._timed(shard.optimize)
+                    report['optimize_ms'] += elapsed * 1000
+                self._last_optimize = now
+
+        # last, so the pages the steps above wrote to the WAL are folded back too
+        for shard in self._shards:
+            (busy, _, _), elapsed = await self._timed(shard.checkpoint)
+            report['checkpoint_ms'] += elapsed * 1000
+            report['wal_busy'] |= bool(busy)
+
+        self.runs += 1
+        self.last = {
+            **report,
+            'finished_at': _iso(time.time()),
+            'max_step_ms': self._max_step * 1000,
+            'complete': complete,
+        }
+        return complete
+
+    async def run(self):
+        """Run a round every ``interval`` seconds; a deferred round is retried sooner."""
+        delay = self.interval
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                done = await self.run_once()
+            except Exception:
+                logger.exception('Store maintenance failed')
+                done = True
+            delay = self.interval if done else min(self.interval, 5.0)
+
+    def snapshot(self, storage: dict | None = None) -> dict:
+        """``storage`` reuses a storage_info() result taken since the last commit or run."""
+        return {
+            **(storage if storage is not None else self.storage_info()),
+            'maintenance': {
+                'runs': self.runs,
+                'deferred': self.deferred,
+                'budget_ms': self.budget * 1000,
+                'vacuum_pages_per_step': self._pages_per_step,
+                'last': self.last or None,
+            },
+        }
@@ -1,5 +1,7 @@
+import sys
+import msgpack
 from pydantic import BaseModel, Field, field_validator
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Any, Dict
 
 
@@ -15,4 +17,62 @@ class Event(BaseModel):
     def check_timestamp_format(cls, v: int):
         if not isinstance(v, datetime):
             raise ValueError('timestamp must be a datetime object')
-        return v
\ No newline at end of file
+        return v
+
+# msgpack stops at 64-bit integers while JSON does not; larger ones travel as
+# this extension type (decimal digits) so stored payloads round-trip unchanged
+BIGINT_EXT = 1
+
+
+def ext_hook(code: int, data: bytes):
+    if code == BIGINT_EXT:
+        return int(data)
+    return msgpack.ExtType(code, data)
+
+
+_EPOCH = datetime(1970, 1, 1)
+_ONE_US = timedelta(microseconds=1)
+
+
+def to_micros(ts: datetime) -> int:
+    """Naive UTC datetime to integer microseconds since the epoch (exact, no float rounding)."""
+    return (ts - _EPOCH) // _ONE_US
+
+
+def from_micros(us: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=us)
+
+
+class EventRecord:
+    """Compact in-memory form of a processed event.
+
+    Topic and source are interned (few distinct values, many events),
+    processed_at is kept as integer microseconds and the payload as
+    msgpack bytes. The dict that /events returns is only built by to_dict().
+    """
+
+    __slots__ = ('topic', 'event_id', 'source', 'processed_at_us', 'packed_payload')
+
+    def __init__(self, topic: str, event_id: str, source: str | None, processed_at_us: int, packed_payload: bytes):
+        self.topic = sys.intern(topic)
+        self.event_id = event_id
+        self.source = sys.intern(source) if source is not None else None
+        self.processed_at_us = processed_at_us
+        self.packed_payload = packed_payload
+
+    @property
+    def processed_at(self) -> str:
+        return from_micros(self.processed_at_us).isoformat()
+
+    @property
+    def payload(self) -> Dict[str, Any]:
+        return msgpack.unpackb(self.packed_payload, raw=False, ext_hook=ext_hook)
+
+    def to_dict(self) -> dict:
+        return {
+            'topic': self.topic,
+            'event_id': self.event_id,
+            'processed_at': self.processed_at,
+            'source': self.source,
+            'payload': self.payload,
+        }
@@ -0,0 +1,148 @@
+import bisect
+from typing import Any, Iterable
+
+from .utils import get_path
+
+
+OPERATORS = ('eq', 'gt', 'gte', 'lt', 'lte')
+
+
+def _key(value: Any):
+    """Index key keeping numbers, strings and other scalars apart (True must not match 1)."""
+    if isinstance(value, bool) or value is None:
+        return ('o', value)
+    if isinstance(value, (int, float)):
+        return ('n', value)
+    if isinstance(value, str):
+        return ('s', value)
+    return None
+
+
+def _number(raw: str) -> int | float | None:
+    try:
+        return int(raw)
+    except ValueError:
+        try:
+            return float(raw)
+        except ValueError:
+            return None
+
+
+def _range_key(raw: str) -> tuple:
+    number = _number(raw)
+    return ('s', raw) if number is None else ('n', number)
+
+
+def _query_keys(raw: str) -> list[tuple]:
+    """A query-string value may address a string or a number ('123' matches both)."""
+    keys = [('s', raw)]
+    number = _number(raw)
+    if number is not None:
+        keys.append(('n', number))
+    if raw in ('true', 'false'):
+        keys.append(('o', raw == 'true'))
+    elif raw == 'null':
+        keys.append(('o', None))
+    return keys
+
+
+class FieldIndex:
+    """Side index for one (topic, payload path): hash lookup for equality,
+    sorted distinct keys for range scans."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._postings: dict[tuple, list] = {}
+        self._sorted: dict[str, list] = {'n': [], 's': []}
+
+    def add(self, event: dict, record: Any):
+        key = _key(get_path(event, self.path))
+        if key is None:
+            return
+        postings = self._postings.get(key)
+        if postings is None:
+            postings = self._postings[key] = []
+            if key[0] in self._sorted:
+                bisect.insort(self._sorted[key[0]], key[1])
+        postings.append(record)
+
+    def lookup(self, op: str, raw: str) -> list:
+        if op == 'eq':
+            out = []
+            for key in _query_keys(raw):
+                out.extend(self._postings.get(key, ()))
+            return out
+        kind, bound = _range_key(raw)
+        keys = self._sorted[kind]
+        if op in ('gt', 'gte'):
+            lo = bisect.bisect_right(keys, bound) if op == 'gt' else bisect.bisect_left(keys, bound)
+            selected = keys[lo:]
+        else:
+            hi = bisect.bisect_left(keys, bound) if op == 'lt' else bisect.bisect_right(keys, bound)
+            selected = keys[:hi]
+        out = []
+        for value in selected:
+            out.extend(self._postings[(kind, value)])
+        return out
+
+    def cardinality(self) -> int:
+        return len(self._postings)
+
+
+def parse_filters(params: Iterable[tuple[str, str]]) -> list[tuple[str, str, str]]:
+    """Turn ``payload.amount__gte=10`` style query params into (path, op, value)."""
+    filters = []
+    for name, value in params:
+        if not name.startswith('payload.'):
+            continue
+        path, sep, op = name.rpartition('__')
+        if not sep or op not in OPERATORS:
+            path, op = name, 'eq'
+        filters.append((path, op, value))
+    return filters
+
+
+class PayloadIndex:
+    """Per-topic indexes over payload paths of the events kept in memory."""
+
+    def __init__(self, declared: dict[str, list[str]] | None = None):
+        self._indexes: dict[str, dict[str, FieldIndex]] = {}
+        for topic, paths in (declared or {}).items():
+            for path in paths:
+                self.declare(topic, path)
+
+    def declare(self, topic: str, path: str):
+        if not path.startswith('payload.'):
+            raise ValueError(f'indexed path must start with "payload.": {path!r}')
+        self._indexes.setdefault(topic, {}).setdefault(path, FieldIndex(path))
+
+    def add(self, event: dict, record: Any):
+        fields = self._indexes.get(event['topic'])
+        if fields:
+            for field in fields.values():
+                field.add(event, record)
+
+    def query(self, topic: str, filters: list[tuple[str, str, str]]) -> list:
+        """AND all filters; the first runs as an index lookup, the rest narrow its result set.
+
+        Raises KeyError if a filtered path is not indexed for the topic.
+        """
+        fields = self._indexes.get(topic, {})
+        missing = [path for path, _, _ in filters if path not in fields]
+        if missing:
+            raise KeyError(f'not indexed for topic {topic!r}: {", ".join(missing)}')
+        result = None
+        for path, op, value in filters:
+            matched = fields[path].lookup(op, value)
+            if result is None:
+                result = matched
+            else:
+                ids = {id(r) for r in matched}
+                result = [r for r in result if id(r) in ids]
+        return result or []
+
+    def describe(self) -> dict[str, dict[str, int]]:
+        return {
+            topic: {path: field.cardinality() for path, field in fields.items()}
+            for topic, fields in self._indexes.items()
+        }
@@ -0,0 +1,233 @@
+import json
+from typing import Annotated, Any, Literal, Union
+
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, ValidationError
+from pydantic_core import SchemaError
+# pydantic needs the typing_extensions flavour on Python < 3.12
+from typing_extensions import NotRequired, Required, TypedDict
+
+
+# keywords that only document a schema
+_ANNOTATIONS = {'$schema', '$id', '$comment', 'title', 'description', 'default', 'examples'}
+_KEYWORDS = {
+    'type', 'properties', 'required', 'additionalProperties', 'items', 'enum', 'const',
+    'minimum', 'maximum', 'exclusiveMinimum', 'exclusiveMaximum', 'minLength', 'maxLength', 'pattern',
+    'minItems', 'maxItems',
+} | _ANNOTATIONS
+_SCALARS = {'string': str, 'integer': int, 'number': float, 'boolean': bool, 'null': None}
+_CONSTRAINTS = {
+    'string': {'minLength': 'min_length', 'maxLength': 'max_length', 'pattern': 'pattern'},
+    'integer': {'minimum': 'ge', 'maximum': 'le', 'exclusiveMinimum': 'gt', 'exclusiveMaximum': 'lt'},
+    'array': {'minItems': 'min_length', 'maxItems': 'max_length'},
+}
+_CONSTRAINTS['number'] = _CONSTRAINTS['integer']
+_BOUNDS = {'minimum', 'maximum', 'exclusiveMinimum', 'exclusiveMaximum'}
+_LENGTHS = {'minLength', 'maxLength', 'minItems', 'maxItems'}
+
+
+def _check_shapes(schema: dict, path: str):
+    """Reject keyword values of the wrong JSON type before they reach pydantic."""
+    kind = schema.get('type')
+    if kind is not None and not isinstance(kind, str) and not (
+            isinstance(kind, list) and kind and all(isinstance(k, str) for k in kind)):
+        raise ValueError(f'{path}: type must be a string or a non-empty list of strings')
+    if not isinstance(schema.get('properties', {}), dict):
+        raise ValueError(f'{path}: properties must be an object')
+    required = schema.get('required', [])
+    if not isinstance(required, list) or not all(isinstance(name, str) for name in required):
+        raise ValueError(f'{path}: required must be a list of strings')
+    if 'enum' in schema and not (isinstance(schema['enum'], list) and schema['enum']):
+        raise ValueError(f'{path}: enum must be a non-empty list')
+    for key in _BOUNDS & set(schema):
+        if isinstance(schema[key], bool) or not isinstance(schema[key], (int, float)):
+            raise ValueError(f'{path}: {key} must be a number')
+    for key in _LENGTHS & set(schema):
+        if isinstance(schema[key], bool) or not isinstance(schema[key], int) or schema[key] < 0:
+            raise ValueError(f'{path}: {key} must be a non-negative integer')
+    if 'pattern' in schema:
+        if not isinstance(schema['pattern'], str):
+            raise ValueError(f'{path}: pattern must be a string')
+        try:
+            # pydantic's regex engine, not re: the two accept different syntax
+            TypeAdapter(Annotated[str, Field(pattern=schema['pattern'])])
+        except SchemaError:
+            raise ValueError(f'{path}: pattern {schema["pattern"]!r} is not a valid regex') from None
+
+
+def _constrained(tp, kind: str, schema: dict):
+    constraints = {arg: schema[key] for key, arg in _CONSTRAINTS.get(kind, {}).items() if key in schema}
+    return Annotated[tp, Field(**constraints)] if constraints else tp
+
+
+def _compile(schema: Any, path: str, models: list):
+    """Translate a JSON Schema node (the subset above) into a strict pydantic type.
+
+    Objects become TypedDicts rather than models: pydantic-core validates
+    them without building instances, several times faster per payload.
+    """
+    if schema is True or schema == {}:
+        return Any
+    if not isinstance(schema, dict):
+        raise ValueError(f'{path}: schema must be an object')
+    unknown = set(schema) - _KEYWORDS
+    if unknown:
+        raise ValueError(f'{path}: unsupported keyword(s) {", ".join(sorted(unknown))}')
+    _check_shapes(schema, path)
+    if 'const' in schema:
+        return Literal[schema['const']]
+    if 'enum' in schema:
+        return Literal[tuple(schema['enum'])]
+
+    kind = schema.get('type')
+    if kind is None:
+        return Any
+    if isinstance(kind, list):
+        return Union[tuple(_compile({**schema, 'type': k}, path, models) for k in kind)]
+    if kind == 'object':
+        properties = schema.get('properties') or {}
+        extra = schema.get('additionalProperties', True)
+        if not isinstance(extra, bool):
+            raise ValueError(f'{path}: additionalProperties must be true or false')
+        required = set(schema.get('required', ()))
+        if not properties and not required and extra:
+            return dict[str, Any]
+        fields = {}
+        for name, sub in properties.items():
+            tp = _compile(sub, f'{path}.{name}', models)
+            # an absent optional property is fine; an explicit null still has to match the type
+            fields[name] = Required[tp] if name in required else NotRequired[tp]
+        for name in required - set(fields):
+            fields[name] = Required[Any]
+        model = TypedDict(f'Payload{len(models)}', fields)
+        model.__pydantic_config__ = ConfigDict(extra='allow' if extra else 'forbid', strict=True)
+        models.append(model)
+        return model
+    if kind == 'array':
+        return _constrained(list[_compile(schema.get('items', True), f'{path}[]', models)], kind, schema)
+    if kind not in _SCALARS:
+        raise ValueError(f'{path}: unknown type {kind!r}')
+    return _constrained(_SCALARS[kind], kind, schema)
+
+
+def compile_schema(schema: dict | type[BaseModel]) -> TypeAdapter:
+    """Batch validator for one topic: validates a list of payloads in one call."""
+    if isinstance(schema, type) and issubclass(schema, BaseModel):
+        return TypeAdapter(list[schema])
+    if not isinstance(schema, dict) or schema.get('type', 'object') != 'object':
+        raise ValueError('payload schema must describe an object')
+    try:
+        return TypeAdapter(list[_compile(schema, 'payload', [])])
+    except (SchemaError, TypeError) as e:
+        # e.g. a pattern that is not a valid regex or an unhashable enum value
+        raise ValueError(f'payload: {e}') from e
+
+
+class SchemaRegistry:
+    """Topic -> payload schema (a JSON Schema subset or a pydantic model).
+
+    Each schema is compiled once into a list validator cached under
+    (topic, version); registering a different schema bumps the version so a
+    stale validator is never used. ``validate`` checks every payload of a
+    batch with one pydantic call per schema'd topic.
+    """
+
+    def __init__(self, rows=()):
+        self._schemas: dict[str, tuple[int, Any]] = {}
+        self._validators: dict[tuple[str, int], TypeAdapter] = {}
+        self._counts: dict[str, list[int]] = {}
+        for topic, version, text in rows:
+            schema = json.loads(text)
+            self._validators[(topic, version)] = compile_schema(schema)
+            self._schemas[topic] = (version, schema)
+
+    def __contains__(self, topic: str) -> bool:
+        return topic in self._schemas
+
+    def version(self, topic: str) -> int:
+        """Current schema version of ``topic``, 0 if it has none."""
+        current = self._schemas.get(topic)
+        return current[0] if current is not None else 0
+
+    def register(self, topic: str, schema: dict | type[BaseModel], version: int | None = None) -> int | None:
+        """Compile and install ``schema``; returns the new version, None if it is unchanged.
+
+        ``version`` pins the number instead of bumping it (a front-end mirroring
+        the writer's registry). Raises ValueError for schemas outside the
+        supported subset.
+        """
+        current = self._schemas.get(topic)
+        if current is not None and current[1] == schema and version in (None, current[0]):
+            return None
+        validator = compile_schema(schema)
+        if version is None:
+            version = current[0] + 1 if current is not None else 1
+        if current is not None:
+            self._validators.pop((topic, current[0]), None)
+        self._validators[(topic, version)] = validator
+        self._schemas[topic] = (version, schema)
+        return version
+
+    def unregister(self, topic: str) -> bool:
+        current = self._schemas.pop(topic, None)
+        if current is None:
+            return False
+        self._validators.pop((topic, current[0]), None)
+        return True
+
+    def row(self, topic: str) -> tuple[str, int, str]:
+        """(topic, version, schema JSON) for persisting; only JSON Schemas can be stored."""
+        version, schema = self._schemas[topic]
+        if not isinstance(schema, dict):
+            raise ValueError(f'{topic}: pydantic model schemas are not persisted')
+        return topic, version, json.dumps(schema, sort_keys=True)
+
+    def validate(self, events: list[dict]) -> dict[int, list[dict]]:
+        """Errors by batch index for every event whose payload fails its topic's schema."""
+        if not self._schemas:
+            return {}
+        groups: dict[str, list[int]] = {}
+        for i, event in enumerate(events):
+            if event['topic'] in self._schemas:
+                groups.setdefault(event['topic'], []).append(i)
+        rejected: dict[int, list[dict]] = {}
+        for topic, positions in groups.items():
+            validator = self._validators[(topic, self._schemas[topic][0])]
+            counts = self._counts.setdefault(topic, [0, 0])
+            counts[0] += len(positions)
+            try:
+                validator.validate_python([events[i]['payload'] for i in positions])
+            except ValidationError as e:
+                bad = set()
+                for err in e.errors(include_url=False):
+                    idx, *loc = err['loc']
+                    bad.add(idx)
+                    rejected.setdefault(positions[idx], []).append(
+                        {'loc': ['payload', *loc], 'msg': err['msg'], 'type': err['type']}
+                    )
+                counts[1] += len(bad)
+        return rejected
+
+    def check(self, events: list[dict]) -> tuple[list[dict], list[dict]]:
+        """Split a /publish batch into the valid events and per-index rejection reports."""
+        failures = self.validate(events)
+        if not failures:
+            return events, []
+        rejected = [
+            {'index': i, 'topic': events[i]['topic'], 'event_id': events[i]['event_id'], 'errors': errors}
+            for i, errors in sorted(failures.items())
+        ]
+        return [e for i, e in enumerate(events) if i not in failures], rejected
+
+    def describe(self, topic: str | None = None) -> dict | None:
+        def entry(t):
+            version, schema = self._schemas[t]
+            validated, rejected = self._counts.get(t, (0, 0))
+            return {
+                'version': version,
+                'schema': schema if isinstance(schema, dict) else schema.model_json_schema(),
+                'validated': validated,
+                'rejected': rejected,
+            }
+        if topic is not None:
+            return entry(topic) if topic in self._schemas else None
+        return {t: entry(t) for t in sorted(self._schemas)}
@@ -0,0 +1,130 @@
+import asyncio
+import time
+from collections import deque
+
+
+class _TopicQueues:
+    """Per-topic FIFOs drained by deficit round robin within strict priority levels.
+
+    Each topic with a backlog sits in the ring of its priority level. When a
+    topic reaches the head of the ring it earns ``quantum * weight`` credits and
+    may dequeue one event per credit before yielding to the next topic, so a
+    bursting topic cannot delay the others by more than one turn. Higher
+    priority levels are always served first.
+    """
+
+    WAIT_ALPHA = 0.1
+
+    def __init__(self, weights: dict[str, float], priorities: dict[str, int], quantum: float):
+        self.weights = weights
+        self.priorities = priorities
+        self.quantum = quantum
+        self._subqueues: dict[str, deque] = {}
+        self._deficit: dict[str, float] = {}
+        self._rings: dict[int, deque[str]] = {}
+        self._size = 0
+        self._waits: dict[str, list] = {}
+        self.max_wait = 0.0
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        for sub in self._subqueues.values():
+            for _, item in sub:
+                yield item
+
+    def push(self, item: dict):
+        topic = item['topic']
+        sub = self._subqueues.get(topic)
+        if sub is None:
+            sub = self._subqueues[topic] = deque()
+            self._deficit[topic] = 0.0
+            self._rings.setdefault(self.priorities.get(topic, 0), deque()).append(topic)
+        sub.append((time.monotonic(), item))
+        self._size += 1
+
+    def pop(self) -> dict:
+        ring = next(self._rings[level] for level in sorted(self._rings, reverse=True) if self._rings[level])
+        while True:
+            topic = ring[0]
+            if self._deficit[topic] < 1:
+                self._deficit[topic] += self.quantum * self.weights.get(topic, 1.0)
+                if self._deficit[topic] < 1:
+                    ring.rotate(-1)
+                    continue
+            self._deficit[topic] -= 1
+            sub = self._subqueues[topic]
+            enqueued_at, item = sub.popleft()
+            self._size -= 1
+            if not sub:
+                ring.popleft()
+                del self._subqueues[topic], self._deficit[topic]
+            elif self._deficit[topic] < 1:
+                ring.rotate(-1)
+            self._record_wait(topic, time.monotonic() - enqueued_at)
+            return item
+
+    def _record_wait(self, topic: str, wait: float):
+        if wait > self.max_wait:
+            self.max_wait = wait
+        stats = self._waits.get(topic)
+        if stats is None:
+            self._waits[topic] = [wait, wait, 1]
+            return
+        stats[0] += self.WAIT_ALPHA * (wait - stats[0])
+        if wait > stats[1]:
+            stats[1] = wait
+        stats[2] += 1
+
+    def snapshot(self) -> dict[str, dict]:
+        now = time.monotonic()
+        out = {}
+        for topic in self._waits.keys() | self._subqueues.keys():
+            sub = self._subqueues.get(topic)
+            avg, peak, dequeued = self._waits.get(topic, (None, 0.0, 0))
+            out[topic] = {
+                'queued': len(sub) if sub else 0,
+                'head_wait_ms': (now - sub[0][0]) * 1000 if sub else 0.0,
+                'wait_ms_avg': avg * 1000 if avg is not None else None,
+                'wait_ms_max': peak * 1000,
+                'dequeued': dequeued,
+                'weight': self.weights.get(topic, 1.0),
+                'priority': self.priorities.get(topic, 0),
+            }
+        return out
+
+
+class FairQueue(asyncio.Queue):
+    """asyncio.Queue whose get() order is weighted-fair across topics instead of FIFO.
+
+    Drop-in for the worker: put/get/get_nowait/task_done/join behave as usual,
+    only the order in which queued events come out changes.
+    """
+
+    def __init__(self, maxsize: int = 0, weights: dict[str, float] | None = None,
+                 priorities: dict[str, int] | None = None, quantum: float = 1.0):
+        weights = weights or {}
+        if any(w <= 0 for w in weights.values()) or quantum <= 0:
+            raise ValueError('topic weights and quantum must be positive')
+        self._weights = weights
+        self._priorities = priorities or {}
+        self._quantum = quantum
+        super().__init__(maxsize)
+
+    def _init(self, maxsize):
+        self._queue = _TopicQueues(self._weights, self._priorities, self._quantum)
+
+    def _put(self, item):
+        self._queue.push(item)
+
+    def _get(self):
+        return self._queue.pop()
+
+    def topic_snapshot(self) -> dict[str, dict]:
+        return self._queue.snapshot()
+
+    def take_max_wait(self) -> float:
+        """Longest queue wait among items dequeued since the previous call."""
+        wait, self._queue.max_wait = self._queue.max_wait, 0.0
+        return wait
@@ -0,0 +1,141 @@
+from .utils import get_path
+
+
+class SequenceWindow:
+    """High-water mark plus a bitmap of the ``size`` sequence numbers at and below it.
+
+    Bit i of ``bits`` is set once ``hwm - i`` has been seen, so out-of-order
+    arrivals inside the window are still recognised. Anything older than the
+    window is assumed to have been seen already.
+    """
+
+    __slots__ = ('hwm', 'bits', 'count')
+
+    def __init__(self, hwm: int | None = None, bits: int = 0, count: int = 0):
+        self.hwm = hwm
+        self.bits = bits
+        self.count = count
+
+    def copy(self) -> 'SequenceWindow':
+        return SequenceWindow(self.hwm, self.bits, self.count)
+
+    def check(self, seq: int, size: int) -> bool:
+        """Mark ``seq`` as seen; False if it was seen before (or fell out of the window)."""
+        if self.hwm is None or seq > self.hwm:
+            shift = seq - self.hwm if self.hwm is not None else size
+            self.bits = ((self.bits << shift) | 1) & ((1 << size) - 1) if shift < size else 1
+            self.hwm = seq
+        else:
+            offset = self.hwm - seq
+            if offset >= size or self.bits >> offset & 1:
+                return False
+            self.bits |= 1 << offset
+        self.count += 1
+        return True
+
+    def merged(self, other: 'SequenceWindow', size: int) -> 'SequenceWindow':
+        """Union of two windows of the same source (e.g. ours and one from a snapshot).
+
+        The count of either side is a lower bound of the union's; the larger is kept.
+        """
+        if other.hwm is None:
+            return self.copy()
+        if self.hwm is None:
+            return other.copy()
+        high, low = (self, other) if self.hwm >= other.hwm else (other, self)
+        shift = high.hwm - low.hwm
+        bits = high.bits | ((low.bits << shift) & ((1 << size) - 1) if shift < size else 0)
+        return SequenceWindow(high.hwm, bits, max(self.count, other.count))
+
+
+class SequenceTracker:
+    """Per-(topic, source) sequence windows for the topics listed in SEQUENCED_TOPICS.
+
+    Config maps a topic to where its sequence number lives and how wide the
+    out-of-order window is, e.g. ``{"orders": {"field": "payload.seq",
+    "window": 1024}}``; a plain list of topics uses those defaults. Events of
+    other topics, or without a usable sequence, go to the key store.
+    """
+
+    DEFAULT_FIELD = 'payload.seq'
+    DEFAULT_WINDOW = 1024
+    MAX_SEQUENCE = 2 ** 63
+
+    def __init__(self, config: dict | list, marks=()):
+        if isinstance(config, list):
+            config = {topic: {} for topic in config}
+        self.topics = {
+            topic: (spec.get('field', self.DEFAULT_FIELD), int(spec.get('window', self.DEFAULT_WINDOW)))
+            for topic, spec in config.items()
+        }
+        if any(size < 1 for _, size in self.topics.values()):
+            raise ValueError('sequence window must be >= 1')
+        self._windows: dict[tuple[str, str], SequenceWindow] = {
+            (topic, source): SequenceWindow(hwm, int.from_bytes(bits, 'big'), count)
+            for topic, source, hwm, bits, count in marks
+        }
+
+    def sequence_of(self, event: dict) -> int | None:
+        spec = self.topics.get(event['topic'])
+        if spec is None:
+            return None
+        value = get_path(event, spec[0])
+        if isinstance(value, str) and value.isascii() and value.isdecimal():
+            value = int(value)
+        elif not isinstance(value, int) or isinstance(value, bool):
+            return None
+        # seq_marks stores the high-water mark as a SQLite INTEGER
+        return value if 0 <= value < self.MAX_SEQUENCE else None
+
+    def plan(self, events: list[dict]) -> tuple[dict[int, bool], dict]:
+        """Decide the sequenced events of a batch without touching the live windows.
+
+        Returns {position: is_new} for the events handled here and the updated
+        windows, which only become live through apply() once they are committed.
+        """
+        decisions, staged = {}, {}
+        for pos, event in enumerate(events):
+            seq = self.sequence_of(event)
+            if seq is None:
+                continue
+            key = (event['topic'], event['source'])
+            window = staged.get(key)
+            if window is None:
+                current = self._windows.get(key)
+                window = staged[key] = current.copy() if current is not None else SequenceWindow()
+            decisions[pos] = window.check(seq, self.topics[key[0]][1])
+        return decisions, staged
+
+    def apply(self, staged: dict):
+        for key, window in staged.items():
+            current = self._windows.get(key)
+            # merge rather than replace: a snapshot import may have advanced the window since plan()
+            self._windows[key] = window if current is None else window.merged(current, self.topics[key[0]][1])
+
+    def merge(self, rows) -> list[tuple]:
+        """Fold (topic, source, hwm, bits, count) rows from another node into the live windows.
+
+        Returns the merged rows to persist. Topics not configured here keep at
+        least DEFAULT_WINDOW of history.
+        """
+        merged = {}
+        for topic, source, hwm, bits, count in rows:
+            incoming = SequenceWindow(hwm, int.from_bytes(bits, 'big'), count)
+            current = self._windows.get((topic, source))
+            if current is not None:
+                size = self.topics[topic][1] if topic in self.topics else max(
+                    self.DEFAULT_WINDOW, current.bits.bit_length(), incoming.bits.bit_length())
+                incoming = current.merged(incoming, size)
+            self._windows[(topic, source)] = merged[(topic, source)] = incoming
+        return self.rows(merged)
+
+    @staticmethod
+    def rows(staged: dict) -> list[tuple]:
+        """(topic, source, hwm, bits, count) rows for the store's seq_marks table."""
+        return [
+            (topic, source, w.hwm, w.bits.to_bytes((w.bits.bit_length() + 7) // 8, 'big'), w.count)
+            for (topic, source), w in staged.items()
+        ]
+
+    def sources(self) -> int:
+        return len(self._windows)
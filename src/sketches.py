@@ -0,0 +1,200 @@
+import asyncio
+import hashlib
+import logging
+import math
+from datetime import datetime
+
+from .stats import _iso, to_epoch
+
+
+logger = logging.getLogger('sketches')
+
+ALL_TIME = -1
+
+
+def hash64(key: str) -> int:
+    # stable across processes (unlike hash()), so persisted sketches stay mergeable
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+
+class HyperLogLog:
+    """Mergeable distinct counter: 2**p one-byte registers, ~1.04/sqrt(2**p) relative error.
+
+    p=12 is 4 KiB per sketch and about 1.6% standard error at any cardinality.
+    """
+
+    __slots__ = ('p', 'registers')
+
+    def __init__(self, p: int = 12, registers: bytes | None = None):
+        if not 4 <= p <= 16:
+            raise ValueError('precision must be between 4 and 16')
+        self.p = p
+        self.registers = bytearray(registers) if registers is not None else bytearray(1 << p)
+        if len(self.registers) != 1 << p:
+            raise ValueError(f'expected {1 << p} registers, got {len(self.registers)}')
+
+    def add(self, key: str):
+        self.add_hash(hash64(key))
+
+    def add_hash(self, h: int):
+        index = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        rank = 64 - self.p - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: 'HyperLogLog'):
+        if other.p != self.p:
+            raise ValueError('cannot merge sketches of different precision')
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(1 << self.p)
+
+    def estimate(self) -> float:
+        m = 1 << self.p
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            # linear counting is far more accurate while most registers are empty
+            return m * math.log(m / zeros)
+        return raw
+
+    def report(self) -> dict:
+        """Estimate with a ~95% interval (two standard errors)."""
+        estimate = self.estimate()
+        margin = 2 * self.relative_error * estimate
+        return {
+            'estimate': round(estimate),
+            'lower': max(0, math.floor(estimate - margin)),
+            'upper': math.ceil(estimate + margin),
+            'relative_error': self.relative_error,
+        }
+
+
+class SketchRegistry:
+    """Distinct-event sketches per topic and per source, all-time and per time bucket.
+
+    Topic sketches count distinct event_ids, source sketches distinct
+    (topic, event_id) keys. Buckets follow the event timestamp and only the
+    newest ``retention`` buckets per name are kept.
+    """
+
+    DIMENSIONS = ('topic', 'source')
+
+    def __init__(self, p: int = 12, bucket_seconds: int = 3600, retention: int = 48, rows=()):
+        self.p = p
+        self.bucket_seconds = bucket_seconds
+        self.retention = retention
+        self._sketches: dict[tuple[str, str, int], HyperLogLog] = {}
+        self._dirty: set[tuple[str, str, int]] = set()
+        self._latest_bucket = None
+        for dim, name, bucket, p_stored, registers in rows:
+            if p_stored == p:
+                self._sketches[(dim, name, bucket)] = HyperLogLog(p, registers)
+                if bucket != ALL_TIME:
+                    self._latest_bucket = max(self._latest_bucket or bucket, bucket)
+
+    def _add(self, key: tuple, h: int):
+        sketch = self._sketches.get(key)
+        if sketch is None:
+            sketch = self._sketches[key] = HyperLogLog(self.p)
+        sketch.add_hash(h)
+        self._dirty.add(key)
+
+    def record(self, event: dict):
+        topic, source, event_id = event['topic'], event.get('source') or '', event['event_id']
+        by_topic, by_source = hash64(event_id), hash64(f'{topic}\x00{event_id}')
+        self._add(('topic', topic, ALL_TIME), by_topic)
+        self._add(('source', source, ALL_TIME), by_source)
+        bucket = int(to_epoch(event['timestamp']) // self.bucket_seconds)
+        if bucket < 0:
+            return
+        if self._latest_bucket is None or bucket > self._latest_bucket:
+            self._latest_bucket = bucket
+        if bucket > self._latest_bucket - self.retention:
+            self._add(('topic', topic, bucket), by_topic)
+            self._add(('source', source, bucket), by_source)
+
+    def oldest_kept_bucket(self) -> int | None:
+        return None if self._latest_bucket is None else self._latest_bucket - self.retention + 1
+
+    def prune(self):
+        oldest = self.oldest_kept_bucket()
+        if oldest is None:
+            return
+        for key in [k for k in self._sketches if k[2] != ALL_TIME and k[2] < oldest]:
+            del self._sketches[key]
+            self._dirty.discard(key)
+
+    def take_dirty(self) -> list[tuple]:
+        """Rows (dim, name, bucket, p, registers) changed since the last call, for the store."""
+        self.prune()
+        rows = [(*key, self.p, bytes(self._sketches[key].registers)) for key in self._dirty]
+        self._dirty.clear()
+        return rows
+
+    async def flush(self, store):
+        rows = self.take_dirty()
+        if not rows:
+            return
+        try:
+            await asyncio.to_thread(store.save_sketches, rows, self.oldest_kept_bucket())
+        except BaseException:
+            self._dirty.update(row[:3] for row in rows if row[:3] in self._sketches)
+            raise
+
+    async def run(self, store, interval: float):
+        """Persist changed sketches every ``interval`` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush(store)
+            except Exception:
+                logger.exception('Persisting sketches failed')
+
+    def summary(self) -> dict:
+        return {
+            'precision': self.p,
+            'relative_error': 1.04 / math.sqrt(1 << self.p),
+            'bucket_seconds': self.bucket_seconds,
+            **{f'{dim}s': {
+                name: sketch.report()
+                for (d, name, bucket), sketch in self._sketches.items() if d == dim and bucket == ALL_TIME
+            } for dim in self.DIMENSIONS},
+        }
+
+    def query(self, dim: str, name: str, since: float | None = None, until: float | None = None) -> dict | None:
+        """Per-bucket estimates for one topic/source plus their merged distinct count over [since, until)."""
+        if dim not in self.DIMENSIONS:
+            raise ValueError(f'dim must be one of {self.DIMENSIONS}')
+        if (dim, name, ALL_TIME) not in self._sketches:
+            return None
+        lo = None if since is None else int(since // self.bucket_seconds)
+        hi = None if until is None else math.ceil(until / self.bucket_seconds)
+        buckets = sorted(
+            (bucket, sketch) for (d, n, bucket), sketch in self._sketches.items()
+            if d == dim and n == name and bucket != ALL_TIME
+            and (lo is None or bucket >= lo) and (hi is None or bucket < hi)
+        )
+        merged = HyperLogLog(self.p)
+        for _, sketch in buckets:
+            merged.merge(sketch)
+        return {
+            'dim': dim,
+            'name': name,
+            'all_time': self._sketches[(dim, name, ALL_TIME)].report(),
+            'range': merged.report(),
+            'buckets': [
+                {'start': _iso(bucket * self.bucket_seconds), **sketch.report()} for bucket, sketch in buckets
+            ],
+        }
+
+
+def range_bounds(since: str | None, until: str | None) -> tuple[float | None, float | None]:
+    return (
+        to_epoch(datetime.fromisoformat(since)) if since else None,
+        to_epoch(datetime.fromisoformat(until)) if until else None,
+    )
@@ -0,0 +1,162 @@
+"""Chunked export/import of dedup state and stored events.
+
+A snapshot is a stream of msgpack maps::
+
+    {'kind': 'header', 'version': 1, 'created_at': ...}
+    {'kind': 'events', 'rows': [[topic, event_id, source, processed_at_us, packed_payload], ...]}
+    {'kind': 'dedup', 'rows': [[topic, event_id, processed_at], ...]}   # repeated
+    {'kind': 'seq_marks', 'rows': [[topic, source, hwm, bits, count], ...]}
+    {'kind': 'end', 'events': n, 'dedup_rows': m, 'seq_marks': k}
+
+Version 1 snapshots (no seq_marks frame) are still accepted.
+
+CLI (works on the files directly, also while the service is running):
+
+    python -m src.snapshot export --db dedup.db [--shards N] > node.snap
+    python -m src.snapshot import --db dedup.db [--shards N] < node.snap
+    python -m src.snapshot backup --db dedup.db --out /backup/dedup.db
+"""
+import argparse
+import sys
+from datetime import datetime
+from typing import Iterable, Iterator
+
+import msgpack
+
+from .dedup_store import open_store
+from .model import EventRecord
+from .sequence_dedup import SequenceTracker
+
+
+FORMAT_VERSION = 2
+_READABLE_VERSIONS = (1, 2)
+MEDIA_TYPE = 'application/x-aggregator-snapshot'
+
+
+def export_frames(store, events: list | None = None, chunk_size: int = 10000) -> Iterator[bytes]:
+    """Encode a snapshot; ``events`` should be taken before iterating so every event's key is in the dedup part."""
+    pack = msgpack.Packer(use_bin_type=True).pack
+    yield pack({'kind': 'header', 'version': FORMAT_VERSION, 'created_at': datetime.utcnow().isoformat()})
+    events = events or []
+    for start in range(0, len(events), chunk_size):
+        rows = [[r.topic, r.event_id, r.source, r.processed_at_us, r.packed_payload]
+                for r in events[start:start + chunk_size]]
+        yield pack({'kind': 'events', 'rows': rows})
+    dedup_rows = 0
+    for rows in store.iter_rows(chunk_size):
+        dedup_rows += len(rows)
+        yield pack({'kind': 'dedup', 'rows': rows})
+    # high-water marks of sequenced topics are their dedup state
+    marks = [list(row) for row in store.load_sequence_marks()]
+    if marks:
+        yield pack({'kind': 'seq_marks', 'rows': marks})
+    yield pack({'kind': 'end', 'events': len(events), 'dedup_rows': dedup_rows, 'seq_marks': len(marks)})
+
+
+class SnapshotImporter:
+    """Feed raw snapshot bytes in any chunking; dedup rows go to the store's bulk loader.
+
+    feed() returns the EventRecords decoded from that chunk whose key is not
+    stored yet and leaves it to the caller to put them wherever stored events
+    live; the rest are already held by this node (a re-import or overlapping
+    snapshot). Event frames precede dedup frames, so the check sees the store
+    as it was before this import. Sequence marks are
+    merged into ``sequences`` (the live SequenceTracker, if any) and saved by
+    finish().
+    """
+
+    def __init__(self, store, batch_rows: int = 500_000, sequences: SequenceTracker | None = None):
+        self._unpacker = msgpack.Unpacker(raw=False)
+        self._store = store
+        self._loader = store.bulk_loader(batch_rows)
+        self._sequences = sequences
+        self._marks: list[tuple] = []
+        self._seen: set[tuple[str, str]] = set()
+        self.events = 0
+        self.complete = False
+
+    def feed(self, data: bytes) -> list[EventRecord]:
+        self._unpacker.feed(data)
+        records = []
+        for frame in self._unpacker:
+            if not isinstance(frame, dict):
+                raise ValueError('snapshot frames must be maps')
+            kind = frame.get('kind')
+            if kind == 'header':
+                if frame.get('version') not in _READABLE_VERSIONS:
+                    raise ValueError(f"unsupported snapshot version {frame.get('version')!r}")
+            elif kind == 'dedup':
+                self._loader.add([tuple(row) for row in frame['rows']])
+            elif kind == 'seq_marks':
+                self._marks.extend(tuple(row) for row in frame['rows'])
+            elif kind == 'events':
+                for row in frame['rows']:
+                    key = (row[0], row[1])
+                    if key in self._seen or self._store.is_processed(*key):
+                        continue
+                    self._seen.add(key)
+                    records.append(EventRecord(*row))
+                self.events += len(frame['rows'])
+            elif kind == 'end':
+                self.complete = True
+            else:
+                raise ValueError(f'unknown snapshot frame {kind!r}')
+        return records
+
+    def finish(self) -> dict:
+        inserted = self._loader.finish()
+        if not self.complete:
+            raise ValueError('snapshot ended before its end frame')
+        if self._marks:
+            tracker = self._sequences
+            if tracker is None:
+                tracker = SequenceTracker({}, self._store.load_sequence_marks())
+            self._store.mark_processed_many([], tracker.merge(self._marks))
+        return {'dedup_rows': self._loader.received, 'inserted': inserted, 'events': self.events,
+                'events_new': len(self._seen), 'seq_marks': len(self._marks)}
+
+    def abort(self):
+        self._loader.abort()
+
+
+def import_chunks(store, chunks: Iterable[bytes], sequences: SequenceTracker | None = None) -> dict:
+    """Import into a store only; stored events are counted but not kept."""
+    importer = SnapshotImporter(store, sequences=sequences)
+    try:
+        for chunk in chunks:
+            importer.feed(chunk)
+    except BaseException:
+        importer.abort()
+        raise
+    return importer.finish()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m src.snapshot')
+    parser.add_argument('command', choices=['export', 'import', 'backup'])
+    parser.add_argument('--db', default='dedup.db')
+    parser.add_argument('--shards', type=int, default=1)
+    parser.add_argument('--out', help='backup destination')
+    args = parser.parse_args(argv)
+
+    store = open_store(args.db, args.shards)
+    try:
+        if args.command == 'export':
+            out = sys.stdout.buffer
+            for frame in export_frames(store):
+                out.write(frame)
+            out.flush()
+        elif args.command == 'import':
+            stdin = sys.stdin.buffer
+            result = import_chunks(store, iter(lambda: stdin.read(1 << 20), b''))
+            print(result, file=sys.stderr)
+        else:
+            if not args.out:
+                parser.error('backup needs --out')
+            store.backup(args.out)
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+import math
+import time
+from datetime import datetime, timezone
+
+
+def to_epoch(ts: datetime) -> float:
+    """Naive timestamps are treated as UTC, like the processed_at values we write."""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp()
+
+
+def _iso(epoch: float | None) -> str | None:
+    if epoch is None:
+        return None
+    return datetime.fromtimestamp(epoch, timezone.utc).replace(tzinfo=None).isoformat()
+
+
+class Meter:
+    """Events/sec over 1, 5 and 15 minutes, decayed like the Unix load average.
+
+    Marks only bump a counter; the exponential decay is applied lazily in
+    TICK-second steps when the meter is next touched, so both marking and
+    reading are O(1) no matter how long the meter sat idle.
+    """
+
+    TICK = 5.0
+    WINDOWS = (60, 300, 900)
+
+    def __init__(self, now: float | None = None):
+        self._alphas = [1 - math.exp(-self.TICK / w) for w in self.WINDOWS]
+        self._rates = [0.0] * len(self.WINDOWS)
+        self._initialized = False
+        self._uncounted = 0
+        self._last_tick = time.monotonic() if now is None else now
+
+    def _tick(self, now: float):
+        ticks = int((now - self._last_tick) // self.TICK)
+        if ticks <= 0:
+            return
+        self._last_tick += ticks * self.TICK
+        instant = self._uncounted / self.TICK
+        self._uncounted = 0
+        for i, alpha in enumerate(self._alphas):
+            rate = instant if not self._initialized else self._rates[i] + alpha * (instant - self._rates[i])
+            # the remaining ticks saw no events: rate *= (1 - alpha) per tick
+            self._rates[i] = rate * (1 - alpha) ** (ticks - 1)
+        self._initialized = True
+
+    def mark(self, n: int = 1, now: float | None = None):
+        self._tick(time.monotonic() if now is None else now)
+        self._uncounted += n
+
+    def rates(self, now: float | None = None) -> tuple[float, ...]:
+        self._tick(time.monotonic() if now is None else now)
+        return tuple(self._rates)
+
+
+class TopicStats:
+    __slots__ = ('received', 'unique', 'duplicates', 'meter', 'last_event_ts',
+                 'last_processed_at', 'lag_last', 'lag_avg', 'lag_max')
+
+    LAG_ALPHA = 0.05
+
+    def __init__(self):
+        self.received = 0
+        self.unique = 0
+        self.duplicates = 0
+        self.meter = Meter()
+        self.last_event_ts = None
+        self.last_processed_at = None
+        self.lag_last = None
+        self.lag_avg = None
+        self.lag_max = 0.0
+
+    def record(self, event_ts: float, processed_at: float, duplicate: bool):
+        self.received += 1
+        self.meter.mark()
+        if duplicate:
+            self.duplicates += 1
+            return
+        self.unique += 1
+        if self.last_event_ts is None or event_ts > self.last_event_ts:
+            self.last_event_ts = event_ts
+        self.last_processed_at = processed_at
+        lag = processed_at - event_ts
+        self.lag_last = lag
+        self.lag_avg = lag if self.lag_avg is None else self.lag_avg + self.LAG_ALPHA * (lag - self.lag_avg)
+        if lag > self.lag_max:
+            self.lag_max = lag
+
+    def snapshot(self) -> dict:
+        rate_1m, rate_5m, rate_15m = self.meter.rates()
+        return {
+            'received': self.received,
+            'unique_processed': self.unique,
+            'duplicate_dropped': self.duplicates,
+            'rate_1m': rate_1m,
+            'rate_5m': rate_5m,
+            'rate_15m': rate_15m,
+            'last_event_timestamp': _iso(self.last_event_ts),
+            'last_processed_at': _iso(self.last_processed_at),
+            'lag_seconds': {'last': self.lag_last, 'avg': self.lag_avg, 'max': self.lag_max},
+        }
+
+
+class TopicStatsRegistry:
+    """Per-topic counters kept up to date by ConsumerWorker, O(1) per event."""
+
+    def __init__(self):
+        self._topics: dict[str, TopicStats] = {}
+
+    def record(self, topic: str, event_ts: datetime, processed_at: float, duplicate: bool):
+        stats = self._topics.get(topic)
+        if stats is None:
+            stats = self._topics[topic] = TopicStats()
+        stats.record(to_epoch(event_ts), processed_at, duplicate)
+
+    def get(self, topic: str) -> dict | None:
+        stats = self._topics.get(topic)
+        return None if stats is None else stats.snapshot()
+
+    def snapshot(self) -> dict[str, dict]:
+        return {topic: stats.snapshot() for topic, stats in self._topics.items()}
@@ -1,6 +1,35 @@
+import json
+import os
 import time
+from typing import Any
 
 START_TIME = time.time()
 
+_MISSING = object()
+
 def uptime_seconds() -> float:
-    return time.time() - START_TIME
\ No newline at end of file
+    return time.time() - START_TIME
+
+
+def load_json_env(name: str, default: Any = None) -> Any:
+    """Read a JSON setting from an env var holding either inline JSON or a file path."""
+    raw = os.environ.get(name)
+    if not raw:
+        return default
+    raw = raw.strip()
+    if raw[0] in '[{':
+        return json.loads(raw)
+    with open(raw) as f:
+        return json.load(f)
+
+
+def get_path(event: dict, path: str, default: Any = None) -> Any:
+    """Resolve a dotted path such as 'payload.user.id' against an event dict."""
+    value = event
+    for key in path.split('.'):
+        if not isinstance(value, dict):
+            return default
+        value = value.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+    return value
@@ -1,44 +1,287 @@
 import asyncio
 import logging
+import random
+import time
 from datetime import datetime
+from .codec import packb
+from .dedup_store import PartialCommitError
+from .model import EventRecord, to_micros
+from .sequence_dedup import SequenceTracker
+from .stats import _iso
 
 
 logger = logging.getLogger('worker')
 
 
+def _pack_dead(event: dict) -> bytes:
+    try:
+        return packb(event)
+    except Exception:
+        # keep a readable copy rather than lose the record; replay skips it
+        return packb(repr(event))
+
+
 class ConsumerWorker:
-    def __init__(self, queue: asyncio.Queue, dedup_store, processed_events_store: list):
+    def __init__(self, queue: asyncio.Queue, dedup_store, processed_events_store: list, batch_size: int = 256,
+                 topic_stats=None, aggregates=None, payload_index=None, log_summary=None, sequences=None,
+                 sketches=None, batcher=None, max_retries: int = 5, retry_base: float = 0.05,
+                 retry_max: float = 2.0):
         self.queue = queue
         self.dedup_store = dedup_store
         self.processed_events_store = processed_events_store
+        self.batch_size = batch_size
+        self.topic_stats = topic_stats
+        self.aggregates = aggregates
+        self.payload_index = payload_index
+        self.log_summary = log_summary
+        self.sequences = sequences
+        self.sketches = sketches
+        self.batcher = batcher
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        # bumped after every commit that stored new events; read models key their caches on it
+        self.version = 0
+        # bumped on every change of the health report
+        self.health_version = 0
+        self.last_batch_at = None
+        self.retries = 0
+        self.consecutive_failures = 0
+        self.dead_lettered = 0
+        self.record_errors = 0
+        self.restarts = 0
+        self.last_error = None
+        self.last_error_at = None
+        self._dead_pending: list[tuple] = []
+        self._batch = None
+        self._restarting = False
         self._running = False
 
     async def start(self):
         self._running = True
         while self._running:
+            if self._batch is not None:
+                # taken from the queue before a crash; see supervise()
+                batch = self._batch
+            else:
+                try:
+                    batch = self._batch = [await self.queue.get()]
+                except asyncio.CancelledError:
+                    break
+                limit = self.batcher.batch_size if self.batcher is not None else self.batch_size
+                self._drain(batch, limit)
+                if self.batcher is not None and self.batcher.linger and len(batch) < limit:
+                    await asyncio.sleep(self.batcher.linger)
+                    self._drain(batch, limit)
+            started = time.monotonic()
+            await self._handle(batch)
+            self._batch = None
+            self.last_batch_at = time.monotonic()
+            for _ in batch:
+                self.queue.task_done()
+            if self.batcher is not None:
+                take_wait = getattr(self.queue, 'take_max_wait', None)
+                self.batcher.observe(
+                    len(batch), take_wait() if take_wait is not None else 0.0,
+                    self.last_batch_at - started, self.queue.qsize(),
+                )
+
+    async def supervise(self, restart_delay: float = 1.0):
+        """Run start() and restart it whenever it crashes.
+
+        The batch in flight is retried once by the restarted loop; if it
+        crashes the worker again it is dead-lettered instead.
+        """
+        crashed = None
+        while True:
             try:
-                event = await self.queue.get()
-            except asyncio.CancelledError:
+                await self.start()
+                return
+            except Exception as e:
+                self.restarts += 1
+                self._failed(e)
+                logger.exception('Consumer worker crashed; restarting in %.1fs', restart_delay)
+                if self._batch is not None and self._batch is crashed:
+                    batch, self._batch = self._batch, None
+                    try:
+                        await self._dead_letter(batch, e, attempts=2)
+                    except Exception:
+                        # the supervisor must outlive anything it is cleaning up after
+                        logger.exception('Could not dead-letter %d events of the crashed batch', len(batch))
+                    for _ in batch:
+                        self.queue.task_done()
+                crashed = self._batch
+                self._restarting = True
+                await asyncio.sleep(restart_delay)
+                self._restarting = False
+                self.health_version += 1
+
+    def _drain(self, batch: list, limit: int):
+        while len(batch) < limit:
+            try:
+                batch.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
                 break
-            await self._handle(event)
-            self.queue.task_done()
-
-    async def _handle(self, event: dict):
-        topic = event['topic']
-        event_id = event['event_id']
-        ts = datetime.utcnow().isoformat()
-        inserted = self.dedup_store.mark_processed(topic, event_id, ts)
-        if not inserted:
-            logger.info(f"Duplicate dropped: topic={topic} event_id={event_id}")
+
+    def stats(self) -> dict:
+        if self.batcher is not None:
+            params = self.batcher.snapshot()
+        else:
+            params = {'adaptive': False, 'batch_size': self.batch_size}
+        return {**params, 'health': self.health()}
+
+    def health(self) -> dict:
+        if self._restarting:
+            status = 'restarting'
+        elif not self._running:
+            status = 'stopped'
+        elif self.consecutive_failures:
+            status = 'failing'
+        else:
+            status = 'ok'
+        return {
+            'status': status,
+            'consecutive_failures': self.consecutive_failures,
+            'retries': self.retries,
+            'dead_lettered': self.dead_lettered,
+            'dead_letters_unsaved': len(self._dead_pending),
+            'record_errors': self.record_errors,
+            'restarts': self.restarts,
+            'last_error': self.last_error,
+            'last_error_at': _iso(self.last_error_at),
+        }
+
+    def _failed(self, error: BaseException):
+        self.consecutive_failures += 1
+        self.last_error = f'{type(error).__name__}: {error}'
+        self.last_error_at = time.time()
+        self.health_version += 1
+
+    def _backoff(self, attempt: int) -> float:
+        # full exponential step with jitter so restarted nodes do not retry in lockstep
+        return min(self.retry_max, self.retry_base * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+    async def _commit(self, items: list[tuple], marks) -> tuple[dict[int, bool], bool, Exception | None]:
+        """Store keys and sequence marks, retrying with exponential backoff.
+
+        Returns the flags by item position, whether the marks were stored and
+        the last error once ``max_retries`` is exhausted. Items missing from
+        the flags were not committed. After a partial (sharded) commit only
+        what failed is retried, so nothing already stored reads as a duplicate.
+        """
+        flags: dict[int, bool] = {}
+        pending = list(range(len(items)))
+        marks_ok = not marks
+        attempt = 0
+        while True:
+            try:
+                # The store call blocks on SQLite; keep it off the event loop so
+                # sharded stores can commit in parallel while /publish keeps running.
+                result = await asyncio.to_thread(
+                    self.dedup_store.mark_processed_many, [items[p] for p in pending], () if marks_ok else marks,
+                )
+            except PartialCommitError as e:
+                flags.update((pending[i], ok) for i, ok in e.inserted.items())
+                pending = [p for p in pending if p not in flags]
+                marks_ok = marks_ok or e.marks_committed
+                error = e.__cause__ or e
+            except Exception as e:
+                error = e
+            else:
+                flags.update(zip(pending, result))
+                if self.consecutive_failures:
+                    logger.info('Commit succeeded after %d failed attempts', self.consecutive_failures)
+                    self.consecutive_failures = 0
+                    self.health_version += 1
+                return flags, True, None
+            attempt += 1
+            self._failed(error)
+            if attempt > self.max_retries:
+                return flags, marks_ok, error
+            self.retries += 1
+            logger.warning('Commit failed (attempt %d/%d): %s', attempt, self.max_retries + 1, self.last_error)
+            await asyncio.sleep(self._backoff(attempt))
+
+    async def _dead_letter(self, events: list[dict], error: BaseException, attempts: int):
+        reason = f'{type(error).__name__}: {error}'
+        failed_at = time.time()
+        self._dead_pending.extend(
+            (e['topic'], e['event_id'], _pack_dead(e), reason, attempts, failed_at) for e in events
+        )
+        self.dead_lettered += len(events)
+        self.health_version += 1
+        logger.error('Dead-lettered %d events after %d attempts: %s', len(events), attempts, reason)
+        await self.flush_dead_letters()
+
+    async def flush_dead_letters(self):
+        """Persist dead letters; kept in memory while the store is still failing."""
+        if not self._dead_pending:
             return
-        self.processed_events_store.append({
-            'topic': topic,
-            'event_id': event_id,
-            'processed_at': ts,
-            'source': event.get('source'),
-            'payload': event.get('payload'),
-        })
-        logger.info(f"Processed event: topic={topic} event_id={event_id}")
+        rows, self._dead_pending = self._dead_pending, []
+        try:
+            await asyncio.to_thread(self.dedup_store.save_dead_letters, rows)
+        except Exception as e:
+            self._dead_pending = rows + self._dead_pending
+            logger.warning('Could not save %d dead letters, keeping them in memory: %s', len(rows), e)
+        self.health_version += 1
+
+    async def _handle(self, events: list[dict]):
+        processed = [datetime.utcnow() for _ in events]
+        items = [(e['topic'], e['event_id'], ts.isoformat()) for e, ts in zip(events, processed)]
+        # Sequenced topics are decided in memory; their windows are committed
+        # together with the key-store rows and only then become live.
+        sequenced, staged = self.sequences.plan(events) if self.sequences is not None else ({}, {})
+        key_pos = [pos for pos in range(len(events)) if pos not in sequenced] if sequenced else range(len(events))
+        flags, marks_ok, error = await self._commit(
+            [items[pos] for pos in key_pos] if sequenced else items,
+            SequenceTracker.rows(staged) if staged else (),
+        )
+        if staged and marks_ok:
+            self.sequences.apply(staged)
+        # None: not committed, the event goes to the dead-letter table
+        inserted = [None] * len(events)
+        for i, pos in enumerate(key_pos):
+            inserted[pos] = flags.get(i)
+        if marks_ok:
+            for pos, ok in sequenced.items():
+                inserted[pos] = ok
+        if error is not None:
+            await self._dead_letter([e for e, ok in zip(events, inserted) if ok is None], error, self.max_retries + 1)
+        elif self._dead_pending:
+            await self.flush_dead_letters()
+        committed_at = time.time()
+        # Per-event lines only at DEBUG; at INFO the summary logs one line per interval.
+        debug = logger.isEnabledFor(logging.DEBUG)
+        for event, (topic, event_id, _), ts, ok in zip(events, items, processed, inserted):
+            if ok is None:
+                continue
+            # the key is committed either way; one bad event must not take the batch down with it
+            try:
+                if self.topic_stats is not None:
+                    self.topic_stats.record(topic, event['timestamp'], committed_at, duplicate=not ok)
+                if self.log_summary is not None:
+                    self.log_summary.record(topic, duplicate=not ok)
+                if not ok:
+                    if debug:
+                        logger.debug('Duplicate dropped: topic=%s event_id=%s', topic, event_id)
+                    continue
+                if self.aggregates is not None:
+                    self.aggregates.record(event)
+                if self.sketches is not None:
+                    self.sketches.record(event)
+                record = EventRecord(topic, event_id, event.get('source'), to_micros(ts), packb(event.get('payload')))
+                self.processed_events_store.append(record)
+                if self.payload_index is not None:
+                    self.payload_index.add(event, record)
+            except Exception:
+                self.record_errors += 1
+                self.health_version += 1
+                logger.exception('Post-commit processing failed: topic=%s event_id=%s', topic, event_id)
+                continue
+            if debug:
+                logger.debug('Processed event: topic=%s event_id=%s', topic, event_id)
+        if any(inserted):
+            self.version += 1
     
     def stop(self):
         """Stop the worker gracefully"""
@@ -8,11 +8,13 @@ from src.main import create_app
 
 
 @pytest_asyncio.fixture(scope="function")
-async def client():
+async def client(request):
     """
     Fixture untuk membuat AsyncClient yang terhubung ke FastAPI app.
     Menggunakan ASGITransport untuk testing.
     Setiap test mendapat database temporary yang isolated.
+    Environment tambahan bisa diberikan lewat indirect parametrize:
+    @pytest.mark.parametrize("client", [{"ENV": "value"}], indirect=True)
     """
     # Create temporary database untuk setiap test
     with tempfile.NamedTemporaryFile(delete=False, suffix='.db') as tmp:
@@ -21,6 +23,9 @@ async def client():
     # Set environment variable
     old_db_path = os.environ.get('DEDUP_DB_PATH')
     os.environ['DEDUP_DB_PATH'] = db_path
+    extra_env = getattr(request, 'param', {})
+    old_extra = {k: os.environ.get(k) for k in extra_env}
+    os.environ.update(extra_env)
     
     try:
         app = create_app()
@@ -44,6 +49,11 @@ async def client():
             os.environ['DEDUP_DB_PATH'] = old_db_path
         elif 'DEDUP_DB_PATH' in os.environ:
             del os.environ['DEDUP_DB_PATH']
+        for k, v in old_extra.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
 
 
 @pytest.fixture(scope="session")
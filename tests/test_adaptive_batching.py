@@ -0,0 +1,105 @@
+import pytest
+import os
+import time
+import asyncio
+import tempfile
+from datetime import datetime
+from src.batching import AdaptiveBatcher
+from src.dedup_store import DedupStore
+from src.scheduler import FairQueue
+from src.worker import ConsumerWorker
+
+
+def test_batcher_grows_under_backlog_and_shrinks_on_slow_commits():
+    """Test batch size naik saat ada backlog dan turun saat commit terlalu lama"""
+    batcher = AdaptiveBatcher(target_p99=0.05, initial_batch=64, max_batch=1024)
+    for _ in range(10):
+        batcher.observe(batcher.batch_size, wait=0.001, commit=0.005, backlog=5000)
+    assert batcher.batch_size == 1024
+    assert batcher.linger == 0
+
+    for _ in range(300):
+        batcher.observe(batcher.batch_size, wait=0.0, commit=0.2, backlog=0)
+    assert batcher.batch_size < 1024
+    assert batcher.snapshot()["observed_p99_ms"] == pytest.approx(200)
+
+
+def test_batcher_lingers_only_with_headroom():
+    """Test linger hanya dipakai saat traffic ringan dan masih ada headroom latency"""
+    batcher = AdaptiveBatcher(target_p99=0.05, initial_batch=256, max_linger=0.005)
+    batcher.observe(1, wait=0.0, commit=0.001, backlog=0)
+    assert 0 < batcher.linger <= 0.005
+
+    tight = AdaptiveBatcher(target_p99=0.002, initial_batch=256, max_linger=0.005)
+    tight.observe(1, wait=0.0, commit=0.0019, backlog=0)
+    assert tight.linger < 0.0001
+
+
+@pytest.mark.asyncio
+async def test_stats_exposes_worker_parameters(client):
+    """Test parameter batch yang dipilih terlihat di /stats"""
+    await client.post("/publish", json=[
+        {"topic": "adaptive", "event_id": f"e{i}", "timestamp": datetime.utcnow().isoformat(),
+         "source": "svc", "payload": {}}
+        for i in range(50)
+    ])
+    await asyncio.sleep(0.3)
+    worker = (await client.get("/stats")).json()["worker"]
+    assert worker["adaptive"] is True
+    assert worker["batches"] >= 1
+    assert {"batch_size", "linger_ms", "target_p99_ms", "observed_p99_ms"} <= set(worker)
+
+
+class _CompletionLog(list):
+    """List event tersimpan yang mencatat kapan tiap event selesai di-commit"""
+
+    def __init__(self, done):
+        super().__init__()
+        self.done = done
+
+    def append(self, record):
+        super().append(record)
+        self.done[record.event_id] = time.monotonic()
+
+
+async def _bursty_run(tmpdir, batch_size, batcher):
+    store = DedupStore(os.path.join(tmpdir, f"bench-{batch_size}-{batcher is not None}.db"))
+    queue = FairQueue()
+    sent, done = {}, {}
+    worker = ConsumerWorker(queue, store, _CompletionLog(done), batch_size=batch_size, batcher=batcher)
+    task = asyncio.create_task(worker.start())
+    n = 0
+    started = time.monotonic()
+    # fase trickle, burst besar, trickle, burst besar
+    for phase, (count, pause) in enumerate([(200, 0.002), (4000, 0), (200, 0.002), (4000, 0)]):
+        for _ in range(count):
+            event = {"topic": f"t{n % 8}", "event_id": f"e{n}", "timestamp": datetime.utcnow(),
+                     "source": "bench", "payload": {"n": n}}
+            sent[event["event_id"]] = time.monotonic()
+            await queue.put(event)
+            n += 1
+            if pause:
+                await asyncio.sleep(pause)
+    while len(done) < n:
+        await asyncio.sleep(0.01)
+    elapsed = max(done.values()) - started
+    worker.stop()
+    task.cancel()
+    latencies = sorted(done[k] - sent[k] for k in sent)
+    return n / elapsed, latencies[int(len(latencies) * 0.99)] * 1000
+
+
+@pytest.mark.stress
+@pytest.mark.asyncio
+async def test_bursty_workload_benchmark():
+    """Bandingkan batch size tetap vs adaptive pada workload bursty"""
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for size in (1, 32, 256, 4096):
+            results.append((f"fixed {size}", *await _bursty_run(tmpdir, size, None)))
+        batcher = AdaptiveBatcher(target_p99=0.05)
+        results.append(("adaptive", *await _bursty_run(tmpdir, 256, batcher)))
+    print()
+    for name, throughput, p99 in results:
+        print(f"{name:>12}: {throughput:8.0f} events/sec, p99 {p99:7.1f} ms")
+    print(f"adaptive final: {batcher.snapshot()}")
@@ -0,0 +1,117 @@
+import pytest
+import json
+import asyncio
+from datetime import datetime, timedelta
+from src.aggregates import WindowAggregator
+
+
+BASE = datetime(2025, 1, 1, 0, 0, 0)
+
+
+def ev(seconds, amount=None, topic="orders"):
+    payload = {} if amount is None else {"amount": amount}
+    return {
+        "topic": topic,
+        "event_id": f"evt-{seconds}-{amount}",
+        "timestamp": BASE + timedelta(seconds=seconds),
+        "source": "order-service",
+        "payload": payload,
+    }
+
+
+def test_tumbling_window_count_sum_min_max():
+    """Test tumbling window menghitung count, sum, min dan max"""
+    agg = WindowAggregator("orders_10s", "orders", size=10, field="payload.amount")
+    for seconds, amount in [(1, 5), (3, 2), (4, None), (9, 7), (12, 1), (25, 4)]:
+        agg.add(ev(seconds, amount))  # amount None: hanya menambah count
+
+    snap = agg.snapshot()
+    closed = snap["closed"]
+    assert [w["count"] for w in closed] == [4, 1]
+    assert closed[0]["sum"] == 14
+    assert closed[0]["min"] == 2
+    assert closed[0]["max"] == 7
+    assert [w["count"] for w in snap["open"]] == [1]
+
+
+def test_sliding_window_assigns_to_overlapping_windows():
+    """Test sliding window: satu event masuk ke size/slide window"""
+    agg = WindowAggregator("orders_sliding", "orders", size=10, slide=5, field="payload.amount")
+    agg.add(ev(7, 3))
+    snap = agg.snapshot()
+    assert len(snap["open"]) == 2
+    assert all(w["sum"] == 3 for w in snap["open"])
+
+
+def test_fractional_slide_keeps_one_key_per_window():
+    """Test slide pecahan (0.1) tidak memecah satu window menjadi beberapa key karena pembulatan float"""
+    agg = WindowAggregator("orders_fast", "orders", size=0.3, slide=0.1)
+    for ms in range(1000, 1600, 10):
+        agg.add(ev(ms / 1000))
+
+    snap = agg.snapshot()
+    windows = snap["closed"] + snap["open"]
+    starts = [w["start"][11:] for w in windows]
+    assert starts == [f"00:00:0{t // 10}.{t % 10}00000" if t % 10 else f"00:00:0{t // 10}" for t in range(8, 16)]
+    # batas window eksak: tiap window penuh (0.3 detik) berisi tepat 30 event berjarak 10 ms
+    assert [w["count"] for w in windows] == [10, 20, 30, 30, 30, 30, 20, 10]
+
+
+def test_allowed_lateness_and_watermark():
+    """Test event terlambat diterima dalam allowed_lateness, selebihnya dibuang"""
+    agg = WindowAggregator("orders_late", "orders", size=10, allowed_lateness=5)
+    agg.add(ev(12))
+    agg.add(ev(8))       # watermark = 7, window [0,10) masih open
+    assert agg.late_dropped == 0
+    agg.add(ev(21))      # watermark = 16, window [0,10) ditutup
+    agg.add(ev(9))       # terlalu terlambat
+    assert agg.late_dropped == 1
+
+    snap = agg.snapshot()
+    assert snap["closed"][0]["count"] == 1
+    assert snap["watermark"] == (BASE + timedelta(seconds=16)).isoformat()
+
+
+def test_invalid_spec_rejected():
+    """Test konfigurasi window yang tidak valid ditolak"""
+    with pytest.raises(ValueError):
+        WindowAggregator.from_spec({"topic": "orders", "size": 10, "slide": 20})
+    with pytest.raises(ValueError):
+        WindowAggregator.from_spec({"size": 10})
+
+
+AGGREGATES = json.dumps([
+    {"name": "orders_1m", "topic": "order.created", "size": 60, "field": "payload.amount"},
+])
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("client", [{"AGGREGATES": AGGREGATES}], indirect=True)
+async def test_aggregates_endpoint(client):
+    """Test /aggregates diisi incremental oleh worker, duplicate tidak dihitung"""
+    ts = datetime.utcnow().replace(second=0, microsecond=0).isoformat()
+    events = [
+        {
+            "topic": "order.created",
+            "event_id": f"order-{i}",
+            "timestamp": ts,
+            "source": "order-service",
+            "payload": {"amount": 10 * i}
+        }
+        for i in range(1, 4)
+    ]
+    await client.post("/publish", json=events)
+    await client.post("/publish", json=events[:1])
+    await asyncio.sleep(0.3)
+
+    response = await client.get("/aggregates?topic=order.created")
+    assert response.status_code == 200
+    [agg] = response.json()
+    [window] = agg["open"]
+    assert window["count"] == 3
+    assert window["sum"] == 60
+    assert window["min"] == 10
+    assert window["max"] == 30
+
+    assert (await client.get("/aggregates/orders_1m")).status_code == 200
+    assert (await client.get("/aggregates/unknown")).status_code == 404
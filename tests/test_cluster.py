@@ -0,0 +1,217 @@
+import pytest
+import os
+import sys
+import time
+import socket
+import asyncio
+import tempfile
+import subprocess
+from contextlib import AsyncExitStack
+from datetime import datetime
+import httpx
+from httpx import AsyncClient, ASGITransport
+from src.main import create_app
+from src.cluster import Cluster, Forwarder, HashRing
+
+
+NODES = ["http://node-a", "http://node-b", "http://node-c"]
+
+
+def make_events(n, prefix="evt", topics=20):
+    return [
+        {
+            "topic": f"topic.{i % topics}",
+            "event_id": f"{prefix}-{i}",
+            "timestamp": datetime.utcnow().isoformat(),
+            "source": "cluster-test",
+            "payload": {"i": i}
+        }
+        for i in range(n)
+    ]
+
+
+def test_hash_ring_balance_and_stability():
+    """Test topic tersebar rata dan menambah node hanya memindahkan ~1/N topic"""
+    topics = [f"topic.{i}" for i in range(6000)]
+    ring = HashRing(NODES)
+    owners = {t: ring.owner(t) for t in topics}
+    for node in NODES:
+        share = sum(1 for o in owners.values() if o == node) / len(topics)
+        assert 0.25 < share < 0.42
+
+    bigger = HashRing(NODES + ["http://node-d"])
+    moved = [t for t in topics if bigger.owner(t) != owners[t]]
+    assert len(moved) / len(topics) < 0.35
+    # topic yang pindah hanya pindah ke node baru
+    assert all(bigger.owner(t) == "http://node-d" for t in moved)
+
+
+async def _start_cluster(stack, tmpdir, nodes):
+    """Jalankan beberapa app in-process; HTTP antar node lewat ASGITransport"""
+    apps = {}
+    for node in nodes:
+        os.environ["DEDUP_DB_PATH"] = os.path.join(tmpdir, f"{node.rsplit('/', 1)[-1]}.db")
+        try:
+            app = create_app()
+            await stack.enter_async_context(app.router.lifespan_context(app))
+        finally:
+            del os.environ["DEDUP_DB_PATH"]
+        apps[node] = app
+
+    mounts = {node: ASGITransport(app=app) for node, app in apps.items()}
+    for node, app in apps.items():
+        # lifespan menutup cluster ini saat shutdown
+        app.state.cluster = Cluster(node, nodes, linger=0.002, client=AsyncClient(mounts=mounts))
+    return {
+        node: await stack.enter_async_context(AsyncClient(transport=mounts[node], base_url=node))
+        for node in nodes
+    }
+
+
+@pytest.mark.asyncio
+async def test_forwarder_close_waits_for_batches_in_flight():
+    """Test close() menunggu batch yang sedang dikirim dan menggagalkan yang belum terkirim"""
+    sent = []
+
+    async def handler(request):
+        await asyncio.sleep(0.1)
+        sent.append(request.content)
+        return httpx.Response(200, json={})
+
+    async with AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        forwarder = Forwarder(client, "http://peer/publish", batch_size=1, linger=0.001, max_inflight=1)
+        first = asyncio.create_task(forwarder.submit([{"n": 1}]))
+        await asyncio.sleep(0.02)
+        second = asyncio.create_task(forwarder.submit([{"n": 2}]))
+        await asyncio.sleep(0.02)
+        await forwarder.close()
+        assert await first == [] and len(sent) == 1
+        with pytest.raises(RuntimeError):
+            await second
+
+
+@pytest.mark.asyncio
+async def test_publish_forwards_to_topic_owner():
+    """Test event diteruskan ke owner topic dan /stats?scope=cluster menggabungkan semua node"""
+    events = make_events(300)
+    ring = HashRing(NODES)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        async with AsyncExitStack() as stack:
+            clients = await _start_cluster(stack, tmpdir, NODES)
+            # publish ke node berbeda, sebagian sebagai duplicate
+            responses = await asyncio.gather(
+                clients[NODES[0]].post("/publish", json=events[:200]),
+                clients[NODES[1]].post("/publish", json=events[100:]),
+            )
+            assert [r.json()["accepted"] for r in responses] == [200, 200]
+            await asyncio.sleep(0.5)
+
+            for node, client in clients.items():
+                topics = (await client.get("/stats")).json()["topics"]
+                assert topics and all(ring.owner(t) == node for t in topics)
+
+            cluster = (await clients[NODES[2]].get("/stats", params={"scope": "cluster"})).json()
+            assert cluster["received"] == 400
+            assert cluster["unique_processed"] == 300
+            assert cluster["duplicate_dropped"] == 100
+            assert len(cluster["topics"]) == 20
+            assert set(cluster["nodes"]) == set(NODES)
+            assert cluster["unreachable"] == []
+
+            node_a = (await clients[NODES[0]].get("/stats")).json()
+            assert node_a["forwarded"] + node_a["received"] >= 200
+
+
+@pytest.mark.asyncio
+async def test_cluster_stats_do_not_count_dead_letters_as_duplicates():
+    """Test duplicate_dropped cluster adalah jumlah per node, bukan received - unique"""
+    def node_stats(received, unique, duplicates):
+        return {"received": received, "unique_processed": unique, "duplicate_dropped": duplicates,
+                "topics": ["t"]}
+
+    remote = {"node-b": node_stats(10, 6, 1), "node-c": node_stats(5, 5, 0)}
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, json=remote[request.url.host]))
+    cluster = Cluster(NODES[0], NODES, client=AsyncClient(transport=transport))
+    try:
+        # node-a: 2 dead letter, node-b: 3 dead letter
+        stats = await cluster.gather_stats(node_stats(20, 15, 3))
+    finally:
+        await cluster.close()
+    assert (stats["received"], stats["unique_processed"], stats["duplicate_dropped"]) == (35, 26, 4)
+
+
+@pytest.mark.parametrize(
+    "client",
+    [{"CLUSTER_NODES": "http://test,http://127.0.0.1:9", "CLUSTER_SELF": "http://test"}],
+    indirect=True,
+)
+@pytest.mark.asyncio
+async def test_forward_failure_returns_502(client):
+    """Test publish gagal (502) jika owner topic tidak bisa dihubungi"""
+    ring = HashRing(["http://test", "http://127.0.0.1:9"])
+    remote_topic = next(f"t{i}" for i in range(100) if ring.owner(f"t{i}") != "http://test")
+    response = await client.post("/publish", json=make_events(1, topics=1)[0] | {"topic": remote_topic})
+    assert response.status_code == 502
+
+    stats = (await client.get("/stats", params={"scope": "cluster"})).json()
+    assert stats["unreachable"] == ["http://127.0.0.1:9"]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url, timeout=20):
+    import httpx
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/stats").status_code == 200:
+                return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise TimeoutError(url)
+
+
+@pytest.mark.stress
+def test_local_processes_cluster():
+    """Jalankan cluster 3 proses uvicorn lokal di port berbeda dan ukur throughput gabungan"""
+    import httpx
+    urls = [f"http://127.0.0.1:{_free_port()}" for _ in range(3)]
+    procs = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        try:
+            for i, url in enumerate(urls):
+                env = dict(os.environ, CLUSTER_NODES=",".join(urls), CLUSTER_SELF=url,
+                           DEDUP_DB_PATH=os.path.join(tmpdir, f"node{i}.db"), LOG_LEVEL="WARNING")
+                procs.append(subprocess.Popen(
+                    [sys.executable, "-m", "uvicorn", "src.main:app", "--port", url.rsplit(":", 1)[1]],
+                    env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                ))
+            for url in urls:
+                _wait_ready(url)
+
+            total = 6000
+            events = make_events(total, topics=60)
+            started = time.perf_counter()
+            with httpx.Client(timeout=30) as client:
+                for n, start in enumerate(range(0, total, 100)):
+                    response = client.post(f"{urls[n % 3]}/publish", json=events[start:start + 100])
+                    assert response.status_code == 200
+                deadline = time.monotonic() + 30
+                while time.monotonic() < deadline:
+                    stats = client.get(f"{urls[0]}/stats", params={"scope": "cluster"}).json()
+                    if stats["unique_processed"] == total:
+                        break
+                    time.sleep(0.1)
+            elapsed = time.perf_counter() - started
+            assert stats["unique_processed"] == total
+            assert stats["duplicate_dropped"] == 0
+            assert all("error" not in s and s["unique_processed"] > 0 for s in stats["nodes"].values())
+        finally:
+            for proc in procs:
+                proc.terminate()
+                proc.wait(10)
+    print(f"\n3-node cluster: {total} events in {elapsed:.2f}s ({total / elapsed:.0f} events/sec)")
@@ -0,0 +1,86 @@
+import pytest
+import json
+import asyncio
+import tracemalloc
+from datetime import datetime
+from src.codec import packb, unpackb
+from src.model import EventRecord, to_micros, from_micros
+
+
+def test_record_roundtrip():
+    """Test bahwa EventRecord menghasilkan dict yang sama dengan format lama"""
+    ts = datetime(2025, 10, 24, 10, 30, 0, 123456)
+    payload = {"user_id": "123", "items": [1, 2.5, None, True], "nested": {"a": "b"}}
+    record = EventRecord("user.created", "evt-1", "user-service", to_micros(ts), packb(payload))
+    assert record.to_dict() == {
+        "topic": "user.created",
+        "event_id": "evt-1",
+        "processed_at": ts.isoformat(),
+        "source": "user-service",
+        "payload": payload,
+    }
+    assert from_micros(to_micros(ts)) == ts
+    assert EventRecord("user.created", "evt-2", "user-service", 0, b"\x80").topic is record.topic
+
+
+def test_big_integers_roundtrip():
+    """Test integer di luar 64-bit (valid di JSON) tetap tersimpan dan terbaca utuh"""
+    payload = {"n": 2**64, "neg": -2**70, "items": [2**100, 1]}
+    record = EventRecord("t", "e", "s", 0, packb(payload))
+    assert record.payload == payload
+    assert unpackb(packb(payload)) == payload
+
+
+@pytest.mark.asyncio
+async def test_big_integer_payload_is_served(client):
+    """Test event dengan payload integer besar muncul di /events, tidak hanya terhitung di dedup"""
+    event = {"topic": "big", "event_id": "b1", "timestamp": datetime.utcnow().isoformat(),
+             "source": "s", "payload": {"n": 2**64}}
+    assert (await client.post("/publish", json=event)).status_code == 200
+    await asyncio.sleep(0.3)
+    stats = (await client.get("/stats")).json()
+    assert stats["unique_processed"] == 1
+    assert stats["worker"]["health"]["record_errors"] == 0
+    events = (await client.get("/events")).json()
+    assert [e["payload"] for e in events] == [{"n": 2**64}]
+    packed = await client.get("/events", headers={"Accept": "application/msgpack"})
+    assert unpackb(packed.content)[0]["payload"] == {"n": 2**64}
+
+
+def _retained_bytes(build, n):
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept = [build(i) for i in range(n)]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    assert len(kept) == n
+    return (after - before) / n
+
+
+def test_bytes_per_retained_event():
+    """Laporkan bytes per event yang disimpan: dict lama vs EventRecord"""
+    n = 5000
+    raw_payload = json.dumps({"user_id": "user-123", "amount": 42, "currency": "IDR"})
+    # event_id dibuat di luar pengukuran: sama-sama disimpan di kedua representasi
+    event_ids = [f"evt-{i}" for i in range(n)]
+
+    def as_dict(i):
+        return {
+            "topic": "order." + "created",
+            "event_id": event_ids[i],
+            "processed_at": datetime.utcnow().isoformat(),
+            "source": "order-" + "service",
+            "payload": json.loads(raw_payload),
+        }
+
+    def as_record(i):
+        return EventRecord("order." + "created", event_ids[i], "order-" + "service",
+                           to_micros(datetime.utcnow()), packb(json.loads(raw_payload)))
+
+    dict_bytes = _retained_bytes(as_dict, n)
+    record_bytes = _retained_bytes(as_record, n)
+    print(f"\ndict representation: {dict_bytes:.0f} bytes/event")
+    print(f"EventRecord: {record_bytes:.0f} bytes/event")
+    assert record_bytes < dict_bytes / 2
@@ -0,0 +1,156 @@
+import pytest
+import os
+import asyncio
+import time
+import tempfile
+from datetime import datetime
+from httpx import AsyncClient, ASGITransport
+from starlette.requests import Request
+from src.http_cache import ResponseCache
+from src.main import create_app
+
+
+def make_event(event_id, topic="cache.topic"):
+    return {
+        "topic": topic,
+        "event_id": event_id,
+        "timestamp": datetime.utcnow().isoformat(),
+        "source": "test-service",
+        "payload": {"id": event_id}
+    }
+
+
+@pytest.mark.asyncio
+async def test_events_etag_and_304(client):
+    """Test /events mengembalikan 304 selama tidak ada commit baru"""
+    await client.post("/publish", json=[make_event("evt-1"), make_event("evt-2")])
+    await asyncio.sleep(0.3)
+
+    first = await client.get("/events")
+    etag = first.headers["etag"]
+    assert len(first.json()) == 2
+
+    again = await client.get("/events", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+
+    # query lain punya body sendiri tapi versi data yang sama
+    by_topic = await client.get("/events", params={"topic": "cache.topic"})
+    assert by_topic.headers["etag"] == etag
+    assert [r["event_id"] for r in by_topic.json()] == ["evt-1", "evt-2"]
+
+    # duplicate tidak mengubah data, jadi versi tetap
+    await client.post("/publish", json=make_event("evt-1"))
+    await asyncio.sleep(0.3)
+    assert (await client.get("/events", headers={"If-None-Match": etag})).status_code == 304
+
+    await client.post("/publish", json=make_event("evt-3"))
+    await asyncio.sleep(0.3)
+    changed = await client.get("/events", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert len(changed.json()) == 3
+
+
+@pytest.mark.asyncio
+async def test_etag_depends_on_media_type(client):
+    """Test ETag JSON dan msgpack berbeda sehingga cache tidak tertukar"""
+    json_etag = (await client.get("/events")).headers["etag"]
+    packed = await client.get("/events", headers={"Accept": "application/msgpack", "If-None-Match": json_etag})
+    assert packed.status_code == 200
+    assert packed.headers["content-type"] == "application/msgpack"
+    assert packed.headers["etag"] != json_etag
+
+
+@pytest.mark.asyncio
+async def test_stats_weak_etag_keeps_uptime_fresh(client):
+    """Test /stats memakai weak ETag; counter baru membuat ETag berubah"""
+    first = await client.get("/stats")
+    etag = first.headers["etag"]
+    assert etag.startswith("W/")
+    assert (await client.get("/stats", headers={"If-None-Match": etag})).status_code == 304
+
+    await asyncio.sleep(0.1)
+    fresh = (await client.get("/stats")).json()
+    assert fresh["uptime_seconds"] > first.json()["uptime_seconds"]
+
+    await client.post("/publish", json=make_event("evt-stats"))
+    await asyncio.sleep(0.3)
+    changed = await client.get("/stats", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["unique_processed"] == 1
+
+
+def test_cache_key_ignores_unread_params():
+    """Test query param yang tidak dibaca endpoint (mis. ?_=cache-buster) tidak membuat entry cache baru"""
+    cache = ResponseCache()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return [{"event_id": "evt-1"}]
+
+    for i in range(50):
+        request = Request({"type": "http", "method": "GET", "path": "/events",
+                           "query_string": f"topic=t&_={i}".encode(), "headers": []})
+        response = cache.respond(request, 1, build, params=("t", ()))
+        assert response.body == b'[{"event_id":"evt-1"}]'
+    assert len(builds) == 1
+    assert len(cache._entries) == 1
+
+
+@pytest.mark.asyncio
+async def test_stats_polling_does_not_query_storage():
+    """Test polling /stats (304 maupun 200) tidak menjalankan PRAGMA storage selama data tidak berubah"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.environ["DEDUP_DB_PATH"] = os.path.join(tmpdir, "dedup.db")
+        try:
+            app = create_app()
+            async with app.router.lifespan_context(app):
+                calls = {"n": 0}
+                storage_info = app.state.maintenance.storage_info
+
+                def counted():
+                    calls["n"] += 1
+                    return storage_info()
+
+                app.state.maintenance.storage_info = counted
+                async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                    etag = (await client.get("/stats")).headers["etag"]
+                    for _ in range(20):
+                        assert (await client.get("/stats", headers={"If-None-Match": etag})).status_code == 304
+                        assert (await client.get("/stats")).status_code == 200
+                    assert calls["n"] == 1
+
+                    await client.post("/publish", json=make_event("evt-storage"))
+                    await asyncio.sleep(0.3)
+                    assert "db_bytes" in (await client.get("/stats")).json()["storage"]
+                    assert calls["n"] == 2
+        finally:
+            del os.environ["DEDUP_DB_PATH"]
+
+
+@pytest.mark.stress
+@pytest.mark.asyncio
+async def test_idle_polling_cost(client):
+    """Ukur biaya polling /events saat data tidak berubah (cache hit dan 304)"""
+    await client.post("/publish", json=[make_event(f"evt-{i}", topic=f"t{i % 10}") for i in range(5000)])
+    await asyncio.sleep(2)
+
+    started = time.perf_counter()
+    first = await client.get("/events")
+    cold = time.perf_counter() - started
+    assert len(first.json()) == 5000
+
+    polls = 200
+    started = time.perf_counter()
+    for _ in range(polls):
+        assert (await client.get("/events")).status_code == 200
+    warm = (time.perf_counter() - started) / polls
+
+    started = time.perf_counter()
+    for _ in range(polls):
+        response = await client.get("/events", headers={"If-None-Match": first.headers["etag"]})
+        assert response.status_code == 304
+    conditional = (time.perf_counter() - started) / polls
+    print(f"\n/events 5000 events: cold {cold * 1000:.1f} ms, cached {warm * 1000:.2f} ms, 304 {conditional * 1000:.2f} ms")
@@ -0,0 +1,84 @@
+import pytest
+import asyncio
+import tracemalloc
+from datetime import datetime
+
+
+DEBUG_ENV = {"DEBUG_ENDPOINTS": "1", "DEBUG_TOKEN": "s3cret"}
+HEADERS = {"X-Debug-Token": "s3cret"}
+
+
+@pytest.mark.asyncio
+async def test_debug_endpoints_disabled_by_default(client):
+    """Test bahwa endpoint debug tidak ada jika tidak diaktifkan"""
+    assert (await client.get("/debug/profile?seconds=0.1")).status_code == 404
+    assert (await client.get("/debug/memory")).status_code == 404
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("client", [{"DEBUG_ENDPOINTS": "1"}], indirect=True)
+async def test_debug_endpoints_need_token_to_register(client):
+    """Test endpoint debug tidak didaftarkan tanpa DEBUG_TOKEN, seperti endpoint admin"""
+    assert (await client.get("/debug/timings")).status_code == 404
+    assert (await client.get("/debug/memory")).status_code == 404
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("client", [DEBUG_ENV], indirect=True)
+async def test_debug_token_required(client):
+    """Test bahwa endpoint debug dijaga token"""
+    assert (await client.get("/debug/timings")).status_code == 403
+    assert (await client.get("/debug/timings", headers=HEADERS)).status_code == 200
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("client", [DEBUG_ENV], indirect=True)
+async def test_profile_and_handle_timings(client):
+    """Test CPU profile dan timing per coroutine ConsumerWorker._handle"""
+    events = [
+        {
+            "topic": "debug.topic",
+            "event_id": f"evt-{i}",
+            "timestamp": datetime.utcnow().isoformat(),
+            "source": "svc",
+            "payload": {}
+        }
+        for i in range(20)
+    ]
+
+    async def publish_later():
+        await asyncio.sleep(0.05)
+        await client.post("/publish", json=events)
+
+    profile, _ = await asyncio.gather(
+        client.get("/debug/profile", params={"seconds": 0.3, "limit": 200}, headers=HEADERS),
+        publish_later(),
+    )
+    assert profile.status_code == 200
+    functions = profile.json()["functions"]
+    assert any(f["function"] == "_handle" for f in functions)
+
+    timings = (await client.get("/debug/timings", headers=HEADERS)).json()
+    handle = timings["ConsumerWorker._handle"]
+    assert handle["count"] >= 1
+    assert handle["max_ms"] >= handle["p50_ms"] > 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("client", [DEBUG_ENV], indirect=True)
+async def test_memory_snapshots(client):
+    """Test tracemalloc: panggilan pertama mulai tracing, berikutnya melaporkan top dan growth"""
+    try:
+        first = (await client.get("/debug/memory", headers=HEADERS)).json()
+        assert first["started"] is True
+
+        retained = [bytearray(1024) for _ in range(200)]
+        second = (await client.get("/debug/memory", headers=HEADERS)).json()
+        assert second["started"] is False
+        assert second["traced_bytes"] > 0
+        assert second["top"] and second["growth"]
+        del retained
+    finally:
+        stopped = (await client.get("/debug/memory?stop=true", headers=HEADERS)).json()
+        assert stopped["tracing"] is False
+        assert not tracemalloc.is_tracing()
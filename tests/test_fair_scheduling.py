@@ -0,0 +1,95 @@
+import pytest
+import asyncio
+from datetime import datetime
+from src.scheduler import FairQueue
+
+
+def ev(topic, i):
+    return {"topic": topic, "event_id": f"{topic}-{i}"}
+
+
+def drain(queue):
+    out = []
+    while not queue.empty():
+        out.append(queue.get_nowait()["topic"])
+    return out
+
+
+def test_burst_does_not_block_other_topics():
+    """Test bahwa burst di satu topic tidak menahan topic lain di belakangnya"""
+    queue = FairQueue()
+    for i in range(1000):
+        queue.put_nowait(ev("bulk", i))
+    queue.put_nowait(ev("latency", 0))
+    order = drain(queue)
+    assert order.index("latency") <= 1
+    assert len(order) == 1001
+
+
+def test_weights_share_throughput():
+    """Test pembagian throughput sesuai bobot (DRR)"""
+    queue = FairQueue(weights={"a": 3, "b": 1})
+    for i in range(400):
+        queue.put_nowait(ev("a", i))
+        queue.put_nowait(ev("b", i))
+    first = [queue.get_nowait()["topic"] for _ in range(200)]
+    assert first.count("a") == 150
+    assert first.count("b") == 50
+
+    # Bobot pecahan: topic dengan bobot 0.5 dilayani setiap dua putaran
+    queue = FairQueue(weights={"slow": 0.5})
+    for i in range(10):
+        queue.put_nowait(ev("slow", i))
+        queue.put_nowait(ev("fast", i))
+    first = [queue.get_nowait()["topic"] for _ in range(9)]
+    assert first.count("fast") == 6
+
+
+def test_priorities_and_fifo_within_topic():
+    """Test prioritas ketat antar level dan urutan FIFO di dalam topic"""
+    queue = FairQueue(priorities={"urgent": 10})
+    for i in range(5):
+        queue.put_nowait(ev("normal", i))
+    for i in range(3):
+        queue.put_nowait(ev("urgent", i))
+    items = [queue.get_nowait() for _ in range(8)]
+    assert [e["topic"] for e in items[:3]] == ["urgent"] * 3
+    assert [e["event_id"] for e in items[3:]] == [f"normal-{i}" for i in range(5)]
+
+    with pytest.raises(ValueError):
+        FairQueue(weights={"x": 0})
+
+
+def test_head_of_line_wait_reported():
+    """Test waktu tunggu head-of-line dilaporkan per topic"""
+    queue = FairQueue()
+    queue.put_nowait(ev("a", 0))
+    queue.put_nowait(ev("a", 1))
+    queue.get_nowait()
+    snap = queue.topic_snapshot()
+    assert snap["a"]["queued"] == 1
+    assert snap["a"]["dequeued"] == 1
+    assert snap["a"]["head_wait_ms"] >= 0
+    assert snap["a"]["wait_ms_max"] >= 0
+
+
+@pytest.mark.asyncio
+async def test_queue_stats_endpoint(client):
+    """Test /stats/queue berisi statistik scheduler per topic"""
+    events = [
+        {
+            "topic": f"sched.{i % 2}",
+            "event_id": f"evt-{i}",
+            "timestamp": datetime.utcnow().isoformat(),
+            "source": "svc",
+            "payload": {}
+        }
+        for i in range(20)
+    ]
+    await client.post("/publish", json=events)
+    await asyncio.sleep(0.3)
+
+    stats = (await client.get("/stats/queue")).json()
+    assert stats["depth"] == 0
+    assert stats["topics"]["sched.0"]["dequeued"] == 10
+    assert (await client.get("/stats")).json()["unique_processed"] == 20
@@ -0,0 +1,195 @@
+import pytest
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import httpx
+from httpx import AsyncClient, ASGITransport
+from src.codec import pack_ingest, unpack_ingest
+from src.frontend import create_frontend_app
+from src.main import create_app
+
+
+SCHEMA = {"type": "object", "properties": {"n": {"type": "integer"}}, "required": ["n"]}
+
+
+def make_events(n, topics=5, prefix="evt"):
+    return [
+        {
+            "topic": f"front.{i % topics}",
+            "event_id": f"{prefix}-{i}",
+            "timestamp": datetime.utcnow().isoformat(),
+            "source": "test-service",
+            "payload": {"n": i}
+        }
+        for i in range(n)
+    ]
+
+
+def test_ingest_rows_roundtrip():
+    """Test format baris ringkas front-end -> writer mengembalikan event yang sama"""
+    event = {"topic": "t", "event_id": "e1", "timestamp": datetime(2025, 1, 2, 3, 4, 5, 6),
+             "source": "s", "payload": {"a": [1, {"b": None}]}}
+    assert unpack_ingest(pack_ingest([event])) == ([event], [0])
+    assert unpack_ingest(pack_ingest([{**event, "schema_version": 3}])) == ([event], [3])
+
+
+@pytest.mark.asyncio
+async def test_frontend_validates_and_forwards_to_writer():
+    """Test front-end mem-parse dan memvalidasi, writer tetap satu-satunya tempat dedup"""
+    env = {"INTERNAL_INGEST": "1", "PAYLOAD_SCHEMAS": json.dumps({"front.0": SCHEMA})}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.environ.update(env, DEDUP_DB_PATH=os.path.join(tmpdir, "dedup.db"))
+        try:
+            writer = create_app()
+            async with writer.router.lifespan_context(writer):
+                frontends = [create_frontend_app(writer_transport=ASGITransport(app=writer)) for _ in range(2)]
+                async with frontends[0].router.lifespan_context(frontends[0]), \
+                        frontends[1].router.lifespan_context(frontends[1]):
+                    clients = [AsyncClient(transport=ASGITransport(app=f), base_url="http://test") for f in frontends]
+                    await check_frontends(clients)
+                    for c in clients:
+                        await c.aclose()
+        finally:
+            for key in [*env, "DEDUP_DB_PATH"]:
+                del os.environ[key]
+
+
+async def check_frontends(clients):
+    events = make_events(100)
+    # batch yang sama dikirim lewat dua front-end berbeda, ditambah duplicate di dalam batch
+    responses = await asyncio.gather(
+        clients[0].post("/publish", json=events + events[:10]),
+        clients[1].post("/publish", json=events[50:]),
+    )
+    assert [r.json() for r in responses] == [{"accepted": 110}, {"accepted": 50}]
+
+    bad = await clients[0].post("/publish", json=[{**events[0], "event_id": "bad", "payload": {"n": "x"}}])
+    assert bad.status_code == 422
+    assert bad.json()["detail"]["rejected"][0]["errors"][0]["loc"] == ["payload", "n"]
+
+    key = {"Idempotency-Key": "front-key"}
+    idem = make_events(3, prefix="idem")
+    first = await clients[0].post("/publish", json=idem, headers=key)
+    replay = await clients[1].post("/publish", json=idem, headers=key)
+    assert replay.headers["idempotent-replayed"] == "true"
+    assert replay.json() == first.json()
+
+    await asyncio.sleep(0.3)
+    stats = (await clients[1].get("/stats")).json()
+    assert stats["received"] == 163
+    assert stats["unique_processed"] == 103
+    assert stats["duplicate_dropped"] == 60
+    events_response = await clients[0].get("/events", params={"topic": "front.1"})
+    assert events_response.status_code == 200 and "etag" in events_response.headers
+    assert (await clients[0].get("/readyz")).json()["ready"] is True
+    assert (await clients[0].post("/internal/ingest", content=pack_ingest(events))).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_writer_validates_rows_checked_against_stale_schema():
+    """Test schema baru di writer tetap berlaku walau salinan front-end belum di-refresh"""
+    env = {"INTERNAL_INGEST": "1", "ADMIN_TOKEN": "secret", "FRONTEND_SCHEMA_REFRESH": "3600"}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.environ.update(env, DEDUP_DB_PATH=os.path.join(tmpdir, "dedup.db"))
+        try:
+            writer = create_app()
+            async with writer.router.lifespan_context(writer):
+                frontend = create_frontend_app(writer_transport=ASGITransport(app=writer))
+                async with frontend.router.lifespan_context(frontend):
+                    async with AsyncClient(transport=ASGITransport(app=frontend), base_url="http://test") as client:
+                        put = await client.put("/admin/schemas/front.0", json=SCHEMA, headers={"X-Admin-Token": "secret"})
+                        assert put.status_code == 200
+                        assert "front.0" not in frontend.state.schemas
+
+                        events = make_events(4)
+                        events[2] = {**events[0], "event_id": "bad", "payload": {"n": "x"}}
+                        response = await client.post("/publish", json=events)
+                        assert response.status_code == 200
+                        body = response.json()
+                        assert body["accepted"] == 3
+                        assert [(r["index"], r["event_id"]) for r in body["rejected"]] == [(2, "bad")]
+
+                        bad = await client.post("/publish", json=[{**events[2], "event_id": "bad-2"}])
+                        assert bad.status_code == 422
+                        await asyncio.sleep(0.3)
+                        assert (await client.get("/stats")).json()["unique_processed"] == 3
+        finally:
+            for key in [*env, "DEDUP_DB_PATH"]:
+                del os.environ[key]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/readyz").status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise TimeoutError(url)
+
+
+def _publish_all(url, total, duplicates, senders=8, batch=250):
+    events = make_events(total, topics=50)
+    batches = [events[i:i + batch] for i in range(0, total, batch)]
+    batches += [events[i:i + batch] for i in range(0, duplicates, batch)]
+
+    def send(chunk):
+        with httpx.Client(timeout=60) as client:
+            for b in chunk:
+                assert client.post(f"{url}/publish", json=b).status_code == 200
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(senders) as pool:
+        list(pool.map(send, [batches[i::senders] for i in range(senders)]))
+    return time.perf_counter() - started
+
+
+@pytest.mark.stress
+def test_multiprocess_ingest_throughput():
+    """Bandingkan throughput /publish satu proses vs launcher (writer + front-end multi-proses)"""
+    total, duplicates = 40000, 10000
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for mode in ("single", "launcher"):
+            port = _free_port()
+            url = f"http://127.0.0.1:{port}"
+            env = dict(os.environ, DEDUP_DB_PATH=os.path.join(tmpdir, f"{mode}.db"), LOG_LEVEL="WARNING")
+            if mode == "single":
+                cmd = [sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(port), "--no-access-log"]
+            else:
+                cmd = [sys.executable, "-m", "src.launcher", "--workers", str(max(2, os.cpu_count() or 1)),
+                       "--host", "127.0.0.1", "--port", str(port), "--socket", os.path.join(tmpdir, "writer.sock")]
+            proc = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                _wait_ready(url)
+                elapsed = _publish_all(url, total, duplicates)
+                deadline = time.monotonic() + 60
+                while time.monotonic() < deadline:
+                    stats = httpx.get(f"{url}/stats").json()
+                    if stats["unique_processed"] == total and stats["received"] == total + duplicates:
+                        break
+                    time.sleep(0.2)
+                assert stats["unique_processed"] == total
+                assert stats["duplicate_dropped"] == duplicates
+                results[mode] = (total + duplicates) / elapsed
+            finally:
+                proc.terminate()
+                proc.wait(30)
+    print(f"\ncpu_count={os.cpu_count()}")
+    for mode, rate in results.items():
+        print(f"{mode:>9}: {rate:8.0f} events/sec accepted by /publish")
@@ -0,0 +1,61 @@
+import pytest
+import os
+import asyncio
+import tempfile
+from httpx import AsyncClient, ASGITransport
+from src.main import create_app
+
+
+@pytest.mark.asyncio
+async def test_healthz_and_readyz(client):
+    """Test liveness dan readiness menjawab 200 saat worker berjalan normal"""
+    health = await client.get("/healthz")
+    assert health.status_code == 200
+    assert health.json() == {"status": "ok"}
+
+    ready = await client.get("/readyz")
+    assert ready.status_code == 200
+    body = ready.json()
+    assert body["ready"] is True
+    assert body["checks"] == {"worker": True, "queue": True, "store": True, "accepting": True}
+
+
+@pytest.mark.asyncio
+async def test_probes_never_touch_the_store():
+    """Test probe hanya membaca state di memori: store yang rusak tidak memengaruhi /healthz,
+    sedangkan worker yang gagal commit dan queue penuh membuat /readyz 503"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.environ.update(DEDUP_DB_PATH=os.path.join(tmpdir, "dedup.db"), READY_MAX_QUEUE_DEPTH="5")
+        try:
+            app = create_app()
+            async with app.router.lifespan_context(app):
+                async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                    await asyncio.sleep(0)
+                    dedup = app.state.dedup
+
+                    def broken(*args, **kwargs):
+                        raise AssertionError("probe touched the store")
+
+                    for name in ("count_processed", "list_topics", "storage_info", "is_processed"):
+                        setattr(dedup, name, broken)
+                    assert (await client.get("/healthz")).status_code == 200
+                    assert (await client.get("/readyz")).status_code == 200
+
+                    app.state.worker.consecutive_failures = 1
+                    ready = await client.get("/readyz")
+                    assert ready.status_code == 503
+                    assert ready.json()["checks"]["store"] is False
+                    app.state.worker.consecutive_failures = 0
+
+                    app.state.worker.stop()
+                    app.state._consumer_task.cancel()
+                    await asyncio.sleep(0)
+                    for i in range(5):
+                        await app.state.queue.put({"topic": "t", "event_id": f"e{i}"})
+                    ready = (await client.get("/readyz")).json()
+                    assert ready["checks"]["queue"] is False
+                    assert ready["checks"]["worker"] is False
+                    assert ready["queue_depth"] == 5
+                    assert (await client.get("/healthz")).status_code == 503
+        finally:
+            del os.environ["DEDUP_DB_PATH"], os.environ["READY_MAX_QUEUE_DEPTH"]
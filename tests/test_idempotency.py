@@ -0,0 +1,139 @@
+import pytest
+import os
+import time
+import asyncio
+import tempfile
+from datetime import datetime
+from httpx import AsyncClient, ASGITransport
+from src.main import create_app
+from src.dedup_store import DedupStore
+from src.idempotency import IdempotencyStore
+
+
+def make_batch(n, prefix="evt"):
+    return [
+        {
+            "topic": "idem.topic",
+            "event_id": f"{prefix}-{i}",
+            "timestamp": datetime.utcnow().isoformat(),
+            "source": "test-service",
+            "payload": {"i": i}
+        }
+        for i in range(n)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_retry_returns_original_response(client):
+    """Test retry dengan Idempotency-Key yang sama tidak masuk queue lagi"""
+    batch = make_batch(100)
+    headers = {"Idempotency-Key": "batch-1"}
+    first = await client.post("/publish", json=batch, headers=headers)
+    assert first.status_code == 200
+    assert "idempotent-replayed" not in first.headers
+
+    retry = await client.post("/publish", json=batch, headers=headers)
+    assert retry.status_code == 200
+    assert retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+
+    await asyncio.sleep(0.3)
+    stats = (await client.get("/stats")).json()
+    assert stats["received"] == 100
+    assert stats["duplicate_dropped"] == 0
+
+    # key sama dengan body berbeda ditolak
+    other = await client.post("/publish", json=make_batch(100, prefix="other"), headers=headers)
+    assert other.status_code == 422
+
+    # tanpa header tetap diproses seperti biasa
+    plain = await client.post("/publish", json=batch)
+    assert plain.status_code == 200
+    await asyncio.sleep(0.3)
+    assert (await client.get("/stats")).json()["duplicate_dropped"] == 100
+
+
+@pytest.mark.asyncio
+async def test_failed_publish_is_not_stored(client):
+    """Test response gagal (validasi) tidak disimpan sehingga retry diproses ulang"""
+    headers = {"Idempotency-Key": "bad-then-good"}
+    bad = await client.post("/publish", content=b"{not json", headers={**headers, "Content-Type": "application/json"})
+    assert bad.status_code == 422
+    good = await client.post("/publish", json=make_batch(1), headers=headers)
+    assert good.status_code == 200
+    assert "idempotent-replayed" not in good.headers
+
+    assert (await client.post("/publish", json=make_batch(1), headers={"Idempotency-Key": ""})).status_code == 400
+
+
+def test_store_ttl_eviction_and_in_flight():
+    """Test entry kedaluwarsa, jumlah entry dibatasi, dan key yang sedang diproses"""
+    store = IdempotencyStore(max_entries=3, ttl=0.2)
+    for i in range(5):
+        store.put(f"k{i}", "fp", 200, b"{}")
+    assert len(store) == 3
+    assert store.get("k0") is None
+    assert store.get("k4").body == b"{}"
+
+    time.sleep(0.25)
+    assert store.get("k4") is None
+
+    assert store.begin("k9") is True
+    assert store.begin("k9") is False
+    store.end("k9")
+    assert store.begin("k9") is True
+
+
+@pytest.mark.asyncio
+async def test_idle_flush_leaves_store_alone():
+    """Test flush tanpa key baru tidak menyentuh SQLite; key kedaluwarsa dihapus terpisah"""
+    class CountingStore(DedupStore):
+        saves = 0
+
+        def save_idempotency(self, rows):
+            self.saves += 1
+            super().save_idempotency(rows)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = CountingStore(os.path.join(tmpdir, "dedup.db"))
+        keys = IdempotencyStore(ttl=0.1)
+        await keys.flush(store)
+        assert store.saves == 0
+
+        keys.put("k1", "fp", 200, b"{}")
+        await keys.flush(store)
+        await keys.flush(store)
+        assert store.saves == 1 and len(store.load_idempotency()) == 1
+
+        assert await keys.expire(store) == 0
+        await asyncio.sleep(0.15)
+        assert await keys.expire(store) == 1
+        assert store.load_idempotency() == []
+        store.close()
+
+
+@pytest.mark.asyncio
+async def test_keys_survive_restart():
+    """Test Idempotency-Key tetap dikenali setelah restart"""
+    batch = make_batch(10)
+    headers = {"Idempotency-Key": "restart-key"}
+
+    async def run(db_path):
+        os.environ["DEDUP_DB_PATH"] = db_path
+        try:
+            app = create_app()
+            async with app.router.lifespan_context(app):
+                async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                    response = await client.post("/publish", json=batch, headers=headers)
+                    await asyncio.sleep(0.2)
+                    return response, (await client.get("/stats")).json()
+        finally:
+            del os.environ["DEDUP_DB_PATH"]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "dedup.db")
+        first, _ = await run(db_path)
+        second, stats = await run(db_path)
+        assert second.headers["idempotent-replayed"] == "true"
+        assert second.json() == first.json()
+        assert stats["received"] == 0
@@ -0,0 +1,44 @@
+import pytest
+import random
+from src.loadgen import LatencyHistogram, build_parser, run, zipf_cum_weights
+
+
+def test_histogram_percentiles():
+    """Test akurasi percentile histogram (~3 digit signifikan)"""
+    hist = LatencyHistogram()
+    for v in range(1, 100001):
+        hist.record(v)
+    assert hist.total == 100000
+    assert hist.value_at(50) == pytest.approx(50000, rel=0.001)
+    assert hist.value_at(99) == pytest.approx(99000, rel=0.001)
+    assert hist.value_at(100) == 100000
+    assert hist.mean() == pytest.approx(50000.5)
+
+    report = hist.percentile_report()
+    assert report.splitlines()[0].split() == ["Value", "Percentile", "TotalCount", "1/(1-Percentile)"]
+    assert "#[Max     =      100.000, Total count    =       100000]" in report
+
+
+def test_zipf_skew():
+    """Test topic pertama paling sering dipilih dengan distribusi Zipf"""
+    rng = random.Random(1)
+    weights = zipf_cum_weights(10, 1.2)
+    picks = [rng.choices(range(10), cum_weights=weights)[0] for _ in range(5000)]
+    assert picks.count(0) > picks.count(1) > picks.count(9)
+
+
+@pytest.mark.asyncio
+async def test_in_process_open_loop_run():
+    """Test loadgen in-process: rate tetap, duplicate ratio, latency publish-to-processed"""
+    args = build_parser().parse_args([
+        "--in-process", "--rate", "1000", "--count", "500", "--batch", "5",
+        "--duplicate-ratio", "0.2", "--topics", "4", "--zipf", "1.1", "--seed", "7",
+    ])
+    report = await run(args)
+    assert report["sent"] == 500
+    assert report["accepted"] == 500
+    assert report["errors"] == 0
+    assert report["drained"] is True
+    assert 300 < report["unique_expected"] < 500
+    assert report["processed_latency_ms"]["count"] == report["unique_expected"]
+    assert report["processed_latency_ms"]["p99"] >= report["processed_latency_ms"]["p50"] > 0
@@ -0,0 +1,62 @@
+import pytest
+import asyncio
+import logging
+import queue
+from datetime import datetime
+from src.log import DroppingQueueHandler, EventLogSummary
+
+
+def test_queue_handler_drops_when_full():
+    """Test bahwa handler tidak pernah block dan menghitung baris yang dibuang"""
+    handler = DroppingQueueHandler(queue.Queue(maxsize=2))
+    logger = logging.getLogger("test.dropping")
+    logger.propagate = False
+    logger.addHandler(handler)
+    try:
+        for i in range(5):
+            logger.warning("line %d", i)
+    finally:
+        logger.removeHandler(handler)
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+
+
+def test_summary_aggregates_per_topic(caplog):
+    """Test bahwa summary menggabungkan event per topic menjadi satu baris"""
+    summary = EventLogSummary(logging.getLogger("test.summary"), interval=10)
+    for _ in range(3):
+        summary.record("a", duplicate=False)
+    summary.record("a", duplicate=True)
+    summary.record("b", duplicate=False)
+
+    with caplog.at_level(logging.INFO, logger="test.summary"):
+        summary.flush()
+        summary.flush()  # tidak ada event baru: tidak ada baris
+
+    assert len(caplog.records) == 1
+    record = caplog.records[0]
+    assert record.getMessage().startswith("4 processed, 1 duplicates in the last 10s")
+    assert record.topics == {"a": {"processed": 3, "duplicates": 1}, "b": {"processed": 1, "duplicates": 0}}
+
+
+@pytest.mark.asyncio
+async def test_no_per_event_lines_at_info(client, caplog):
+    """Test bahwa worker tidak menulis log per event pada level INFO"""
+    events = [
+        {
+            "topic": "log.topic",
+            "event_id": f"evt-{i}",
+            "timestamp": datetime.utcnow().isoformat(),
+            "source": "svc",
+            "payload": {}
+        }
+        for i in range(50)
+    ]
+    with caplog.at_level(logging.INFO):
+        await client.post("/publish", json=events + events[:10])
+        await asyncio.sleep(0.3)
+
+    assert not [r for r in caplog.records if r.name == "worker" and "event_id" in r.getMessage()]
+
+    stats = (await client.get("/stats")).json()
+    assert stats["log_lines_dropped"] == 0
@@ -0,0 +1,70 @@
+import pytest
+import os
+import time
+import tempfile
+from src.dedup_store import DedupStore, open_store
+from src.maintenance import StoreMaintenance
+
+
+def fill_and_free(store, rows=400):
+    """Isi tabel idempotency dengan body besar lalu hapus, sehingga ada free pages"""
+    store.save_idempotency([(f"k{i}", "fp", 200, b"x" * 4000, time.time() + 60) for i in range(rows)])
+    store.expire_idempotency(time.time() + 120)
+
+
+@pytest.mark.asyncio
+async def test_maintenance_vacuums_and_checkpoints():
+    """Test incremental vacuum mengembalikan free pages dan WAL di-truncate"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = DedupStore(os.path.join(tmpdir, "dedup.db"))
+        store.count_processed()  # koneksi read terbuka: WAL tidak dihapus saat writer menutup koneksi
+        fill_and_free(store)
+        before = store.storage_info()
+        assert before["auto_vacuum"] == "incremental"
+        assert before["free_pages"] > 100
+        assert before["wal_bytes"] > 0
+
+        maintenance = StoreMaintenance(store, is_idle=lambda: True, budget=0.001)
+        assert await maintenance.run_once() is True
+        after = maintenance.snapshot()
+        assert after["free_pages"] == 0
+        assert after["wal_bytes"] == 0
+        assert after["db_bytes"] < before["db_bytes"]
+
+        last = after["maintenance"]["last"]
+        assert last["vacuum_pages"] == before["free_pages"]
+        assert last["optimize_ms"] is not None
+        assert last["complete"] is True
+        assert after["maintenance"]["vacuum_pages_per_step"] >= StoreMaintenance.MIN_PAGES
+        store.close()
+
+
+@pytest.mark.asyncio
+async def test_maintenance_waits_for_idle():
+    """Test maintenance ditunda saat ingest sibuk dan berhenti di tengah jika load kembali"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = open_store(os.path.join(tmpdir, "dedup.db"), 2)
+        fill_and_free(store.shards[0])
+
+        busy = StoreMaintenance(store, is_idle=lambda: False)
+        assert await busy.run_once() is False
+        assert busy.deferred == 1 and busy.runs == 0
+
+        # idle hanya untuk pengecekan pertama (checkpoint), lalu load kembali
+        answers = iter([True])
+        partial = StoreMaintenance(store, is_idle=lambda: next(answers, False))
+        assert await partial.run_once() is False
+        assert partial.last["complete"] is False
+        assert partial.last["optimize_ms"] is None
+        assert partial.storage_info()["free_pages"] > 0
+        store.close()
+
+
+@pytest.mark.asyncio
+async def test_stats_exposes_storage(client):
+    """Test /stats menampilkan ukuran DB, free pages, WAL dan status maintenance"""
+    storage = (await client.get("/stats")).json()["storage"]
+    assert storage["db_bytes"] > 0
+    assert {"free_pages", "wal_bytes", "auto_vacuum"} <= set(storage)
+    assert storage["maintenance"]["runs"] == 0
+    assert storage["maintenance"]["last"] is None
@@ -0,0 +1,148 @@
+import pytest
+import asyncio
+import json
+import time
+import msgpack
+from datetime import datetime, timezone
+
+
+MSGPACK = "application/msgpack"
+
+
+def make_event(i, topic="mp.topic"):
+    return {
+        "topic": topic,
+        "event_id": f"evt-{i}",
+        "timestamp": datetime.utcnow().isoformat(),
+        "source": "mp-service",
+        "payload": {"index": i}
+    }
+
+
+@pytest.mark.asyncio
+async def test_publish_msgpack_single_and_batch(client):
+    """Test publish event dalam format msgpack (single dan batch)"""
+    single = msgpack.packb(make_event(0))
+    response = await client.post("/publish", content=single, headers={"Content-Type": MSGPACK})
+    assert response.status_code == 200
+    assert response.json()["accepted"] == 1
+
+    batch = msgpack.packb([make_event(i) for i in range(1, 4)])
+    response = await client.post("/publish", content=batch, headers={"Content-Type": MSGPACK})
+    assert response.status_code == 200
+    assert response.json()["accepted"] == 3
+
+    await asyncio.sleep(0.3)
+
+    stats = (await client.get("/stats")).json()
+    assert stats["received"] == 4
+    assert stats["unique_processed"] == 4
+
+
+@pytest.mark.asyncio
+async def test_publish_body_is_documented(client):
+    """Test skema body /publish tetap muncul di OpenAPI untuk JSON dan msgpack"""
+    body = (await client.get("/openapi.json")).json()["paths"]["/publish"]["post"]["requestBody"]
+    assert body["required"] is True
+    for media_type in ("application/json", MSGPACK):
+        event, batch = body["content"][media_type]["schema"]["anyOf"]
+        assert event["title"] == "Event" and "event_id" in event["required"]
+        assert batch == {"type": "array", "items": event}
+
+
+@pytest.mark.asyncio
+async def test_msgpack_timestamp_extension(client):
+    """Test bahwa timestamp extension msgpack diterima sebagai datetime"""
+    event = make_event(0)
+    event["timestamp"] = msgpack.Timestamp.from_datetime(datetime.now(timezone.utc))
+    response = await client.post("/publish", content=msgpack.packb(event), headers={"Content-Type": MSGPACK})
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_msgpack_validation_rules(client):
+    """Test bahwa aturan validasi Event sama untuk body msgpack"""
+    event = make_event(0)
+    event["topic"] = ""
+    response = await client.post("/publish", content=msgpack.packb(event), headers={"Content-Type": MSGPACK})
+    assert response.status_code == 422
+
+    missing = make_event(1)
+    del missing["source"]
+    response = await client.post("/publish", content=msgpack.packb([make_event(2), missing]), headers={"Content-Type": MSGPACK})
+    assert response.status_code == 422
+
+    response = await client.post("/publish", content=b"\xc1\x00", headers={"Content-Type": MSGPACK})
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_msgpack_rejects_values_without_json_equivalent(client):
+    """Test bin, ext type asing dan key bytes ditolak 422 agar /events JSON tetap bisa dilayani"""
+    bodies = [
+        ({"b": b"\xff\x00"}, ["body", "payload", "b"]),
+        ({"x": [1, msgpack.ExtType(42, b"?")]}, ["body", "payload", "x", 1]),
+        ({b"k": 1}, ["body", "payload", "b'k'"]),
+    ]
+    for i, (payload, loc) in enumerate(bodies):
+        event = {**make_event(i), "payload": payload}
+        response = await client.post("/publish", content=msgpack.packb(event, use_bin_type=True),
+                                     headers={"Content-Type": MSGPACK})
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["loc"] == loc
+
+    ok = {**make_event(9), "payload": {"big": 2 ** 70, "when": msgpack.Timestamp(0, 0)}}
+    packed = msgpack.packb(ok, default=lambda o: msgpack.ExtType(1, str(o).encode()), datetime=False)
+    assert (await client.post("/publish", content=packed, headers={"Content-Type": MSGPACK})).status_code == 200
+    await asyncio.sleep(0.3)
+    assert (await client.get("/events")).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_events_and_stats_in_msgpack(client):
+    """Test bahwa /events dan /stats bisa menjawab dalam msgpack"""
+    await client.post("/publish", json=[make_event(i) for i in range(3)])
+    await asyncio.sleep(0.3)
+
+    response = await client.get("/events", headers={"Accept": MSGPACK})
+    assert response.headers["content-type"] == MSGPACK
+    events = msgpack.unpackb(response.content)
+    assert len(events) == 3
+    assert events[0]["payload"] == {"index": 0}
+
+    response = await client.get("/events?topic=mp.topic", headers={"Accept": MSGPACK})
+    assert len(msgpack.unpackb(response.content)) == 3
+
+    response = await client.get("/stats", headers={"Accept": MSGPACK})
+    stats = msgpack.unpackb(response.content)
+    assert stats["unique_processed"] == 3
+
+    # Tanpa Accept msgpack tetap JSON
+    response = await client.get("/stats")
+    assert response.headers["content-type"].startswith("application/json")
+
+
+@pytest.mark.asyncio
+@pytest.mark.stress
+async def test_publish_throughput_json_vs_msgpack(client):
+    """Bandingkan throughput publish JSON vs msgpack"""
+    total_events = 3000
+    batch_size = 100
+
+    async def run(fmt):
+        start = time.perf_counter()
+        for b in range(total_events // batch_size):
+            batch = [make_event(f"{fmt}-{b * batch_size + i}", topic=f"bench.{fmt}") for i in range(batch_size)]
+            if fmt == "json":
+                body, ctype = json.dumps(batch).encode(), "application/json"
+            else:
+                body, ctype = msgpack.packb(batch), MSGPACK
+            response = await client.post("/publish", content=body, headers={"Content-Type": ctype})
+            assert response.status_code == 200
+        return total_events / (time.perf_counter() - start)
+
+    json_rate = await run("json")
+    msgpack_rate = await run("msgpack")
+
+    print(f"\nJSON publish throughput: {json_rate:.2f} events/sec")
+    print(f"msgpack publish throughput: {msgpack_rate:.2f} events/sec")
@@ -0,0 +1,74 @@
+import pytest
+import json
+import asyncio
+from datetime import datetime
+from src.payload_index import PayloadIndex, parse_filters
+
+
+def test_parse_filters():
+    """Test parsing query param filter payload"""
+    params = [("topic", "orders"), ("payload.user_id", "123"), ("payload.amount__gte", "10"), ("payload.a__b", "x")]
+    assert parse_filters(params) == [
+        ("payload.user_id", "eq", "123"),
+        ("payload.amount", "gte", "10"),
+        ("payload.a__b", "eq", "x"),
+    ]
+
+
+def test_index_equality_and_range():
+    """Test lookup equality dan range lewat side index"""
+    index = PayloadIndex({"orders": ["payload.user_id", "payload.amount"]})
+    records = []
+    for i in range(20):
+        event = {"topic": "orders", "payload": {"user_id": str(i % 4), "amount": i, "flag": True}}
+        records.append(event)
+        index.add(event, event)
+    index.add({"topic": "other", "payload": {"user_id": "1"}}, "ignored")
+
+    assert len(index.query("orders", [("payload.user_id", "eq", "1")])) == 5
+    assert [r["payload"]["amount"] for r in index.query("orders", [("payload.amount", "gte", "17")])] == [17, 18, 19]
+    assert [r["payload"]["amount"] for r in index.query("orders", [("payload.amount", "lt", "2")])] == [0, 1]
+
+    both = index.query("orders", [("payload.user_id", "eq", "1"), ("payload.amount", "gt", "10")])
+    assert [r["payload"]["amount"] for r in both] == [13, 17]
+
+    with pytest.raises(KeyError):
+        index.query("orders", [("payload.flag", "eq", "true")])
+    assert index.describe() == {"orders": {"payload.user_id": 4, "payload.amount": 20}}
+
+
+INDEXES = json.dumps({"purchase": ["payload.user_id", "payload.total"]})
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("client", [{"PAYLOAD_INDEXES": INDEXES}], indirect=True)
+async def test_events_filtered_by_indexed_payload(client):
+    """Test /events dengan filter equality dan range pada field payload yang diindex"""
+    events = [
+        {
+            "topic": "purchase",
+            "event_id": f"p-{i}",
+            "timestamp": datetime.utcnow().isoformat(),
+            "source": "shop",
+            "payload": {"user_id": 123 if i % 2 else 456, "total": i * 10}
+        }
+        for i in range(10)
+    ]
+    await client.post("/publish", json=events)
+    await asyncio.sleep(0.3)
+
+    response = await client.get("/events", params={"topic": "purchase", "payload.user_id": "123"})
+    assert response.status_code == 200
+    assert {e["event_id"] for e in response.json()} == {"p-1", "p-3", "p-5", "p-7", "p-9"}
+
+    response = await client.get("/events", params={"topic": "purchase", "payload.user_id": "123", "payload.total__gte": "50"})
+    assert {e["event_id"] for e in response.json()} == {"p-5", "p-7", "p-9"}
+
+    # Field yang tidak diindex dan filter tanpa topic ditolak
+    response = await client.get("/events", params={"topic": "purchase", "payload.other": "1"})
+    assert response.status_code == 400
+    response = await client.get("/events", params={"payload.user_id": "123"})
+    assert response.status_code == 400
+
+    indexes = (await client.get("/indexes")).json()
+    assert indexes["purchase"]["payload.user_id"] == 2
@@ -0,0 +1,231 @@
+import pytest
+import os
+import json
+import re
+import time
+import asyncio
+import tempfile
+from datetime import datetime
+from httpx import AsyncClient, ASGITransport
+from pydantic import BaseModel
+from src.main import create_app
+from src.payload_schema import SchemaRegistry
+
+
+ORDER_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "order_id": {"type": "string", "minLength": 1},
+        "amount": {"type": "number", "minimum": 0},
+        "status": {"enum": ["new", "paid", "shipped"]},
+        "items": {"type": "array", "items": {"type": "object", "properties": {"sku": {"type": "string"}},
+                                             "required": ["sku"]}},
+    },
+    "required": ["order_id", "amount", "status"],
+}
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+def make_event(event_id, payload, topic="orders"):
+    return {
+        "topic": topic,
+        "event_id": event_id,
+        "timestamp": datetime.utcnow().isoformat(),
+        "source": "shop",
+        "payload": payload,
+    }
+
+
+def test_registry_compiles_once_per_version():
+    """Test validator di-cache per (topic, versi) dan schema di luar subset ditolak"""
+    registry = SchemaRegistry()
+    assert registry.register("orders", ORDER_SCHEMA) == 1
+    validator = registry._validators[("orders", 1)]
+    assert registry.register("orders", ORDER_SCHEMA) is None
+    assert registry._validators[("orders", 1)] is validator
+
+    assert registry.register("orders", {**ORDER_SCHEMA, "additionalProperties": False}) == 2
+    assert list(registry._validators) == [("orders", 2)]
+
+    with pytest.raises(ValueError, match="oneOf"):
+        registry.register("bad", {"type": "object", "properties": {"x": {"oneOf": []}}})
+    with pytest.raises(ValueError):
+        registry.register("bad", {"type": "string"})
+
+    class Click(BaseModel):
+        x: int
+        y: int
+
+    registry.register("clicks", Click)
+    errors = registry.validate([make_event("a", {"x": 1, "y": 2}, "clicks"), make_event("b", {"x": 1}, "clicks")])
+    assert list(errors) == [1]
+    assert errors[1][0]["loc"] == ["payload", "y"]
+
+
+@pytest.mark.parametrize("schema, message", [
+    ({"type": "object", "required": "abc"}, "required must be a list of strings"),
+    ({"type": "object", "properties": [1]}, "properties must be an object"),
+    ({"type": "object", "properties": {"n": {"type": "integer", "maximum": True}}}, "payload.n: maximum must be a number"),
+    ({"type": "object", "properties": {"s": {"type": "string", "maxLength": -1}}}, "maxLength must be a non-negative"),
+    ({"type": "object", "properties": {"s": {"type": "string", "pattern": "("}}}, re.escape("payload.s: pattern '(' is not a valid")),
+    ({"type": "object", "properties": {"e": {"enum": []}}}, "enum must be a non-empty list"),
+])
+def test_malformed_keywords_rejected(schema, message):
+    """Test nilai keyword dengan tipe salah ditolak sebagai ValueError, bukan diterima diam-diam atau crash"""
+    with pytest.raises(ValueError, match=message):
+        SchemaRegistry().register("t", schema)
+
+
+@pytest.mark.asyncio
+async def test_bad_configured_schema_fails_startup():
+    """Test PAYLOAD_SCHEMAS yang salah memberi error startup yang menyebut topic-nya"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.environ.update(DEDUP_DB_PATH=os.path.join(tmpdir, "dedup.db"),
+                          PAYLOAD_SCHEMAS=json.dumps({"orders": {"type": "object", "required": "abc"}}))
+        try:
+            app = create_app()
+            with pytest.raises(ValueError, match=re.escape("PAYLOAD_SCHEMAS['orders']: payload: required")):
+                async with app.router.lifespan_context(app):
+                    pass
+        finally:
+            del os.environ["DEDUP_DB_PATH"], os.environ["PAYLOAD_SCHEMAS"]
+
+
+@pytest.mark.parametrize("client", [{"PAYLOAD_SCHEMAS": json.dumps({"orders": ORDER_SCHEMA})}], indirect=True)
+@pytest.mark.asyncio
+async def test_invalid_payloads_rejected_per_index(client):
+    """Test event dengan payload tidak sesuai schema ditolak per index, sisanya tetap diterima"""
+    batch = [
+        make_event("o1", {"order_id": "o1", "amount": 10, "status": "new"}),
+        make_event("o2", {"order_id": "o2", "amount": -5, "status": "new"}),
+        make_event("u1", {"anything": True}, topic="users"),
+        make_event("o3", {"order_id": "o3", "amount": "10", "status": "lost", "items": [{}]}),
+    ]
+    response = await client.post("/publish", json=batch)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["accepted"] == 2
+    assert [r["index"] for r in body["rejected"]] == [1, 3]
+    assert body["rejected"][0]["event_id"] == "o2"
+    assert body["rejected"][0]["errors"][0]["loc"] == ["payload", "amount"]
+    assert {tuple(e["loc"]) for e in body["rejected"][1]["errors"]} == {
+        ("payload", "amount"), ("payload", "status"), ("payload", "items", 0, "sku"),
+    }
+
+    all_bad = await client.post("/publish", json=[make_event("o4", {"order_id": "o4"})])
+    assert all_bad.status_code == 422
+    assert all_bad.json()["detail"]["rejected"][0]["index"] == 0
+
+    await asyncio.sleep(0.3)
+    stats = (await client.get("/stats")).json()
+    assert stats["received"] == 2
+    assert stats["unique_processed"] == 2
+
+    described = (await client.get("/schemas/orders")).json()
+    assert described["version"] == 1
+    assert described["validated"] == 4
+    assert described["rejected"] == 3
+    assert (await client.get("/schemas/users")).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_schemas_registered_via_admin_survive_restart():
+    """Test schema yang didaftarkan lewat endpoint admin tersimpan dan berlaku setelah restart"""
+    async def run(db_path, check):
+        os.environ.update(DEDUP_DB_PATH=db_path, ADMIN_TOKEN="secret")
+        try:
+            app = create_app()
+            async with app.router.lifespan_context(app):
+                async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                    await check(client)
+        finally:
+            del os.environ["DEDUP_DB_PATH"], os.environ["ADMIN_TOKEN"]
+
+    async def register(client):
+        for schema in ({"type": "object", "if": {}},
+                       {"type": "object", "properties": {"s": {"type": "string", "pattern": "("}}},
+                       {"type": "object", "properties": {"n": {"type": "number", "minimum": "abc"}}}):
+            bad = await client.put("/admin/schemas/orders", json=schema, headers=ADMIN)
+            assert bad.status_code == 400
+        put = await client.put("/admin/schemas/orders", json=ORDER_SCHEMA, headers=ADMIN)
+        assert put.json() == {"topic": "orders", "version": 1, "changed": True}
+        response = await client.post("/publish", json=[make_event("o1", {"order_id": "o1"})])
+        assert response.status_code == 422
+
+    async def after_restart(client):
+        assert (await client.get("/schemas")).json()["orders"]["version"] == 1
+        response = await client.post("/publish", json=[make_event("o1", {"order_id": "o1"})])
+        assert response.status_code == 422
+        assert (await client.delete("/admin/schemas/orders", headers=ADMIN)).status_code == 200
+        assert (await client.post("/publish", json=[make_event("o1", {"order_id": "o1"})])).status_code == 200
+        assert (await client.delete("/admin/schemas/orders", headers=ADMIN)).status_code == 404
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "dedup.db")
+        await run(db_path, register)
+        await run(db_path, after_restart)
+
+
+@pytest.mark.stress
+@pytest.mark.asyncio
+async def test_validation_overhead_benchmark():
+    """Ukur overhead validasi payload: registry saja dan end-to-end /publish"""
+    events = [
+        make_event(f"o{i}", {"order_id": f"o{i}", "amount": i * 1.5, "status": "paid",
+                             "items": [{"sku": "a"}, {"sku": "b"}]})
+        for i in range(20000)
+    ]
+    registry = SchemaRegistry()
+    registry.register("orders", ORDER_SCHEMA)
+    started = time.perf_counter()
+    for i in range(0, len(events), 500):
+        assert not registry.validate(events[i:i + 500])
+    per_event = (time.perf_counter() - started) / len(events) * 1e6
+
+    async def publish_rate(env):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.environ.update(env, DEDUP_DB_PATH=os.path.join(tmpdir, "dedup.db"))
+            try:
+                app = create_app()
+                async with app.router.lifespan_context(app):
+                    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                        started = time.perf_counter()
+                        for i in range(0, len(events), 500):
+                            assert (await client.post("/publish", json=events[i:i + 500])).status_code == 200
+                        return len(events) / (time.perf_counter() - started)
+            finally:
+                for key in [*env, "DEDUP_DB_PATH"]:
+                    del os.environ[key]
+
+    without = await publish_rate({})
+    with_schema = await publish_rate({"PAYLOAD_SCHEMAS": json.dumps({"orders": ORDER_SCHEMA})})
+    print(f"\nvalidate(): {per_event:.2f} us/event (batch 500)")
+    print(f"/publish tanpa schema: {without:.0f} events/sec, dengan schema: {with_schema:.0f} events/sec "
+          f"({(1 - with_schema / without) * 100:.1f}% overhead)")
+
+
+@pytest.mark.parametrize("client", [{"PAYLOAD_SCHEMAS": json.dumps({"orders": ORDER_SCHEMA})}], indirect=True)
+@pytest.mark.asyncio
+async def test_forwarded_header_does_not_bypass_validation(client):
+    """Test header X-Cluster-Forwarded dari client biasa tidak melewati validasi schema"""
+    event = make_event("o1", {"order_id": "o1"})
+    for sender in ("anything", "http://test"):
+        response = await client.post("/publish", json=[event], headers={"X-Cluster-Forwarded": sender})
+        assert response.status_code == 422
+
+
+@pytest.mark.parametrize("client", [{
+    "PAYLOAD_SCHEMAS": json.dumps({"orders": ORDER_SCHEMA}),
+    "CLUSTER_NODES": "http://test,http://127.0.0.1:9", "CLUSTER_SELF": "http://test", "CLUSTER_SECRET": "peer-secret",
+}], indirect=True)
+@pytest.mark.asyncio
+async def test_forwarded_batches_need_member_and_secret(client):
+    """Test batch terusan hanya dipercaya dari URL member yang membawa CLUSTER_SECRET"""
+    event = make_event("o1", {"order_id": "o1"})
+    peer = {"X-Cluster-Forwarded": "http://127.0.0.1:9"}
+    assert (await client.post("/publish", json=[event], headers=peer)).status_code == 422
+    wrong = {**peer, "X-Cluster-Token": "guess"}
+    assert (await client.post("/publish", json=[event], headers=wrong)).status_code == 422
+    # batch dari peer sudah divalidasi di node penerima, jadi tidak dicek ulang
+    trusted = {**peer, "X-Cluster-Token": "peer-secret"}
+    assert (await client.post("/publish", json=[event], headers=trusted)).json() == {"accepted": 1}
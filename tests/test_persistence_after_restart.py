@@ -143,4 +143,27 @@ async def test_database_integrity():
         
     finally:
         if os.path.exists(db_path):
-            os.remove(db_path)
\ No newline at end of file
+            os.remove(db_path)
+
+@pytest.mark.asyncio
+async def test_shutdown_stores_queued_events():
+    """Test event yang sudah dijawab 200 tetap tersimpan walau shutdown terjadi saat masih di queue"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "dedup.db")
+        os.environ['DEDUP_DB_PATH'] = db_path
+        try:
+            app = create_app()
+            async with app.router.lifespan_context(app):
+                async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                    for start in range(0, 20000, 2000):
+                        batch = [
+                            {"topic": f"drain.{i % 7}", "event_id": f"evt-{i}",
+                             "timestamp": datetime.utcnow().isoformat(), "source": "drain-test", "payload": {}}
+                            for i in range(start, start + 2000)
+                        ]
+                        assert (await client.post("/publish", json=batch)).status_code == 200
+        finally:
+            del os.environ['DEDUP_DB_PATH']
+        store = DedupStore(db_path)
+        assert store.count_processed() == 20000
+        store.close()
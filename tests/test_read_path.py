@@ -0,0 +1,87 @@
+import pytest
+import os
+import time
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from src.dedup_store import DedupStore, open_store
+
+
+def rows(start, n, topics=10):
+    return [(f"topic{i % topics}", f"evt-{i}", f"2025-01-01T00:00:{i % 60:02d}") for i in range(start, start + n)]
+
+
+def test_reads_do_not_wait_for_writer_lock():
+    """Test read tetap jalan walaupun writer lock sedang dipegang"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = DedupStore(os.path.join(tmpdir, "dedup.db"))
+        store.mark_processed_many(rows(0, 100))
+        with store._lock, ThreadPoolExecutor(1) as pool:
+            future = pool.submit(lambda: (store.count_processed(), len(store.list_topics()),
+                                          store.is_processed("topic3", "evt-3")))
+            assert future.result(timeout=2) == (100, 10, True)
+        store.close()
+
+
+def test_cached_read_connection_sees_new_commits():
+    """Test koneksi read per-thread selalu melihat commit terbaru"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = open_store(os.path.join(tmpdir, "dedup.db"), 2)
+        assert store.count_processed() == 0
+        store.mark_processed_many(rows(0, 50))
+        assert store.count_processed() == 50
+        assert len(store.list_events_for_topic("topic1")) == 5
+        store.mark_processed_many(rows(50, 50))
+        assert store.count_processed() == 100
+        store.close()
+
+        # store yang sudah di-close membuka koneksi read baru jika dipakai lagi
+        reopened = DedupStore(os.path.join(tmpdir, "dedup.shard0.db"))
+        reopened.close()
+        assert reopened.count_processed() > 0
+
+
+def _mixed_workload(store, seconds, readers):
+    stop = threading.Event()
+    read_latencies = []
+    written = [0]
+
+    def write():
+        n = 0
+        while not stop.is_set():
+            store.mark_processed_many(rows(n, 256, topics=50))
+            n += 256
+        written[0] = n
+
+    def read():
+        while not stop.is_set():
+            started = time.perf_counter()
+            store.count_processed()
+            store.list_topics()
+            store.is_processed("topic7", "evt-7")
+            read_latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=write)] + [threading.Thread(target=read) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    read_latencies.sort()
+    p99 = read_latencies[int(len(read_latencies) * 0.99)] * 1000 if read_latencies else 0.0
+    return written[0] / seconds, p99
+
+
+@pytest.mark.stress
+def test_mixed_read_write_benchmark():
+    """Ukur throughput write dengan dan tanpa reader paralel, serta latency read"""
+    results = {}
+    for readers in (0, 4):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = DedupStore(os.path.join(tmpdir, "dedup.db"))
+            results[readers] = _mixed_workload(store, 2.0, readers)
+            assert store.count_processed() > 0
+            store.close()
+    print(f"\nwrites alone: {results[0][0]:.0f} rows/sec; "
+          f"with 4 readers: {results[4][0]:.0f} rows/sec, read p99 {results[4][1]:.2f} ms")
@@ -0,0 +1,126 @@
+import pytest
+import os
+import json
+import asyncio
+import sqlite3
+import tempfile
+from datetime import datetime
+from httpx import AsyncClient, ASGITransport
+from src.main import create_app
+from src.sequence_dedup import SequenceTracker, SequenceWindow
+
+
+SEQUENCED = {"SEQUENCED_TOPICS": json.dumps({"orders": {"field": "payload.seq", "window": 64}})}
+
+
+def make_event(seq, source="producer-a", topic="orders", event_id=None):
+    return {
+        "topic": topic,
+        "event_id": event_id or f"{source}-{seq}",
+        "timestamp": datetime.utcnow().isoformat(),
+        "source": source,
+        "payload": {"seq": seq}
+    }
+
+
+def test_window_in_order_and_out_of_order():
+    """Test high-water mark + bitmap: urutan acak dalam window tetap terdeteksi"""
+    w = SequenceWindow()
+    assert [w.check(s, 8) for s in (5, 6, 6, 4, 9, 7, 7, 4)] == [True, True, False, True, True, True, False, False]
+    assert w.hwm == 9
+    assert w.count == 5
+    # di luar window dianggap sudah pernah dilihat
+    assert w.check(1, 8) is False
+    # lompatan besar mengosongkan window
+    assert w.check(100, 8) is True
+    assert w.check(99, 8) is True
+    assert w.check(9, 8) is False
+
+
+def test_plan_does_not_touch_live_windows():
+    """Test plan() tidak mengubah state sampai apply() dipanggil"""
+    tracker = SequenceTracker(["orders"])
+    events = [make_event(1), make_event(2), make_event(1), make_event(3, topic="other"), make_event("x")]
+    decisions, staged = tracker.plan(events)
+    assert decisions == {0: True, 1: True, 2: False}
+    assert tracker.sources() == 0
+
+    tracker.apply(staged)
+    assert tracker.plan([make_event(2)])[0] == {0: False}
+    (row,) = SequenceTracker.rows(staged)
+    assert row[:3] == ("orders", "producer-a", 2) and row[4] == 2
+
+
+def test_unusable_sequences_fall_back_to_key_store():
+    """Test sequence non-ASCII, negatif atau di luar INTEGER SQLite tidak masuk window"""
+    tracker = SequenceTracker(["orders"])
+    for seq in ("\u00b2", "\u0661", "12a", "", -1, True, 2**63, str(2**63), 1.5):
+        assert tracker.sequence_of(make_event(seq)) is None, seq
+    assert tracker.sequence_of(make_event("42")) == 42
+    assert tracker.sequence_of(make_event(2**63 - 1)) == 2**63 - 1
+
+
+@pytest.mark.parametrize("client", [SEQUENCED], indirect=True)
+@pytest.mark.asyncio
+async def test_out_of_range_sequences_do_not_poison_batch(client):
+    """Test satu sequence yang tidak valid tidak membuat seluruh batch masuk dead letter"""
+    events = [make_event(1), make_event("\u00b2", event_id="sup"), make_event(2**64, event_id="big"),
+              make_event(1, topic="payments", source="svc")]
+    assert (await client.post("/publish", json=events)).status_code == 200
+    await asyncio.sleep(0.3)
+    stats = (await client.get("/stats")).json()
+    assert stats["unique_processed"] == 4
+    assert stats["worker"]["health"]["dead_lettered"] == 0
+    assert stats["worker"]["health"]["restarts"] == 0
+
+
+@pytest.mark.parametrize("client", [SEQUENCED], indirect=True)
+@pytest.mark.asyncio
+async def test_sequenced_topic_stores_one_row_per_source(client):
+    """Test topic sequenced tidak menulis baris dedup per event"""
+    events = [make_event(s, source=src) for src in ("producer-a", "producer-b") for s in range(200)]
+    events += [make_event(s) for s in (10, 150, 199)]          # duplicate
+    events += [make_event(1, topic="payments", source="svc")]  # topic biasa tetap key store
+    await client.post("/publish", json=events)
+    await asyncio.sleep(0.5)
+
+    stats = (await client.get("/stats")).json()
+    assert stats["received"] == 404
+    assert stats["unique_processed"] == 401
+    assert stats["duplicate_dropped"] == 3
+    assert set(stats["topics"]) == {"orders", "payments"}
+
+    listed = (await client.get("/events", params={"topic": "orders"})).json()
+    assert len(listed) == 400
+
+    conn = sqlite3.connect(os.environ["DEDUP_DB_PATH"])
+    assert conn.execute("SELECT COUNT(1) FROM dedup").fetchone()[0] == 1
+    assert conn.execute("SELECT COUNT(1) FROM seq_marks").fetchone()[0] == 2
+    conn.close()
+
+
+@pytest.mark.asyncio
+async def test_sequence_marks_survive_restart():
+    """Test high-water mark tersimpan dan dipakai lagi setelah restart"""
+    async def run(db_path, events):
+        os.environ.update(SEQUENCED, DEDUP_DB_PATH=db_path, DEDUP_SHARDS="2")
+        try:
+            app = create_app()
+            async with app.router.lifespan_context(app):
+                async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                    await client.post("/publish", json=events)
+                    await asyncio.sleep(0.3)
+                    return (await client.get("/stats")).json()
+        finally:
+            for key in ("SEQUENCED_TOPICS", "DEDUP_DB_PATH", "DEDUP_SHARDS"):
+                del os.environ[key]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "dedup.db")
+        first = await run(db_path, [make_event(s) for s in range(1, 51)])
+        assert first["unique_processed"] == 50
+
+        second = await run(db_path, [make_event(s) for s in (3, 50, 49, 51, 52)])
+        # 3, 50 dan 49 sudah diproses sebelum restart
+        assert second["received"] == 5
+        assert second["unique_processed"] == 52
@@ -0,0 +1,113 @@
+import pytest
+import os
+import time
+import asyncio
+import tempfile
+from datetime import datetime
+from httpx import AsyncClient, ASGITransport
+from src.main import create_app
+from src.dedup_store import DedupStore, ShardedDedupStore, open_store
+
+
+def test_sharded_store_dedup_and_merge():
+    """Test dedup, count dan list_topics digabung dari semua shard"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = ShardedDedupStore(os.path.join(tmpdir, "dedup.db"), shards=4)
+        try:
+            items = [(f"topic{i % 3}", f"evt-{i}", f"2025-01-01T00:00:{i:02d}") for i in range(30)]
+            assert store.mark_processed_many(items) == [True] * 30
+            # Duplicate di batch berikutnya dan di dalam batch yang sama
+            again = [items[0], ("topic9", "new", "2025-01-01T00:01:00"), ("topic9", "new", "2025-01-01T00:01:01")]
+            assert store.mark_processed_many(again) == [False, True, False]
+            assert not store.mark_processed("topic0", "evt-0", "2025-01-01T00:02:00")
+
+            assert store.count_processed() == 31
+            assert set(store.list_topics()) == {"topic0", "topic1", "topic2", "topic9"}
+            assert store.is_processed("topic1", "evt-1")
+
+            rows = store.list_events_for_topic("topic0")
+            assert len(rows) == 10
+            assert [r[1] for r in rows] == sorted(r[1] for r in rows)
+
+            # Key benar-benar tersebar ke lebih dari satu file
+            assert sum(1 for s in store.shards if s.count_processed() > 0) > 1
+        finally:
+            store.close()
+
+
+def test_shard_layout_is_persistent():
+    """Test bahwa jumlah shard tidak boleh berubah setelah data ditulis"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "dedup.db")
+        store = ShardedDedupStore(path, shards=3)
+        store.mark_processed("t", "e1", "2025-01-01T00:00:00")
+        store.close()
+
+        reopened = ShardedDedupStore(path, shards=3)
+        assert not reopened.mark_processed("t", "e1", "2025-01-01T00:00:01")
+        reopened.close()
+
+        with pytest.raises(ValueError):
+            ShardedDedupStore(path, shards=5)
+
+        assert isinstance(open_store(path, 1), DedupStore)
+
+
+@pytest.mark.asyncio
+async def test_app_with_sharded_store():
+    """Test end-to-end dengan DEDUP_SHARDS > 1"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.environ["DEDUP_DB_PATH"] = os.path.join(tmpdir, "dedup.db")
+        os.environ["DEDUP_SHARDS"] = "4"
+        try:
+            app = create_app()
+            async with app.router.lifespan_context(app):
+                transport = ASGITransport(app=app)
+                async with AsyncClient(transport=transport, base_url="http://test") as client:
+                    events = [
+                        {
+                            "topic": f"shard.topic{i % 4}",
+                            "event_id": f"evt-{i}",
+                            "timestamp": datetime.utcnow().isoformat(),
+                            "source": "shard-test",
+                            "payload": {}
+                        }
+                        for i in range(200)
+                    ]
+                    await client.post("/publish", json=events)
+                    await client.post("/publish", json=events[:50])
+                    await asyncio.sleep(0.5)
+
+                    stats = (await client.get("/stats")).json()
+                    assert stats["received"] == 250
+                    assert stats["unique_processed"] == 200
+                    assert stats["duplicate_dropped"] == 50
+                    assert len(stats["topics"]) == 4
+
+                    rows = (await client.get("/events?topic=shard.topic0")).json()
+                    assert len(rows) == 50
+        finally:
+            del os.environ["DEDUP_DB_PATH"]
+            del os.environ["DEDUP_SHARDS"]
+
+
+@pytest.mark.stress
+@pytest.mark.parametrize("shards", [1, 4])
+def test_sharded_write_throughput(shards):
+    """Ukur throughput tulis batch untuk jumlah shard berbeda"""
+    total_events = 20000
+    batch_size = 500
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = open_store(os.path.join(tmpdir, "dedup.db"), shards)
+        try:
+            start = time.perf_counter()
+            for b in range(total_events // batch_size):
+                store.mark_processed_many([
+                    (f"topic{i % 10}", f"evt-{b}-{i}", "2025-01-01T00:00:00")
+                    for i in range(batch_size)
+                ])
+            elapsed = time.perf_counter() - start
+        finally:
+            store.close()
+        assert store.count_processed() == total_events
+    print(f"\nshards={shards}: {total_events / elapsed:.2f} writes/sec")
@@ -0,0 +1,104 @@
+import pytest
+import os
+import asyncio
+import tempfile
+from datetime import datetime, timedelta
+from src.dedup_store import DedupStore
+from src.sketches import HyperLogLog, SketchRegistry
+from src.stats import to_epoch
+
+
+def make_event(i, topic="hll.topic", source="svc-a", ts=None):
+    return {
+        "topic": topic,
+        "event_id": f"evt-{i}",
+        "timestamp": ts or datetime.utcnow(),
+        "source": source,
+        "payload": {}
+    }
+
+
+def test_hll_accuracy_and_merge():
+    """Test estimasi HyperLogLog dalam batas error dan merge = union"""
+    a, b = HyperLogLog(), HyperLogLog()
+    for i in range(60000):
+        a.add(f"k{i}")
+    for i in range(40000, 100000):
+        b.add(f"k{i}")
+        b.add(f"k{i}")  # duplicate tidak menambah estimasi
+    assert a.estimate() == pytest.approx(60000, rel=0.05)
+    assert b.estimate() == pytest.approx(60000, rel=0.05)
+
+    a.merge(b)
+    report = a.report()
+    assert report["lower"] <= 100000 <= report["upper"]
+    assert report["relative_error"] == pytest.approx(0.01625)
+    assert len(a.registers) == 4096
+
+    small = HyperLogLog()
+    for i in range(50):
+        small.add(f"s{i}")
+    assert abs(small.estimate() - 50) <= 2
+
+
+def test_registry_buckets_and_range_query():
+    """Test sketch per jam dan query gabungan beberapa bucket"""
+    registry = SketchRegistry(bucket_seconds=3600, retention=2)
+    base = datetime(2025, 1, 1, 10, 0)
+    for hour in range(3):
+        for i in range(100):
+            registry.record(make_event(hour * 50 + i, ts=base + timedelta(hours=hour, minutes=i % 60)))
+
+    # retention 2: bucket jam 10 sudah dibuang dari per-bucket, all-time tetap utuh
+    registry.prune()
+    result = registry.query("topic", "hll.topic")
+    assert [b["start"] for b in result["buckets"]] == ["2025-01-01T11:00:00", "2025-01-01T12:00:00"]
+    assert abs(result["all_time"]["estimate"] - 200) <= 6
+    assert abs(result["range"]["estimate"] - 150) <= 5
+
+    only_last = registry.query("topic", "hll.topic", since=to_epoch(base + timedelta(hours=2)))
+    assert len(only_last["buckets"]) == 1
+    assert abs(only_last["range"]["estimate"] - 100) <= 4
+
+    assert registry.query("source", "unknown") is None
+    with pytest.raises(ValueError):
+        registry.query("region", "x")
+
+
+@pytest.mark.asyncio
+async def test_sketches_persist_and_reload():
+    """Test sketch disimpan ke store dan dimuat ulang"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = DedupStore(os.path.join(tmpdir, "dedup.db"))
+        registry = SketchRegistry()
+        for i in range(1000):
+            registry.record(make_event(i, source=f"svc-{i % 2}"))
+        await registry.flush(store)
+        assert registry.take_dirty() == []
+
+        reloaded = SketchRegistry(rows=store.load_sketches())
+        assert reloaded.summary() == registry.summary()
+        assert abs(reloaded.summary()["sources"]["svc-0"]["estimate"] - 500) <= 15
+
+
+@pytest.mark.asyncio
+async def test_distinct_endpoints(client):
+    """Test /stats/distinct menampilkan estimasi dengan error bound"""
+    events = [make_event(i, topic=f"t{i % 2}", source=f"svc-{i % 3}") for i in range(600)]
+    for e in events:
+        e["timestamp"] = e["timestamp"].isoformat()
+    await client.post("/publish", json=events + events[:100])
+    await asyncio.sleep(0.5)
+
+    summary = (await client.get("/stats/distinct")).json()
+    assert summary["precision"] == 12
+    t0 = summary["topics"]["t0"]
+    assert t0["lower"] <= 300 <= t0["upper"]
+    assert set(summary["sources"]) == {"svc-0", "svc-1", "svc-2"}
+
+    detail = (await client.get("/stats/distinct/source/svc-1")).json()
+    assert detail["all_time"]["lower"] <= 200 <= detail["all_time"]["upper"]
+    assert len(detail["buckets"]) == 1
+
+    assert (await client.get("/stats/distinct/topic/missing")).status_code == 404
+    assert (await client.get("/stats/distinct/region/x")).status_code == 400
@@ -0,0 +1,183 @@
+import pytest
+import os
+import time
+import asyncio
+import tempfile
+from datetime import datetime
+from httpx import AsyncClient, ASGITransport
+from src.main import create_app
+from src.dedup_store import DedupStore, open_store
+from src.sequence_dedup import SequenceTracker
+from src.snapshot import export_frames, import_chunks
+
+
+def rows(n, prefix="evt"):
+    return [(f"topic{i % 5}", f"{prefix}-{i}", f"2025-01-01T00:00:{i % 60:02d}") for i in range(n)]
+
+
+def test_export_import_between_layouts():
+    """Test export dari store sharded dan import ke store single-file"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        source = open_store(os.path.join(tmpdir, "src.db"), 3)
+        target = DedupStore(os.path.join(tmpdir, "dst.db"))
+        try:
+            source.mark_processed_many(rows(2500))
+            target.mark_processed_many(rows(10))  # sudah ada di target
+
+            result = import_chunks(target, export_frames(source, chunk_size=1000))
+            assert result == {"dedup_rows": 2500, "inserted": 2490, "events": 0, "events_new": 0,
+                              "seq_marks": 0}
+            assert target.count_processed() == 2500
+            assert set(target.list_topics()) == set(source.list_topics())
+
+            again = import_chunks(target, export_frames(source))
+            assert again["inserted"] == 0
+        finally:
+            source.close()
+
+
+def test_export_is_consistent_while_writing():
+    """Test snapshot konsisten walaupun ada write saat export berjalan"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = DedupStore(os.path.join(tmpdir, "dedup.db"))
+        store.mark_processed_many(rows(3000))
+
+        chunks = store.iter_rows(chunk_size=1000)
+        first = next(chunks)
+        store.mark_processed_many(rows(500, prefix="late"))  # ingest tetap jalan
+        total = len(first) + sum(len(c) for c in chunks)
+        assert total == 3000
+        assert store.count_processed() == 3500
+
+
+def test_online_backup():
+    """Test backup dengan SQLite online backup API"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = DedupStore(os.path.join(tmpdir, "dedup.db"))
+        store.mark_processed_many(rows(1000))
+        store.backup(os.path.join(tmpdir, "backup.db"))
+        assert DedupStore(os.path.join(tmpdir, "backup.db")).count_processed() == 1000
+
+
+def test_truncated_snapshot_rejected():
+    """Test snapshot tanpa frame akhir ditolak"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = DedupStore(os.path.join(tmpdir, "dedup.db"))
+        frames = list(export_frames(store))
+        with pytest.raises(ValueError):
+            import_chunks(store, frames[:-1])
+
+
+async def _run_app(db_path, action):
+    os.environ["DEDUP_DB_PATH"] = db_path
+    os.environ["ADMIN_TOKEN"] = "adm"
+    try:
+        app = create_app()
+        async with app.router.lifespan_context(app):
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                return await action(client)
+    finally:
+        del os.environ["DEDUP_DB_PATH"]
+        del os.environ["ADMIN_TOKEN"]
+
+
+@pytest.mark.asyncio
+async def test_admin_export_import_roundtrip():
+    """Test seeding node baru lewat /admin/export dan /admin/import"""
+    headers = {"X-Admin-Token": "adm"}
+    events = [
+        {
+            "topic": "seed.topic",
+            "event_id": f"evt-{i}",
+            "timestamp": datetime.utcnow().isoformat(),
+            "source": "svc",
+            "payload": {"i": i}
+        }
+        for i in range(50)
+    ]
+
+    async def export(client):
+        await client.post("/publish", json=events)
+        await asyncio.sleep(0.3)
+        assert (await client.get("/admin/export")).status_code == 403
+        response = await client.get("/admin/export", headers=headers)
+        assert response.status_code == 200
+        # snapshot node sendiri di-import balik: semua key sudah ada
+        own = await client.post("/admin/import", content=response.content, headers=headers)
+        assert own.json()["events_new"] == 0
+        assert len((await client.get("/events")).json()) == 50
+        assert (await client.get("/stats")).json()["unique_processed"] == 50
+        return response.content
+
+    async def seed(client):
+        response = await client.post("/admin/import", content=snapshot, headers=headers)
+        assert response.status_code == 200
+        assert response.json() == {"dedup_rows": 50, "inserted": 50, "events": 50, "events_new": 50,
+                                   "seq_marks": 0}
+
+        listed = (await client.get("/events")).json()
+        assert len(listed) == 50
+        assert listed[7]["payload"] == {"i": 7}
+
+        # import ulang snapshot yang sama tidak menggandakan event di memori
+        again = await client.post("/admin/import", content=snapshot, headers=headers)
+        assert again.json() == {"dedup_rows": 50, "inserted": 0, "events": 50, "events_new": 0, "seq_marks": 0}
+        assert len((await client.get("/events")).json()) == 50
+
+        # Event yang sudah ada di snapshot dianggap duplicate di node baru
+        await client.post("/publish", json=events[:10])
+        await asyncio.sleep(0.3)
+        stats = (await client.get("/stats")).json()
+        assert stats["unique_processed"] == 50
+        assert stats["received"] == 10
+        topic = (await client.get("/stats/topics/seed.topic")).json()
+        assert topic["duplicate_dropped"] == 10
+
+        bad = await client.post("/admin/import", content=b"\xc1garbage", headers=headers)
+        assert bad.status_code == 400
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        snapshot = await _run_app(os.path.join(tmpdir, "a.db"), export)
+        await _run_app(os.path.join(tmpdir, "b.db"), seed)
+
+
+def test_sequence_marks_are_merged_on_import():
+    """Test high-water mark ikut di snapshot dan digabung dengan window yang sudah ada di target"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        source = DedupStore(os.path.join(tmpdir, "src.db"))
+        target = DedupStore(os.path.join(tmpdir, "dst.db"))
+        tracker = SequenceTracker({"orders": {"window": 8}})
+        _, staged = tracker.plan([{"topic": "orders", "source": "a", "payload": {"seq": s}} for s in (10, 12)])
+        source.mark_processed_many([], SequenceTracker.rows(staged))
+        other = SequenceTracker({"orders": {"window": 8}})
+        _, staged = other.plan([{"topic": "orders", "source": "a", "payload": {"seq": s}} for s in (11, 12)])
+        target.mark_processed_many([], SequenceTracker.rows(staged))
+
+        live = SequenceTracker({"orders": {"window": 8}}, target.load_sequence_marks())
+        result = import_chunks(target, export_frames(source), sequences=live)
+        assert result["seq_marks"] == 1
+        for tracker in (live, SequenceTracker({"orders": {"window": 8}}, target.load_sequence_marks())):
+            decisions, _ = tracker.plan([{"topic": "orders", "source": "a", "payload": {"seq": s}}
+                                         for s in (10, 11, 12, 9, 13)])
+            assert decisions == {0: False, 1: False, 2: False, 3: True, 4: True}
+        source.close()
+        target.close()
+
+
+@pytest.mark.stress
+def test_bulk_load_throughput():
+    """Ukur kecepatan bulk load key ke store kosong"""
+    total = 200_000
+    with tempfile.TemporaryDirectory() as tmpdir:
+        source = DedupStore(os.path.join(tmpdir, "src.db"))
+        loader = source.bulk_loader()
+        for start in range(0, total, 10000):
+            loader.add([(f"t{i % 50}", f"e-{i}", "2025-01-01T00:00:00") for i in range(start, start + 10000)])
+        loader.finish()
+
+        target = DedupStore(os.path.join(tmpdir, "dst.db"))
+        started = time.perf_counter()
+        result = import_chunks(target, export_frames(source))
+        elapsed = time.perf_counter() - started
+        assert result["inserted"] == total
+    print(f"\nexport+import {total} keys in {elapsed:.2f}s ({total / elapsed:.0f} keys/sec)")
@@ -0,0 +1,86 @@
+import pytest
+import asyncio
+from datetime import datetime, timedelta
+from src.stats import Meter
+
+
+def test_meter_converges_and_decays():
+    """Test bahwa EWMA rate mendekati rate konstan dan meluruh saat idle"""
+    meter = Meter(now=0.0)
+    now = 0.0
+    # 10 event/detik selama 10 menit
+    for _ in range(600):
+        meter.mark(10, now=now)
+        now += 1.0
+    rate_1m, rate_5m, rate_15m = meter.rates(now=now)
+    assert rate_1m == pytest.approx(10, rel=0.05)
+    assert rate_5m == pytest.approx(10, rel=0.05)
+    assert rate_15m == pytest.approx(10, rel=0.05)
+
+    # Idle 5 menit: rate 1m turun jauh, dihitung tanpa loop per tick
+    rate_1m_idle, rate_5m_idle, _ = meter.rates(now=now + 300)
+    assert rate_1m_idle < 0.1
+    assert rate_1m_idle < rate_5m_idle < 10
+
+
+@pytest.mark.asyncio
+async def test_topic_stats_endpoint(client):
+    """Test /stats/topics melaporkan received, unique, duplicate dan lag per topic"""
+    old = (datetime.utcnow() - timedelta(seconds=30)).isoformat()
+    events = [
+        {
+            "topic": "hot.topic",
+            "event_id": f"evt-{i}",
+            "timestamp": datetime.utcnow().isoformat(),
+            "source": "svc",
+            "payload": {}
+        }
+        for i in range(5)
+    ]
+    lagging = {
+        "topic": "slow.topic",
+        "event_id": "evt-0",
+        "timestamp": old,
+        "source": "svc",
+        "payload": {}
+    }
+    await client.post("/publish", json=events + [lagging])
+    await client.post("/publish", json=events[:2])
+    await asyncio.sleep(0.3)
+
+    response = await client.get("/stats/topics")
+    assert response.status_code == 200
+    topics = response.json()
+    assert set(topics) == {"hot.topic", "slow.topic"}
+
+    hot = topics["hot.topic"]
+    assert hot["received"] == 7
+    assert hot["unique_processed"] == 5
+    assert hot["duplicate_dropped"] == 2
+    assert hot["last_event_timestamp"] is not None
+    assert {"rate_1m", "rate_5m", "rate_15m"} <= set(hot)
+
+    slow = topics["slow.topic"]
+    assert slow["lag_seconds"]["last"] >= 30
+    assert slow["lag_seconds"]["max"] >= 30
+
+
+@pytest.mark.asyncio
+async def test_topic_stats_detail(client):
+    """Test endpoint detail per topic dan 404 untuk topic tidak dikenal"""
+    event = {
+        "topic": "detail.topic",
+        "event_id": "evt-1",
+        "timestamp": datetime.utcnow().isoformat(),
+        "source": "svc",
+        "payload": {}
+    }
+    await client.post("/publish", json=event)
+    await asyncio.sleep(0.3)
+
+    response = await client.get("/stats/topics/detail.topic")
+    assert response.status_code == 200
+    assert response.json()["unique_processed"] == 1
+
+    response = await client.get("/stats/topics/unknown.topic")
+    assert response.status_code == 404
@@ -0,0 +1,219 @@
+import pytest
+import os
+import asyncio
+import sqlite3
+import tempfile
+from datetime import datetime
+from httpx import AsyncClient, ASGITransport
+from src.main import create_app
+from src.codec import unpackb
+from src.dedup_store import DedupStore, ShardedDedupStore
+from src.scheduler import FairQueue
+from src.worker import ConsumerWorker
+
+
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+def make_events(n, topic="recovery", prefix="evt"):
+    return [
+        {
+            "topic": topic,
+            "event_id": f"{prefix}-{i}",
+            "timestamp": datetime.utcnow().isoformat(),
+            "source": "test-service",
+            "payload": {"i": i}
+        }
+        for i in range(n)
+    ]
+
+
+def fail_writes(store, times, shard=None):
+    """Buat mark_processed_many gagal `times` kali dengan 'database is locked'"""
+    target = store.shards[shard] if shard is not None else store
+    original = target.mark_processed_many
+    state = {"left": times}
+
+    def flaky(*args, **kwargs):
+        if state["left"]:
+            state["left"] -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return original(*args, **kwargs)
+
+    target.mark_processed_many = flaky
+    return state
+
+
+async def wait_until(check, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not check():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.02)
+
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_retried():
+    """Test error SQLite sementara di-retry dengan backoff tanpa kehilangan event"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = DedupStore(os.path.join(tmpdir, "dedup.db"))
+        queue = FairQueue()
+        processed = []
+        worker = ConsumerWorker(queue, store, processed, retry_base=0.01)
+        fail_writes(store, 2)
+        task = asyncio.create_task(worker.supervise())
+        for event in make_events(20):
+            await queue.put(event)
+        await wait_until(lambda: len(processed) == 20)
+
+        health = worker.health()
+        assert health["status"] == "ok"
+        assert health["retries"] == 2
+        assert health["dead_lettered"] == 0
+        assert "database is locked" in health["last_error"]
+        assert store.count_processed() == 20
+        worker.stop()
+        task.cancel()
+        store.close()
+
+
+@pytest.mark.asyncio
+async def test_partial_sharded_commit_is_not_counted_twice():
+    """Test retry setelah commit parsial (satu shard gagal) tidak membuat event terbaca duplicate"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = ShardedDedupStore(os.path.join(tmpdir, "dedup.db"), 2)
+        queue = FairQueue()
+        processed = []
+        worker = ConsumerWorker(queue, store, processed, retry_base=0.01)
+        fail_writes(store, 1, shard=1)
+        events = make_events(50)
+        assert {store.shard_index(e["topic"], e["event_id"]) for e in events} == {0, 1}
+        for event in events:
+            await queue.put(event)
+        task = asyncio.create_task(worker.supervise())
+        await wait_until(lambda: len(processed) == 50)
+        assert store.count_processed() == 50
+        assert worker.health()["retries"] == 1
+        worker.stop()
+        task.cancel()
+        store.close()
+
+
+@pytest.mark.asyncio
+async def test_supervisor_restarts_crashed_worker():
+    """Test worker yang crash di-restart dan batch yang crash dua kali masuk dead letter"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = DedupStore(os.path.join(tmpdir, "dedup.db"))
+        queue = FairQueue()
+        processed = []
+        worker = ConsumerWorker(queue, store, processed)
+        plan_errors = {"left": 1}
+
+        class CrashingSequences:
+            def plan(self, events):
+                if any(e["event_id"] == "poison" for e in events) or plan_errors["left"]:
+                    plan_errors["left"] = max(0, plan_errors["left"] - 1)
+                    raise RuntimeError("boom")
+                return {}, {}
+
+        worker.sequences = CrashingSequences()
+        task = asyncio.create_task(worker.supervise(restart_delay=0.01))
+        await queue.put(make_events(1, prefix="first")[0])
+        await wait_until(lambda: len(processed) == 1)
+        assert worker.restarts == 1
+
+        await queue.put({**make_events(1)[0], "event_id": "poison"})
+        await wait_until(lambda: worker.dead_lettered == 1)
+        await queue.put(make_events(1, prefix="after")[0])
+        await wait_until(lambda: len(processed) == 2)
+        assert worker.restarts == 3
+        assert worker.health()["status"] == "ok"
+        assert [row[2] for row in store.list_dead_letters()] == ["poison"]
+        worker.stop()
+        task.cancel()
+        store.close()
+
+
+@pytest.mark.asyncio
+async def test_dead_letters_and_replay():
+    """Test event yang gagal setelah retry masuk dead letter, lalu di-replay setelah storage pulih"""
+    env = {"ADMIN_TOKEN": "secret", "WORKER_MAX_RETRIES": "2", "WORKER_RETRY_BASE_MS": "1"}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.environ.update(env, DEDUP_DB_PATH=os.path.join(tmpdir, "dedup.db"))
+        try:
+            app = create_app()
+            async with app.router.lifespan_context(app):
+                async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                    await check_dead_letters_and_replay(app, client)
+        finally:
+            for key in [*env, "DEDUP_DB_PATH"]:
+                del os.environ[key]
+
+
+async def check_dead_letters_and_replay(app, client):
+    state = fail_writes(app.state.dedup, 3)
+    assert (await client.post("/publish", json=make_events(10))).status_code == 200
+    await wait_until(lambda: app.state.worker.dead_lettered == 10)
+
+    stats = (await client.get("/stats")).json()
+    assert stats["received"] == 10
+    assert stats["unique_processed"] == 0
+    assert stats["duplicate_dropped"] == 0
+    assert stats["worker"]["health"]["status"] == "failing"
+    assert stats["worker"]["health"]["dead_lettered"] == 10
+
+    listing = (await client.get("/admin/dead-letters", headers=ADMIN)).json()
+    assert listing["total"] == 10
+    assert listing["items"][0]["attempts"] == 3
+    assert listing["items"][0]["event"]["payload"] == {"i": 0}
+    assert "database is locked" in listing["items"][0]["error"]
+
+    # storage pulih: batch baru berhasil dan status kembali ok
+    assert state["left"] == 0
+    await client.post("/publish", json=make_events(5, prefix="fresh"))
+    await wait_until(lambda: app.state.worker.health()["status"] == "ok")
+
+    replay = (await client.post("/admin/dead-letters/replay", headers=ADMIN)).json()
+    assert replay == {"replayed": 10, "remaining": 0}
+    await asyncio.sleep(0.3)
+    stats = (await client.get("/stats")).json()
+    assert stats["unique_processed"] == 15
+    assert stats["duplicate_dropped"] == 0
+    assert (await client.get("/admin/dead-letters", headers=ADMIN)).json()["total"] == 0
+
+
+@pytest.mark.asyncio
+async def test_supervisor_survives_unpackable_batch():
+    """Test batch yang crash dan tidak bisa di-msgpack tetap masuk dead letter tanpa mematikan supervisor"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = DedupStore(os.path.join(tmpdir, "dedup.db"))
+        queue = FairQueue()
+        processed = []
+        worker = ConsumerWorker(queue, store, processed)
+
+        class CrashingSequences:
+            def plan(self, events):
+                if any(e["event_id"] == "poison" for e in events):
+                    raise RuntimeError("boom")
+                return {}, {}
+
+        worker.sequences = CrashingSequences()
+        task = asyncio.create_task(worker.supervise(restart_delay=0.01))
+        await queue.put({**make_events(1)[0], "event_id": "poison", "payload": {"tags": {"a"}}})
+        # dihitung sebelum disimpan; tunggu sampai baris dead letter benar-benar ada
+        await wait_until(lambda: store.count_dead_letters() == 1)
+        [row] = store.list_dead_letters()
+        assert row[2] == "poison" and "poison" in unpackb(row[3])
+
+        # dead-lettering itself gagal: supervisor tetap hidup dan lanjut
+        async def broken(*args, **kwargs):
+            raise OSError("disk full")
+
+        worker._dead_letter = broken
+        await queue.put({**make_events(1, prefix="x")[0], "event_id": "poison"})
+        await wait_until(lambda: worker.restarts == 4)
+        await queue.put(make_events(1, prefix="after")[0])
+        await wait_until(lambda: len(processed) == 1)
+        assert not task.done()
+        worker.stop()
+        task.cancel()
+        store.close()